@@ -0,0 +1,122 @@
+#!/bin/env python3
+
+'''
+Collect ARP tables from many routers at once and merge them into one index.
+
+Every router is walked concurrently.  A router that does not answer is
+reported and skipped rather than failing the whole collection.  Entries are
+stored as integers (see macaddr) with set semantics in both directions, and the
+routers that reported each (MAC, IP) pair are recorded.
+
+>>> index, failed = collect_arp(['gw01', 'gw02', 'gw03'], snmp_comm)
+>>> failed
+['gw03']
+>>> index.ips_for('bc30.5bf4.e038')
+['10.118.0.5', '10.118.0.7']
+>>> index.macs_for('10.118.0.5')
+['bc30.5bf4.e038']
+>>> index.routers_for('bc30.5bf4.e038', '10.118.0.5')
+['gw01', 'gw02']
+'''
+
+import asyncio
+import ipaddress
+import macaddr
+import snmp_fleet
+import snmp_tools
+
+def _mac_int(mac):
+    if isinstance(mac, int):
+        return mac
+    return int(macaddr.MacAddress(mac))
+
+def _ip_int(ip):
+    if isinstance(ip, int):
+        return ip
+    return int(ipaddress.IPv4Address(ip))
+
+class ArpIndex(object):
+    def __init__(self):
+        # {mac_int: set(ip_int)}
+        self.mac_ips = {}
+        # {ip_int: set(mac_int)}
+        self.ip_macs = {}
+        # {(mac_int, ip_int): set(router)}
+        self.sources = {}
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, router, mac_int, ip_int):
+        try:
+            self.mac_ips[mac_int].add(ip_int)
+        except KeyError:
+            self.mac_ips[mac_int] = {ip_int}
+        try:
+            self.ip_macs[ip_int].add(mac_int)
+        except KeyError:
+            self.ip_macs[ip_int] = {mac_int}
+        try:
+            self.sources[(mac_int, ip_int)].add(router)
+        except KeyError:
+            self.sources[(mac_int, ip_int)] = {router}
+
+    def add_table(self, router, arp):
+        '''
+        Merges a macaddr.ArpTable collected from router.
+        '''
+        for mac_int, ip_int in arp:
+            self.add(router, mac_int, ip_int)
+
+    def ips_for(self, mac):
+        '''
+        Returns the IP addresses seen for a MAC address (string or integer).
+        '''
+        ip_ints = self.mac_ips.get(_mac_int(mac), ())
+        return [macaddr.format_ip(ip_int) for ip_int in sorted(ip_ints)]
+
+    def macs_for(self, ip):
+        '''
+        Returns the MAC addresses seen for an IP address.  More than one means
+        a duplicate address or a recent move.
+        '''
+        mac_ints = self.ip_macs.get(_ip_int(ip), ())
+        return [macaddr.format_mac(mac_int) for mac_int in sorted(mac_ints)]
+
+    def routers_for(self, mac, ip):
+        return sorted(self.sources.get((_mac_int(mac), _ip_int(ip)), ()))
+
+    def to_dict(self):
+        '''
+        Returns the get_arp_ip_list format, {'0015.5d29.3e44': ['10.1.1.5']}.
+        '''
+        return {macaddr.format_mac(mac_int): [macaddr.format_ip(ip_int)
+          for ip_int in sorted(ip_ints)]
+          for mac_int, ip_ints in self.mac_ips.items()}
+
+async def update_index(index, routers, snmp_comm, concurrency=64, per_host=1):
+    '''
+    Walks the ARP table of every router concurrently and merges each one into
+    index as it completes.  Returns the list of routers that failed.
+    '''
+    failed = []
+    with snmp_fleet.FleetPoller(concurrency, per_host) as poller:
+        async for res in poller.poll(
+          routers, snmp_tools.get_arp_array, snmp_comm):
+            if res.error is not None or res.result is None:
+                if res.error is not None:
+                    print('{0} failed: {1}'.format(res.host, res.error))
+                failed.append(res.host)
+                continue
+            index.add_table(res.host, res.result)
+    return failed
+
+def collect_arp(routers, snmp_comm, index=None, concurrency=64, per_host=1):
+    '''
+    Blocking wrapper around update_index.  Returns (ArpIndex, failed_routers).
+    '''
+    if index is None:
+        index = ArpIndex()
+    failed = asyncio.run(
+      update_index(index, routers, snmp_comm, concurrency, per_host))
+    return index, failed
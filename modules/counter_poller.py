@@ -0,0 +1,232 @@
+#!/bin/env python3
+
+'''
+Long-running interface counter poller.  ifHCInOctets, ifHCInUcastPkts and
+ifInErrors are sampled on a fixed interval for any number of interfaces and
+turned into bits, packets and errors per second.  Rates are kept in fixed-size
+ring buffers so memory does not grow no matter how long the poller runs.
+
+>>> poller = CounterPoller(snmp_comm, interval=60, history=60)
+>>> poller.add('aubcore01', ['10101', '10102'])
+>>> poller.run(iterations=10)
+>>> poller.rates('aubcore01', '10101')['bps']
+[1834219.5, 1795110.1, ...]
+
+Counter handling:
+
+  * 32-bit counters that go backwards are assumed to have wrapped once.
+  * 64-bit counters cannot realistically wrap between polls, so going backwards
+    means the counters were cleared and the sample is discarded.
+  * If sysUpTime goes backwards the device rebooted, and every interface on it
+    starts over from a new baseline.
+'''
+
+import array
+import time
+import oid_registry
+import snmp_engine
+import snmp_fleet
+import snmp_tools
+
+# sysUpTime is fetched with every request to detect reboots, so each request
+# carries this many interfaces (three counters each) plus sysUpTime
+intfs_per_request = 15
+
+counter_names = ['ifHCInOctets', 'ifHCInUcastPkts', 'ifInErrors']
+rate_names = ['bps', 'pps', 'eps']
+
+class RingBuffer(object):
+    '''
+    A fixed-size buffer of floats that overwrites the oldest value when full.
+    '''
+    def __init__(self, size):
+        self.size = size
+        self.data = array.array('d', bytes(8 * size))
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self):
+        '''
+        Returns the buffered values, oldest first.
+        '''
+        start = (self.head - self.count) % self.size
+        if start + self.count <= self.size:
+            return self.data[start:start + self.count].tolist()
+        return (self.data[start:].tolist() +
+          self.data[:self.head].tolist())
+
+    def last(self):
+        if self.count == 0:
+            return None
+        return self.data[(self.head - 1) % self.size]
+
+def counter_delta(old, new):
+    '''
+    Returns the increase from old to new, accounting for a 32-bit wrap.
+    Returns None when a 64-bit counter went backwards, which means the
+    counters were cleared rather than wrapped.
+    '''
+    if new >= old:
+        return new - old
+    if isinstance(new, snmp_engine.Counter64):
+        return None
+    return new + 2**32 - old
+
+def uptime_reset(old, new):
+    '''
+    True if sysUpTime went backwards because the device rebooted.  sysUpTime
+    itself wraps after 497 days, which is not a reboot.
+    '''
+    return new < old and old < 0xf0000000
+
+class IntfCounters(object):
+    '''
+    The last raw sample and the rate history of one interface.
+    '''
+    __slots__ = ['last', 'last_time', 'rates']
+
+    def __init__(self, history):
+        self.last = None
+        self.last_time = None
+        self.rates = [RingBuffer(history) for name in rate_names]
+
+class CounterPoller(object):
+    def __init__(self, snmp_comm, interval=60, history=60, concurrency=64,
+      per_host=1):
+        self.snmp_comm = snmp_comm
+        self.interval = interval
+        self.history = history
+        self.concurrency = concurrency
+        self.per_host = per_host
+        # {hostname: {ifindex: IntfCounters}}
+        self.intfs = {}
+        self.uptimes = {}
+
+    def add(self, hostname, intf_indexes):
+        '''
+        Adds interfaces, by ifindex, to be polled on hostname.
+        '''
+        host_intfs = self.intfs.setdefault(hostname, {})
+        for intf_index in intf_indexes:
+            intf_index = str(intf_index)
+            if intf_index not in host_intfs:
+                host_intfs[intf_index] = IntfCounters(self.history)
+
+    def remove(self, hostname, intf_indexes=None):
+        if intf_indexes is None:
+            self.intfs.pop(hostname, None)
+            self.uptimes.pop(hostname, None)
+            return
+        for intf_index in intf_indexes:
+            self.intfs.get(hostname, {}).pop(str(intf_index), None)
+
+    def poll_host(self, hostname):
+        '''
+        Samples every interface on hostname and updates the rates.  Returns the
+        number of interfaces that produced a new rate.
+        '''
+        updated = 0
+        intf_indexes = list(self.intfs.get(hostname, {}))
+        uptime_oid = oid_registry.oid_for('sysUpTime', 0)
+        for i in range(0, len(intf_indexes), intfs_per_request):
+            chunk = intf_indexes[i:i + intfs_per_request]
+            oid_list = [uptime_oid]
+            for intf_index in chunk:
+                oid_list.extend(oid_registry.oid_for(name, intf_index)
+                  for name in counter_names)
+            values, now = snmp_tools.snmpget_multi(
+              hostname, oid_list, self.snmp_comm)
+            if values is None:
+                continue
+            uptime = values[uptime_oid]
+            if snmp_engine.is_exception(uptime):
+                continue
+            old_uptime = self.uptimes.get(hostname)
+            if old_uptime is not None and uptime_reset(old_uptime, uptime):
+                for intf in self.intfs[hostname].values():
+                    intf.last = None
+            self.uptimes[hostname] = uptime
+            for intf_index in chunk:
+                sample = [values[oid_registry.oid_for(name, intf_index)]
+                  for name in counter_names]
+                if any(snmp_engine.is_exception(v) for v in sample):
+                    continue
+                if self.update(hostname, intf_index, sample, now):
+                    updated += 1
+        return updated
+
+    def update(self, hostname, intf_index, sample, now):
+        intf = self.intfs[hostname].get(intf_index)
+        if intf is None:
+            return False
+        last, last_time = intf.last, intf.last_time
+        intf.last, intf.last_time = sample, now
+        if last is None or now <= last_time:
+            return False
+        deltas = [counter_delta(old, new) for old, new in zip(last, sample)]
+        if None in deltas:
+            return False
+        elapsed = now - last_time
+        octets, packets, errors = deltas
+        intf.rates[0].append(octets * 8 / elapsed)
+        intf.rates[1].append(packets / elapsed)
+        intf.rates[2].append(errors / elapsed)
+        return True
+
+    def poll(self):
+        '''
+        Polls every host once, concurrently.
+        '''
+        return snmp_fleet.run_fleet(list(self.intfs), self.poll_host,
+          concurrency=self.concurrency, per_host=self.per_host)
+
+    def run(self, iterations=None):
+        '''
+        Polls every interval seconds until iterations polls have been made, or
+        forever.  The schedule is fixed, so a slow poll shortens the following
+        sleep instead of pushing every later sample back.
+        '''
+        start = time.monotonic()
+        count = 0
+        while iterations is None or count < iterations:
+            self.poll()
+            count += 1
+            if iterations is not None and count >= iterations:
+                break
+            next_poll = start + count * self.interval
+            delay = next_poll - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def rates(self, hostname, intf_index):
+        '''
+        Returns the rate history of an interface, oldest first.
+
+        {'bps': [1834219.5, ...], 'pps': [1502.1, ...], 'eps': [0.0, ...]}
+        '''
+        intf = self.intfs[hostname][str(intf_index)]
+        return {name: ring.values()
+          for name, ring in zip(rate_names, intf.rates)}
+
+    def latest(self):
+        '''
+        Returns the most recent rates of every interface.
+
+        {'aubcore01': {'10101': {'bps': 1834219.5, 'pps': 1502.1, 'eps': 0.0}}}
+        '''
+        latest = {}
+        for hostname, host_intfs in self.intfs.items():
+            latest[hostname] = {}
+            for intf_index, intf in host_intfs.items():
+                latest[hostname][intf_index] = {name: ring.last()
+                  for name, ring in zip(rate_names, intf.rates)}
+        return latest
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 
+import modules.parse_cache as parse_cache
 import modules.shared_regex as rgx
+import fnmatch
 import glob
 from os import path
 from os import environ
 from os import getenv
+from os import scandir
+from os import stat
 import re
+import sys
 
 def get_conf_dir():
     conf_dir = environ.get('CONF_DIR')
@@ -25,94 +30,162 @@ def get_conf_dir():
             return conf_dir
     return 'configs/'
 
-def get_config_list(conf_dir, regex='*'):
+def read_vendor(fullpath):
+    '''
+    Return the Rancid type from the first line of a config, or 'unknown'.
+    '''
+    # encoding='utf-8' avoids UnicodeDecodeError when a conf file has
+    # unicode characters
+    with open(fullpath, encoding='utf-8') as fh:
+        firstline = fh.readline()
+    # possible rancid type matches seen
+    # (acme|Brocade|cisco|cisco-nx|Dell|force10|foundry|juniper|
+    # netscreen|opengear)
+    rancid_type_match = re.search(r'RANCID-CONTENT-TYPE:\s(\S+)', firstline)
+    if rancid_type_match:
+        return rancid_type_match.group(1)
+    return 'unknown'
+
+def scan_configs(conf_dir, regex='*'):
+    '''
+    Yield (filename, fullpath, stat_result) for every file that matches the
+    glob conf_dir + regex, leaving out hidden files, in glob order.
+    '''
+    pattern = conf_dir + regex
+    dirname, basename = path.split(pattern)
+    if glob.has_magic(dirname):
+        for fullpath in glob.glob(pattern):
+            filename = fullpath.split('/')[-1]
+            if filename.startswith('.') or not path.isfile(fullpath):
+                continue
+            try:
+                yield filename, fullpath, stat(fullpath)
+            except OSError:
+                continue
+        return
+    # a scandir entry stats each file at most once, and the directory listing
+    # alone tells a regular file from anything else
+    try:
+        entries = scandir(dirname or '.')
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if basename != '*' and not fnmatch.fnmatch(entry.name, basename):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat_result = entry.stat()
+            except OSError:
+                continue
+            if dirname:
+                yield entry.name, entry.path, stat_result
+            else:
+                yield entry.name, entry.name, stat_result
+
+def get_config_list(conf_dir, regex='*', index=parse_cache.vendor_index):
     '''
     Get a list of all Rancid network backup configurations and return a list of
-    (filename, vendor) tuples.
+    (filename, fullpath, vendor) tuples.
+
+    The vendor of a config is kept in index and only read again from the file
+    once its inode, mtime or size changes.
     '''
+    return [(filename, fullpath, vendor) for filename, fullpath, vendor,
+      stat_result in _get_config_stats(conf_dir, regex, index)]
+
+def _get_config_stats(conf_dir, regex='*', index=parse_cache.vendor_index):
+    # get_config_list with the stat_result of each config from the scan, so
+    # callers that check their own caches do not stat every file again
     config_list = []
-    contents = glob.glob(conf_dir + regex)
-    for fullpath in contents:
-        hostname = fullpath.split('/')[-1]
-        if hostname.startswith('.'):
+    dirname, basename = path.split(conf_dir + regex)
+    known = index.directory(dirname)
+    seen = {}
+    for filename, fullpath, stat_result in scan_configs(conf_dir, regex):
+        if stat_result.st_size == 0:
             continue
-        elif path.isfile(fullpath):
-            if path.getsize(fullpath) == 0:
-                continue
-            # encoding='utf-8' avoids UnicodeDecodeError when a conf file has
-            # unicode characters
-            with open(fullpath, encoding='utf-8') as fh:
-                firstline = fh.readline()
-                # possible rancid type matches seen
-                # (acme|Brocade|cisco|cisco-nx|Dell|force10|foundry|juniper|
-                # netscreen|opengear)
-                rancid_type_match = re.search(
-                  r'RANCID-CONTENT-TYPE:\s(\S+)', firstline)
-                if rancid_type_match:
-                    vendor = rancid_type_match.group(1)
-                else:
-                    vendor = 'unknown'
-            config_list.append((hostname, fullpath, vendor))
+        key = [stat_result.st_ino, stat_result.st_mtime_ns,
+          stat_result.st_size]
+        entry = known.get(filename)
+        if entry and entry[:3] == key:
+            vendor = entry[3]
+        else:
+            vendor = read_vendor(fullpath)
+        seen[filename] = key + [vendor]
+        config_list.append((filename, fullpath, vendor, stat_result))
+    if not glob.has_magic(dirname):
+        index.update(dirname, seen, complete=(basename == '*'))
     return config_list
 
+class ConfigLines(object):
+    '''
+    Lazy line source for one config, to be used instead of readlines():
+
+    >>> parse.parse_any(hostname, platform, enumerate(ConfigLines(fullpath)),
+    ...   host_ip_dict)
+
+    Each iteration opens the file again and yields its lines one at a time, so
+    at most one buffer of the file is held in memory however big the config
+    is.
+    '''
+    def __init__(self, fullpath):
+        self.fullpath = fullpath
+
+    def __iter__(self):
+        with open(self.fullpath, encoding='utf-8') as fh:
+            yield from fh
+
 def get_configs(conf_dir):
     '''
     Return a dictionary of (hostname, platform):[config_lines]
     key = tuple and value = list
     '''
     configs = {}
+    hostnames = set()
     config_list = get_config_list(conf_dir)
-    for conf_name, platform in config_list:
+    for conf_name, fullpath, platform in config_list:
         if re.search('opengear|foundry', platform):
             continue
-        config_lines = []
-        fullpath = '/'.join([conf_dir, conf_name])
         with open(fullpath, encoding='utf-8') as fh:
             config_lines = fh.readlines()
         for line in config_lines:
             hostname_match = re.search('host-?name\s(\S+)', line)
             if hostname_match:
                 hostname = hostname_match.group(1).rstrip(';')
-                if configs.get(hostname):
+                if hostname in hostnames:
                     print('Skipping duplicate hostname: {0}'.format(hostname))
-                    print(': {0}'.format(c))
+                    print(': {0}'.format(fullpath))
                 else:
+                    hostnames.add(hostname)
                     configs[(hostname, platform)] = config_lines
                 break
     return configs
 
-def get_facts(conf_dir, inc_config=False):
+def read_facts(fullpath, vendor):
     '''
     Return a dictionary in the format:
 
-    facts[hostname] = {'vendor' : vendor,  'model': model,
-                       'version': version, 'config': [config_lines]}
+    facts[hostname] = {'vendor' : vendor,  'model': model, 'version': version}
 
-    The config is set to None unless explicitly requested.
+    for the hosts named in the Rancid header of one config.  Clustered SRX
+    configs name more than one.
     '''
     facts = {}
-    config_list = get_config_list(conf_dir)
-    for hostname, fullpath, vendor in config_list:
-        #if re.search('arista|bigip', vendor):
-        if 'juniper' not in vendor:
-            continue
-        config_lines = []
-        with open(fullpath, encoding='utf-8') as fh:
-            config_lines = fh.readlines()
-        for line in config_lines:
-            #hostname_match = re.search('host-?name\s(\S+)', line)
+    hostname = None
+    with open(fullpath, encoding='utf-8') as fh:
+        for line in fh:
             hostname_match = re.search('Hostname:\s(\S+)', line)
             if hostname_match:
                 hostname = hostname_match.group(1).lower()
-                #hostname = hostname_match.group(1).rstrip(';')
-                if facts.get(hostname):
-                    continue
-                    print('Skipping duplicate hostname: {0}'.format(hostname))
-                else:
-                    facts[hostname] = {'vendor' : vendor, 'model': '', \
-                                       'version': '', 'config'  : None}
-                    if (inc_config):
-                        facts[hostname]['config'] = config_lines
+                if hostname not in facts:
+                    facts[hostname] = {'vendor' : vendor, 'model': '',
+                                       'version': ''}
+                continue
+            if hostname is None:
+                continue
             model_match = rgx.model.search(line)
             if model_match:
                 model = model_match.group(1)
@@ -137,9 +210,44 @@ def get_facts(conf_dir, inc_config=False):
                 version = qfx3500_version_match.group(1)
                 facts[hostname]['version'] = version
                 break
-        #if len(facts[hostname]['version']) < 1:
-        #    print('HOST:', hostname)
-        #    quit()
+    return facts
+
+# cached facts are thrown away whenever this module or the regexes change
+facts_version = parse_cache.source_version(sys.modules[__name__], rgx)
+
+def get_facts(conf_dir, inc_config=False, cache=parse_cache.cache):
+    '''
+    Return a dictionary in the format:
+
+    facts[hostname] = {'vendor' : vendor,  'model': model,
+                       'version': version, 'config': [config_lines]}
+
+    The config is set to None unless explicitly requested.  The facts of each
+    config are kept in parse_cache and only read again once it changes.  If
+    two configs name the same host, the first one wins.
+    '''
+    facts = {}
+    config_list = _get_config_stats(conf_dir)
+    for hostname, fullpath, vendor, stat_result in config_list:
+        #if re.search('arista|bigip', vendor):
+        if 'juniper' not in vendor:
+            continue
+        hit, conf_facts = cache.get('facts', facts_version, fullpath,
+          stat_result)
+        if not hit:
+            conf_facts = read_facts(fullpath, vendor)
+            cache.put('facts', facts_version, fullpath, conf_facts,
+              stat_result)
+        config_lines = None
+        for hostname, host_facts in conf_facts.items():
+            if facts.get(hostname):
+                continue
+            facts[hostname] = dict(host_facts, config=None)
+            if (inc_config):
+                if config_lines is None:
+                    with open(fullpath, encoding='utf-8') as fh:
+                        config_lines = fh.readlines()
+                facts[hostname]['config'] = config_lines
     return facts
 
 #def get_rancid_version(confg):
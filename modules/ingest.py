@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+'''
+Parse many Rancid configs at once.
+
+Parsing is CPU bound regex matching, so the configs from
+filelib.get_config_list are split into chunks and parsed on a pool of worker
+processes, one per core by default.  The per-host results are merged in
+get_config_list order, so the result is the same as parsing the configs one
+after another.  The pool uses the default start method when it is fork; the
+tools that call this run their main code at import time, and workers started
+any other way would import and run it again, so then the configs are parsed
+in this process instead.
+
+Results are kept per config in parse_cache, so configs that have not changed
+since the last run, by any tool, are not parsed again.
+
+>>> configs = flib.get_config_list(conf_dir)
+>>> ip_dict = ingest.parse_configs(configs)
+>>> ip_dict['aubcore01']
+{'gi1/0/1': [('10.1.1.1', '24')], 'vl100': [('10.1.100.2', '24'),...
+'''
+
+import concurrent.futures
+import multiprocessing
+import os
+import modules.filelib as flib
+import modules.parse_cache as parse_cache
+import modules.parsers as parse
+import modules.shared_regex as rgx
+
+# cached results are thrown away whenever the parsers change
+parser_version = parse_cache.source_version(parse, rgx)
+
+def parse_config(hostname, conf_path, platform):
+    '''
+    Parses one config with parsers.parse_any and returns
+    {hostname: {intf: [(ip_addr, netmask),...]}}.  A config that cannot be
+    read or ends inside a block is reported and returns None, since what was
+    parsed of it may be missing addresses.
+    '''
+    host_ip_dict = {hostname: {}}
+    try:
+        config_lines = flib.ConfigLines(conf_path)
+        parse.parse_any(hostname, platform, enumerate(config_lines),
+          host_ip_dict)
+    except (OSError, UnicodeDecodeError, StopIteration) as e:
+        print('Failed to parse {0}: {1!r}'.format(conf_path, e))
+        return None
+    return host_ip_dict
+
+def _parse_chunk(configs):
+    # None for a config the parser failed on, so one bad config does not lose
+    # the rest of the chunk
+    results = []
+    for hostname, conf_path, platform in configs:
+        try:
+            host_ip_dict = parse_config(hostname, conf_path, platform)
+        except Exception as e:
+            print('Skipping {0}: {1!r}'.format(conf_path, e))
+            host_ip_dict = None
+        if host_ip_dict is None:
+            results.append(None)
+        else:
+            results.append(host_ip_dict[hostname])
+    return results
+
+def _parse_all(configs, processes, chunks_per_process):
+    '''
+    Returns the interface dictionaries of configs, in order, with None for
+    the configs that failed.
+    '''
+    processes = min(processes, len(configs))
+    ctx = multiprocessing.get_context()
+    if processes <= 1 or ctx.get_start_method() != 'fork':
+        return _parse_chunk(configs)
+    chunk_size = -(-len(configs) // (processes * chunks_per_process))
+    chunks = [configs[i:i + chunk_size]
+      for i in range(0, len(configs), chunk_size)]
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(processes,
+      mp_context=ctx) as executor:
+        futures = [executor.submit(_parse_chunk, chunk) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                # the worker died or the results could not be sent back
+                for hostname, conf_path, platform in chunk:
+                    print('Skipping {0}: {1!r}'.format(conf_path, e))
+                results.extend([None] * len(chunk))
+    return results
+
+def parse_configs(configs, processes=None, chunks_per_process=8,
+  cache=parse_cache.cache):
+    '''
+    Parses every (hostname, conf_path, platform) in configs, as returned by
+    filelib.get_config_list, and returns one dictionary of hostname to
+    interfaces to [(ip_addr, netmask),...].
+
+    Only configs that are not current in cache are parsed; the addresses of
+    the others come back from it as [ip_addr, netmask] lists rather than
+    tuples, which unpack the same.  A config the parser fails on is reported
+    and left out.  processes defaults to the number of cores.
+    Each process is handed about chunks_per_process chunks so that a few large
+    configs do not leave the other processes idle at the end.
+    '''
+    configs = list(configs)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    results = [None] * len(configs)
+    misses = []
+    for pos, (hostname, conf_path, platform) in enumerate(configs):
+        try:
+            stat_result = os.stat(conf_path)
+        except OSError:
+            stat_result = None
+        hit, intfs = cache.get('ip', parser_version, conf_path, stat_result)
+        if hit:
+            results[pos] = intfs
+        else:
+            misses.append((pos, stat_result))
+    parsed = _parse_all([configs[pos] for pos, stat_result in misses],
+      processes, chunks_per_process)
+    for (pos, stat_result), intfs in zip(misses, parsed):
+        results[pos] = intfs
+        # only configs parsed to the end, so a failed one is tried (and
+        # reported) again on every run until it is fixed
+        if intfs is not None and stat_result is not None:
+            cache.put('ip', parser_version, configs[pos][1], intfs,
+              stat_result)
+    ip_dict = {}
+    for (hostname, conf_path, platform), intfs in zip(configs, results):
+        if intfs is not None:
+            ip_dict[hostname] = intfs
+    return ip_dict
@@ -0,0 +1,163 @@
+#!/bin/env python3
+
+'''
+Find the switch and port where a MAC address lives.
+
+For each switch the VLAN list, bridge port to ifindex map and ifindex to
+interface name map are fetched, then the bridge table of every VLAN is walked
+(community@vlan), with the per-VLAN walks running in parallel.  The result is a
+MacIndex that answers lookups with a single dictionary access and can be saved
+to disk for later runs.
+
+>>> index = build_index(['accsw01', 'accsw02'], snmp_comm)
+>>> index.locate('00:50:56:95:40:6e')
+[('accsw01', 'gi1/0/3', '4038', 1), ('aubcore01', 'po1', '4038', 212)]
+>>> index.save()
+
+Each location is (switch, interface, vlan, macs on that port).  Uplinks and
+trunks see every MAC behind them, so locate() sorts the port with the fewest
+MAC addresses first, which is normally the edge port the device is cabled to.
+'''
+
+import asyncio
+import json
+import os
+import time
+import macaddr
+import snmp_fleet
+import snmp_tools
+
+default_index_path = os.path.join(os.path.expanduser('~'), '.mac_index.json')
+
+def normalize_mac(mac):
+    '''
+    Converts any common MAC format ('00:50:56:95:40:6E', '0050-5695-406e',
+    '00 50 56 95 40 6E', ...) to '0050.5695.406e'.
+    '''
+    return str(macaddr.MacAddress(mac))
+
+class MacIndex(object):
+    def __init__(self):
+        # {mac: [(switch, intf, vlan, port_mac_count),...]}
+        self.macs = {}
+        self.switches = {}
+        # {switch: set of the macs it reported}, so refreshing one switch only
+        # touches its own macs
+        self.switch_macs = {}
+
+    def __len__(self):
+        return len(self.macs)
+
+    def add_switch(self, switch, locations):
+        '''
+        Replaces everything known about switch with locations, a list of
+        (mac, intf, vlan, port_mac_count) tuples.
+        '''
+        self.remove_switch(switch)
+        switch_macs = self.switch_macs[switch] = set()
+        for mac, intf, vlan, count in locations:
+            self.macs.setdefault(mac, []).append((switch, intf, vlan, count))
+            switch_macs.add(mac)
+        self.switches[switch] = time.time()
+
+    def remove_switch(self, switch):
+        if switch not in self.switches:
+            return
+        for mac in self.switch_macs.pop(switch, ()):
+            locations = [loc for loc in self.macs[mac] if loc[0] != switch]
+            if locations:
+                self.macs[mac] = locations
+            else:
+                del self.macs[mac]
+        del self.switches[switch]
+
+    def locate(self, mac):
+        '''
+        Returns every (switch, interface, vlan, port_mac_count) where mac was
+        seen, edge ports first.
+        '''
+        locations = self.macs.get(normalize_mac(mac), [])
+        return sorted(locations, key=lambda loc: loc[3])
+
+    def save(self, path=default_index_path):
+        data = {'switches': self.switches,
+                'macs': {mac: [list(loc) for loc in locations]
+                  for mac, locations in self.macs.items()}}
+        tmp_path = '{0}.{1}'.format(path, os.getpid())
+        with open(tmp_path, 'wt') as f:
+            f.write(json.dumps(data))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=default_index_path):
+        index = cls()
+        with open(path, 'rt') as f:
+            data = json.load(f)
+        index.switches = data['switches']
+        index.macs = {mac: [tuple(loc) for loc in locations]
+          for mac, locations in data['macs'].items()}
+        for mac, locations in index.macs.items():
+            for loc in locations:
+                index.switch_macs.setdefault(loc[0], set()).add(mac)
+        return index
+
+async def locate_switch(poller, switch, snmp_comm):
+    '''
+    Returns a list of (mac, intf, vlan, port_mac_count) tuples for every MAC
+    address in the bridge tables of switch, or None if the switch could not be
+    polled.
+    '''
+    (vlan_nums, vlan_names), base_ports, (intf_name_map, intf_id_map) = \
+      await asyncio.gather(
+        poller.call(switch, snmp_tools.get_vlan_list, snmp_comm),
+        poller.call(switch, snmp_tools.get_base_ports, snmp_comm),
+        poller.call(switch, snmp_tools.get_intf_maps, snmp_comm))
+    if vlan_nums is None or not base_ports or intf_name_map is None:
+        return None
+    vlan_tables = await asyncio.gather(*[
+      poller.call(switch, snmp_tools.get_vlan_mac_port, vlan_num, snmp_comm)
+      for vlan_num in vlan_nums])
+    locations = []
+    for vlan_mac_ports in vlan_tables:
+        # get_vlan_mac_port returns (None, None) when the walk fails
+        if not isinstance(vlan_mac_ports, dict):
+            continue
+        for port_id, mac_vlans in vlan_mac_ports.items():
+            intf_index = base_ports.get(port_id)
+            intf = intf_name_map.get(intf_index, port_id)
+            for mac, vlan_num in mac_vlans:
+                locations.append((mac, intf, vlan_num, len(mac_vlans)))
+    return locations
+
+async def update_index(index, switches, snmp_comm, concurrency=64,
+  per_host=4):
+    '''
+    Polls every switch concurrently and adds the results to index.  Switches
+    that fail keep whatever the index already knew about them.  Returns the
+    list of switches that failed.
+    '''
+    failed = []
+    with snmp_fleet.FleetPoller(concurrency, per_host) as poller:
+        tasks = {switch: asyncio.ensure_future(
+          locate_switch(poller, switch, snmp_comm)) for switch in switches}
+        for switch, task in tasks.items():
+            try:
+                locations = await task
+            except Exception as e:
+                print('{0} failed: {1}'.format(switch, e))
+                locations = None
+            if locations is None:
+                failed.append(switch)
+                continue
+            index.add_switch(switch, locations)
+    return failed
+
+def build_index(switches, snmp_comm, index=None, concurrency=64, per_host=4):
+    '''
+    Blocking wrapper around update_index.  Returns the updated MacIndex.
+    '''
+    if index is None:
+        index = MacIndex()
+    asyncio.run(update_index(
+      index, switches, snmp_comm, concurrency, per_host))
+    return index
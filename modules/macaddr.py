@@ -0,0 +1,172 @@
+#!/bin/env python3
+
+'''
+MAC addresses as 48-bit integers.  An int is hashed and compared much faster
+than a dotted string and fits in eight bytes of an array('Q'), so large ARP
+and bridge tables are stored as integers and only formatted for output.
+
+>>> mac = MacAddress.from_decimal_oid('.0.80.86.149.64.110')
+>>> mac
+MacAddress('0050.5695.406e')
+>>> int(mac)
+345052807278
+>>> mac.format(':')
+'00:50:56:95:40:6e'
+'''
+
+import array
+
+def format_mac(mac_int):
+    '''
+    Formats a MAC address integer as '0050.5695.406e'.
+    '''
+    hex_mac = '%012x' % mac_int
+    return '.'.join([hex_mac[0:4], hex_mac[4:8], hex_mac[8:12]])
+
+def mac_from_bytes(mac_bytes):
+    '''
+    b'\\x90\\xb1\\x1c\\x46\\xa5\\x1d' as returned in a varbind, to an integer.
+    '''
+    return int.from_bytes(mac_bytes, 'big')
+
+def mac_from_hex_string(hex_string):
+    '''
+    '90 B1 1C 46 A5 1D', as printed by net-snmp for a Hex-STRING, to an
+    integer.
+    '''
+    return int(''.join(hex_string.split()), 16)
+
+def mac_from_decimal_oid(decimal_mac):
+    '''
+    '0.80.86.149.64.110' (or with a leading '.'), the way MAC addresses are
+    encoded in OID indexes, to an integer.  Only the rightmost six numbers are
+    used.
+    '''
+    octets = decimal_mac.strip('.').split('.')[-6:]
+    return ((int(octets[0]) << 40) | (int(octets[1]) << 32) |
+      (int(octets[2]) << 24) | (int(octets[3]) << 16) |
+      (int(octets[4]) << 8) | int(octets[5]))
+
+class MacAddress(int):
+    '''
+    An int that prints as a MAC address.  It can be used anywhere an int can,
+    including as a dictionary key alongside plain ints.
+    '''
+    def __new__(cls, value):
+        if isinstance(value, str):
+            hex_digits = ''.join(c for c in value.lower()
+              if c in '0123456789abcdef')
+            if len(hex_digits) != 12:
+                raise ValueError('Not a MAC address: {0}'.format(value))
+            value = int(hex_digits, 16)
+        elif isinstance(value, (bytes, bytearray)):
+            value = mac_from_bytes(value)
+        if not 0 <= value < 2**48:
+            raise ValueError('Not a MAC address: {0}'.format(value))
+        return super().__new__(cls, value)
+
+    @classmethod
+    def from_hex_string(cls, hex_string):
+        return cls(mac_from_hex_string(hex_string))
+
+    @classmethod
+    def from_decimal_oid(cls, decimal_mac):
+        return cls(mac_from_decimal_oid(decimal_mac))
+
+    def __str__(self):
+        return format_mac(self)
+
+    def __repr__(self):
+        return "MacAddress('{0}')".format(format_mac(self))
+
+    def format(self, sep='.'):
+        '''
+        '0050.5695.406e' with the default separator, '00:50:56:95:40:6e' with
+        ':' or '-'.
+        '''
+        if sep == '.':
+            return format_mac(self)
+        hex_mac = '%012x' % self
+        return sep.join(hex_mac[i:i + 2] for i in range(0, 12, 2))
+
+    @property
+    def oui(self):
+        return self >> 24
+
+def uint32_array():
+    '''
+    Returns an empty array of unsigned 32-bit integers.  'I' is four bytes on
+    every platform we run on, 'L' is eight on 64-bit Linux.
+    '''
+    if array.array('I').itemsize == 4:
+        return array.array('I')
+    return array.array('L')
+
+class ArpTable(object):
+    '''
+    ARP entries as parallel arrays of MAC integers and IPv4 integers.
+    '''
+    def __init__(self):
+        self.macs = array.array('Q')
+        self.ips = uint32_array()
+
+    def __len__(self):
+        return len(self.macs)
+
+    def __iter__(self):
+        return zip(self.macs, self.ips)
+
+    def append(self, mac_int, ip_int):
+        self.macs.append(mac_int)
+        self.ips.append(ip_int)
+
+    def mac_ips(self):
+        '''
+        Returns {mac_int: set(ip_int)}.
+        '''
+        table = {}
+        for mac_int, ip_int in zip(self.macs, self.ips):
+            try:
+                table[mac_int].add(ip_int)
+            except KeyError:
+                table[mac_int] = {ip_int}
+        return table
+
+class BridgeTable(object):
+    '''
+    Bridge (MAC address table) entries as parallel arrays of MAC integers,
+    bridge port IDs and VLAN numbers.
+    '''
+    def __init__(self):
+        self.macs = array.array('Q')
+        self.ports = uint32_array()
+        self.vlans = array.array('H')
+
+    def __len__(self):
+        return len(self.macs)
+
+    def __iter__(self):
+        return zip(self.macs, self.ports, self.vlans)
+
+    def append(self, mac_int, port_id, vlan_num):
+        self.macs.append(mac_int)
+        self.ports.append(port_id)
+        self.vlans.append(vlan_num)
+
+    def to_dict(self):
+        '''
+        Returns the get_vlan_mac_port format,
+        {'13': [('0010.dbff.4000', '4038')],...}.
+        '''
+        table = {}
+        for mac_int, port_id, vlan_num in self:
+            mac_vlan = (format_mac(mac_int), str(vlan_num))
+            try:
+                table[str(port_id)].append(mac_vlan)
+            except KeyError:
+                table[str(port_id)] = [mac_vlan]
+        return table
+
+def format_ip(ip_int):
+    return '{0}.{1}.{2}.{3}'.format(ip_int >> 24, (ip_int >> 16) & 0xff,
+      (ip_int >> 8) & 0xff, ip_int & 0xff)
@@ -0,0 +1,166 @@
+#!/bin/env python3
+
+'''
+oids.map compiled into a prefix trie of integer tuples.  Any OID returned by a
+device can be resolved to the name of the column it belongs to and its index
+in one pass over its arcs, and OIDs are built from a name and an index without
+string concatenation.
+
+>>> lookup('1.3.6.1.2.1.2.2.1.8.10103')
+('ifOperStatus', (10103,))
+>>> oid_for('ifAdminStatus', '10103')
+'1.3.6.1.2.1.2.2.1.7.10103'
+
+A Dispatcher sends each varbind of a walk to the handler registered for its
+column, so one stream covering several columns (or tables) can feed several
+consumers.  See snmp_tools.snmp_dispatch.
+
+>>> names = {}
+>>> dispatcher = Dispatcher()
+>>> dispatcher.on('ifName', lambda index, value: names.update({index: value}))
+'''
+
+import oids
+
+def oid_to_tuple(oid):
+    if isinstance(oid, tuple):
+        return oid
+    return tuple(int(arc) for arc in oid.strip('.').split('.'))
+
+def index_str(index):
+    '''
+    (10, 0, 0, 1) -> '10.0.0.1', the index format used by the snmp_tools
+    getters.
+    '''
+    return '.'.join(map(str, index))
+
+class _Node(object):
+    __slots__ = ['children', 'name']
+
+    def __init__(self):
+        self.children = {}
+        self.name = None
+
+class OidTrie(object):
+    def __init__(self):
+        self.root = _Node()
+        self.oids = {}
+
+    def __len__(self):
+        return len(self.oids)
+
+    def __contains__(self, name):
+        return name in self.oids
+
+    @classmethod
+    def from_map(cls, oid_map):
+        trie = cls()
+        for name, oid in oid_map.items():
+            trie.add(name, oid)
+        return trie
+
+    def add(self, name, oid):
+        '''
+        Registers name for oid.  When several names share an OID (aliases like
+        'uptime' for 'sysUpTime') lookups return the first one registered.
+        '''
+        oid = oid_to_tuple(oid)
+        node = self.root
+        for arc in oid:
+            child = node.children.get(arc)
+            if child is None:
+                child = node.children[arc] = _Node()
+            node = child
+        if node.name is None:
+            node.name = name
+        self.oids[name] = oid
+
+    def lookup(self, oid):
+        '''
+        Returns (name, index) for the longest registered prefix of oid, where
+        index is the tuple of the remaining arcs, or (None, oid) if no
+        registered OID is a prefix.
+        '''
+        oid = oid_to_tuple(oid)
+        node = self.root
+        name = None
+        depth = 0
+        for pos, arc in enumerate(oid):
+            node = node.children.get(arc)
+            if node is None:
+                break
+            if node.name is not None:
+                name = node.name
+                depth = pos + 1
+        return name, oid[depth:]
+
+    def oid(self, name, *index):
+        '''
+        Returns the OID string of name with the index parts appended.  Each
+        part can be an int, a string ('10.0.0.1') or a tuple.
+        '''
+        parts = [index_str(self.oids[name])]
+        for part in index:
+            if isinstance(part, tuple):
+                part = index_str(part)
+            parts.append(str(part).strip('.'))
+        return '.'.join(parts)
+
+class Dispatcher(object):
+    '''
+    Maps column names to handler(index, value) callables.  dispatch() resolves
+    each varbind to the longest column with a handler and calls the handlers
+    with the index as a string.  Varbinds without a handler go to the default
+    handler, if one is set, as default(oid, value).
+    '''
+    def __init__(self, trie=None, default=None):
+        self.trie = trie or registry
+        # only the columns with handlers, so nested registered OIDs and
+        # aliases do not hide them
+        self.handled = OidTrie()
+        self.handlers = {}
+        self.default = default
+
+    def on(self, name, handler):
+        if name not in self.trie:
+            raise KeyError('{0} is not a registered OID.'.format(name))
+        oid = self.trie.oids[name]
+        column, index = self.handled.lookup(oid)
+        if column is None or index:
+            self.handled.add(name, oid)
+            column = name
+        self.handlers.setdefault(column, []).append(handler)
+        return handler
+
+    def columns(self):
+        '''
+        Returns the OID strings of every column with a handler, the subtrees a
+        walk needs to cover.
+        '''
+        return [self.handled.oid(name) for name in self.handlers]
+
+    def dispatch(self, varbinds):
+        '''
+        Sends every (oid, value) in varbinds to its handlers and returns the
+        number of varbinds handled.
+        '''
+        handled = 0
+        for vb_oid, value in varbinds:
+            name, index = self.handled.lookup(vb_oid)
+            if name is None:
+                if self.default is not None:
+                    self.default(vb_oid, value)
+                continue
+            index = index_str(index)
+            for handler in self.handlers[name]:
+                handler(index, value)
+            handled += 1
+        return handled
+
+registry = OidTrie.from_map(oids.map)
+
+def lookup(oid):
+    return registry.lookup(oid)
+
+def oid_for(name, *index):
+    return registry.oid(name, *index)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+'''
+Per-config cache of parse results, shared by every tool that parses Rancid
+configs.
+
+Each entry is keyed on the config path and the kind of parse ('ip' for
+parsers.parse_any, 'facts' for filelib.get_facts) and stores the file's mtime,
+size and content hash and the parser version it was parsed with.  A config
+whose mtime and size are unchanged is a hit without being read.  One that was
+touched but has the same content is a hit after hashing it.  Anything else,
+or any change to the parser code, means the config is parsed again, so when
+one config of 5,000 changes only that one is reparsed.
+
+The cache lives in ~/.config_parse_cache.json (or PARSE_CACHE_FILE), is read
+the first time it is used and written when the script exits.  Entries for
+configs that no longer exist are dropped then.  Set PARSE_CACHE=off to parse
+everything every time.
+
+>>> hit, result = cache.get('ip', ingest.parser_version, conf_path)
+>>> if not hit:
+...     result = parse(conf_path)
+...     cache.put('ip', ingest.parser_version, conf_path, result)
+
+vendor_index is a much smaller companion used by filelib.get_config_list.  It
+remembers the RANCID-CONTENT-TYPE of every config by inode, mtime and size, so
+listing a directory only reads the first line of configs that changed.  It
+lives in ~/.config_vendor_index.json (or VENDOR_INDEX_FILE) and is also turned
+off by PARSE_CACHE=off.
+'''
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+from os import environ
+
+default_path = os.path.join(os.path.expanduser('~'),
+  '.config_parse_cache.json')
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_version(*modules):
+    '''
+    Returns a version string for parse results that changes whenever the
+    source of any of the given modules changes.
+    '''
+    digest = hashlib.blake2b(digest_size=8)
+    for module in modules:
+        with open(module.__file__, 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+class ParseCache(object):
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = True
+        # kind -> {absolute config path: {'mtime', 'size', 'hash', 'version',
+        # 'result'}}
+        self.entries = {}
+        self.loaded = False
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, version, conf_path, stat_result=None):
+        '''
+        Returns (True, result) if conf_path was parsed by this version of the
+        parser and has not changed since, otherwise (False, None).  Pass the
+        os.stat() result if the caller already has it.
+        '''
+        if not self.enabled:
+            return False, None
+        self.load()
+        if stat_result is None:
+            try:
+                stat_result = os.stat(conf_path)
+            except OSError:
+                return False, None
+        with self.lock:
+            entry = self.entries.get(kind, {}).get(os.path.abspath(conf_path))
+        if entry is None or entry['version'] != version:
+            self.misses += 1
+            return False, None
+        if (entry['mtime'] != stat_result.st_mtime_ns or
+          entry['size'] != stat_result.st_size):
+            # Rancid rewrites configs that did not change
+            try:
+                same = entry['hash'] == file_hash(conf_path)
+            except OSError:
+                same = False
+            if not same:
+                self.misses += 1
+                return False, None
+            with self.lock:
+                entry['mtime'] = stat_result.st_mtime_ns
+                entry['size'] = stat_result.st_size
+                self.dirty = True
+        self.hits += 1
+        return True, entry['result']
+
+    def put(self, kind, version, conf_path, result, stat_result=None):
+        '''
+        Stores the result of parsing conf_path.  stat_result should be taken
+        before the file was read, so that a config that changes while it is
+        parsed is parsed again next time.
+        '''
+        if not self.enabled:
+            return
+        self.load()
+        try:
+            if stat_result is None:
+                stat_result = os.stat(conf_path)
+            digest = file_hash(conf_path)
+            if os.stat(conf_path).st_mtime_ns != stat_result.st_mtime_ns:
+                return
+        except OSError:
+            return
+        with self.lock:
+            self.entries.setdefault(kind, {})[os.path.abspath(conf_path)] = {
+                'mtime': stat_result.st_mtime_ns,
+                'size': stat_result.st_size,
+                'hash': digest,
+                'version': version,
+                'result': result,
+            }
+            self.dirty = True
+
+    def invalidate(self, kind=None):
+        self.load()
+        with self.lock:
+            if kind is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(kind, None)
+            self.dirty = True
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, 'rt') as fh:
+                entries = json.load(fh)
+        except Exception as e:
+            print('Ignoring unreadable parse cache {0}: {1}'.format(
+              self.path, e))
+            return
+        with self.lock:
+            for kind, kind_entries in entries.items():
+                self.entries.setdefault(kind, {}).update(kind_entries)
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            entries = {kind: {conf_path: entry
+              for conf_path, entry in kind_entries.items()
+              if os.path.exists(conf_path)}
+              for kind, kind_entries in self.entries.items()}
+            self.dirty = False
+        # write then rename so a concurrent reader never sees half a file
+        tmp_path = '{0}.{1}'.format(self.path, os.getpid())
+        with open(tmp_path, 'wt') as fh:
+            fh.write(json.dumps(entries))
+        os.replace(tmp_path, self.path)
+
+class VendorIndex(object):
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = True
+        # absolute directory -> {file name: [inode, mtime, size, vendor]}
+        self.dirs = {}
+        self.loaded = False
+        self.dirty = False
+
+    def directory(self, dirname):
+        '''
+        Returns {file name: [inode, mtime, size, vendor]} as last seen in
+        dirname.  The caller must not change it; use update().
+        '''
+        if not self.enabled:
+            return {}
+        self.load()
+        return self.dirs.get(os.path.abspath(dirname), {})
+
+    def update(self, dirname, entries, complete=False):
+        '''
+        Records the entries seen in dirname.  With complete, entries is the
+        whole directory and files missing from it are forgotten.
+        '''
+        if not self.enabled:
+            return
+        self.load()
+        dir_key = os.path.abspath(dirname)
+        known = self.dirs.get(dir_key, {})
+        if complete:
+            if entries != known:
+                self.dirs[dir_key] = entries
+                self.dirty = True
+        elif any(known.get(name) != entry for name, entry in entries.items()):
+            self.dirs[dir_key] = dict(known, **entries)
+            self.dirty = True
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, 'rt') as fh:
+                self.dirs = json.load(fh)
+        except Exception as e:
+            print('Ignoring unreadable vendor index {0}: {1}'.format(
+              self.path, e))
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        self.dirty = False
+        tmp_path = '{0}.{1}'.format(self.path, os.getpid())
+        with open(tmp_path, 'wt') as fh:
+            fh.write(json.dumps(self.dirs))
+        os.replace(tmp_path, self.path)
+
+cache_path = os.path.expanduser(environ.get('PARSE_CACHE_FILE', default_path))
+cache = ParseCache(path=cache_path)
+vendor_index_path = os.path.expanduser(environ.get('VENDOR_INDEX_FILE',
+  os.path.join(os.path.expanduser('~'), '.config_vendor_index.json')))
+vendor_index = VendorIndex(path=vendor_index_path)
+if environ.get('PARSE_CACHE', '').lower() in ('off', 'no', '0', 'false'):
+    cache.enabled = False
+    vendor_index.enabled = False
+else:
+    atexit.register(cache.save)
+    atexit.register(vendor_index.save)
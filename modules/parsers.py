@@ -1,35 +1,48 @@
 #!/usr/bin/env python3
 
-import re
 import sys
 import modules.shared_regex as rgx
 
+# Each parser reads a config once, line by line.  Every pattern is compiled
+# once in shared_regex, and is only searched for on lines that contain a
+# literal the pattern itself requires ('address' for an address, '{' for a
+# Junos stanza, ...), so most lines are passed over without running a regex at
+# all.  The patterns are still tried in their original order, so a line is
+# handled by the same rule as before.  tools/config_parse_bench.py checks that
+# the results are unchanged and measures the difference.
+
 def ios(hostname, E, host_ip_dict):
     def parse_intf(intf, E):
         intf_dict = {intf: []}
         while True:
             (num, line) = next(E)
-            # standard ip address or secondary
-            ios_intf_ip_v4_match = rgx.ios_intf_ip_v4.search(line)
-            if ios_intf_ip_v4_match:
-                ip_v4 = ios_intf_ip_v4_match.group(1)
-                netmask = ios_intf_ip_v4_match.group(3)
-                # convert from 255.255.255.x format to CIDR
-                netmask = sum(bin(int(x)).count('1') for x in netmask.split('.'))
-                netmask = str(netmask)
-                intf_dict[intf].append((ip_v4, netmask))
+            if 'address' in line:
+                # standard ip address or secondary
+                ios_intf_ip_v4_match = rgx.ios_intf_ip_v4.search(line)
+                if ios_intf_ip_v4_match:
+                    ip_v4 = ios_intf_ip_v4_match.group(1)
+                    netmask = ios_intf_ip_v4_match.group(3)
+                    # convert from 255.255.255.x format to CIDR
+                    netmask = sum(
+                      bin(int(x)).count('1') for x in netmask.split('.'))
+                    netmask = str(netmask)
+                    intf_dict[intf].append((ip_v4, netmask))
             # hsrp
-            nhrp_ip_v4_match = rgx.nhrp_ip_v4.search(line)
-            if nhrp_ip_v4_match:
-                nhrp_ip_v4 = nhrp_ip_v4_match.group(3)
-                intf_dict[intf].append((nhrp_ip_v4, 'hsrp'))
-            if re.search('^!?$', line):
+            if 'standby' in line or 'vrrp' in line:
+                nhrp_ip_v4_match = rgx.nhrp_ip_v4.search(line)
+                if nhrp_ip_v4_match:
+                    nhrp_ip_v4 = nhrp_ip_v4_match.group(3)
+                    intf_dict[intf].append((nhrp_ip_v4, 'hsrp'))
+            # ^!?$
+            if line in ('!\n', '\n', '!', ''):
                 return intf_dict
     while True:
         try:
             (num, line) = next(E)
         except StopIteration as e:
             return host_ip_dict
+        if not line.startswith('interface'):
+            continue
         ios_intf_match = rgx.ios_intf.search(line)
         if ios_intf_match:
             # just take the first two letters
@@ -45,20 +58,24 @@ def nxos(hostname, E, host_ip_dict):
         while True:
             (num, line) = next(E)
             # standard ip address or secondary
-            nxos_intf_ip_v4_match = rgx.nxos_intf_ip_v4.search(line)
-            if nxos_intf_ip_v4_match:
-                ip_v4, netmask = nxos_intf_ip_v4_match.group(1).split('/')
-                intf_dict[intf].append((ip_v4, netmask))
+            if 'address' in line:
+                nxos_intf_ip_v4_match = rgx.nxos_intf_ip_v4.search(line)
+                if nxos_intf_ip_v4_match:
+                    ip_v4, netmask = nxos_intf_ip_v4_match.group(1).split('/')
+                    intf_dict[intf].append((ip_v4, netmask))
             # no hsrp support at this time
-            if re.search('^cli', line):
+            if line.startswith('cli'):
                 return intf_dict
-            if re.search('^\w?$', line):
+            # at most one character and the newline
+            if len(line) <= 2 and rgx.nxos_intf_end.search(line):
                 return intf_dict
     while True:
         try:
             (num, line) = next(E)
         except StopIteration as e:
             return host_ip_dict
+        if not line.startswith('interface'):
+            continue
         ios_intf_match = rgx.ios_intf.search(line)
         if ios_intf_match:
             # just take the first two letters
@@ -74,35 +91,44 @@ def junos(hostname, E, host_ip_dict):
         intfs_dict = {}
         while True:
             (num, line) = next(E)
-            junos_intf_match = rgx.junos_intf.search(line)
-            junos_irb_match  = re.search(r'\sirb\s{', line)
-            junos_unit_match = re.search(r'\sunit\s(\d+)\s{', line)
-            junos_intf_ip_v4_match = rgx.junos_intf_ip_v4.search(line)
-            junos_vrrp_v4_match = rgx.junos_vrrp_v4.search(line)
-            if junos_intf_match:
-                intf = junos_intf_match.group(1)
-                full_intf = intf
-                intfs_dict[intf] = []
-            elif junos_irb_match:
-                intf = 'irb'
-                full_intf = intf
-                intfs_dict[intf] = []
-            elif junos_unit_match:
-                # sometimes units will be detected in member ranges that can be
-                # ignored for now
-                unit = junos_unit_match.group(1)
-                try:
-                    full_intf = '.'.join([intf, unit])
-                except UnboundLocalError as e:
+            if '{' in line:
+                junos_intf_match = rgx.junos_intf.search(line)
+                if junos_intf_match:
+                    intf = junos_intf_match.group(1)
+                    full_intf = intf
+                    intfs_dict[intf] = []
+                    continue
+                if 'irb' in line and rgx.junos_irb.search(line):
+                    intf = 'irb'
+                    full_intf = intf
+                    intfs_dict[intf] = []
                     continue
-                intfs_dict[full_intf] = []
-            elif junos_intf_ip_v4_match:
-                ip_v4, netmask = junos_intf_ip_v4_match.group(1).split('/')
-                intfs_dict[full_intf].append((ip_v4, netmask))
-            elif junos_vrrp_v4_match:
-                vrrp_ip_v4 = junos_vrrp_v4_match.group(1)
-                intfs_dict[full_intf].append((vrrp_ip_v4, 'vrrp'))
-            elif re.search('^}$', line):
+                if 'unit' in line:
+                    junos_unit_match = rgx.junos_unit.search(line)
+                    if junos_unit_match:
+                        # sometimes units will be detected in member ranges
+                        # that can be ignored for now
+                        unit = junos_unit_match.group(1)
+                        try:
+                            full_intf = '.'.join([intf, unit])
+                        except UnboundLocalError as e:
+                            continue
+                        intfs_dict[full_intf] = []
+                        continue
+            if 'address' in line:
+                junos_intf_ip_v4_match = rgx.junos_intf_ip_v4.search(line)
+                if junos_intf_ip_v4_match:
+                    ip_v4, netmask = junos_intf_ip_v4_match.group(1).split('/')
+                    intfs_dict[full_intf].append((ip_v4, netmask))
+                    continue
+                if 'virtual-address' in line:
+                    junos_vrrp_v4_match = rgx.junos_vrrp_v4.search(line)
+                    if junos_vrrp_v4_match:
+                        vrrp_ip_v4 = junos_vrrp_v4_match.group(1)
+                        intfs_dict[full_intf].append((vrrp_ip_v4, 'vrrp'))
+                        continue
+            # ^}$
+            elif line in ('}\n', '}'):
                 return intfs_dict
     def parse_nodes(E, node):
         # yes, massively redundant to the parse_intfs function above but trying
@@ -110,24 +136,30 @@ def junos(hostname, E, host_ip_dict):
         intfs_dict = {}
         while True:
             (num, line) = next(E)
-            junos_intf_match = rgx.junos_intf.search(line)
-            junos_unit_match = re.search(r'\sunit\s(\d+)\s{', line)
-            junos_intf_ip_v4_match = rgx.junos_intf_ip_v4.search(line)
-            if junos_intf_match:
-                intf = junos_intf_match.group(1)
-                full_intf = intf
-                intfs_dict[intf] = []
-            elif junos_unit_match:
-                # sometimes units will be detected in member ranges that can be
-                # ignored for now
-                unit = junos_unit_match.group(1)
-                full_intf = '.'.join([node, intf, unit])
-                intfs_dict[full_intf] = []
-            elif junos_intf_ip_v4_match:
-                ip_v4, netmask = junos_intf_ip_v4_match.group(1).split('/')
-                intfs_dict[full_intf].append((ip_v4, netmask))
-            elif re.search('^\s\s\s\s}$', line):
-                return intfs_dict
+            if '{' in line:
+                junos_intf_match = rgx.junos_intf.search(line)
+                if junos_intf_match:
+                    intf = junos_intf_match.group(1)
+                    full_intf = intf
+                    intfs_dict[intf] = []
+                    continue
+                if 'unit' in line:
+                    junos_unit_match = rgx.junos_unit.search(line)
+                    if junos_unit_match:
+                        # sometimes units will be detected in member ranges
+                        # that can be ignored for now
+                        unit = junos_unit_match.group(1)
+                        full_intf = '.'.join([node, intf, unit])
+                        intfs_dict[full_intf] = []
+                        continue
+            if 'address' in line:
+                junos_intf_ip_v4_match = rgx.junos_intf_ip_v4.search(line)
+                if junos_intf_ip_v4_match:
+                    ip_v4, netmask = junos_intf_ip_v4_match.group(1).split('/')
+                    intfs_dict[full_intf].append((ip_v4, netmask))
+            elif line.endswith(('}\n', '}')):
+                if rgx.junos_node_end.search(line):
+                    return intfs_dict
     while True:
         try:
             (num, line) = next(E)
@@ -136,7 +168,7 @@ def junos(hostname, E, host_ip_dict):
         if line.startswith('interfaces {'):
             intfs_dict = parse_intfs(E)
             host_ip_dict[hostname].update(intfs_dict)
-        else:
+        elif 'node' in line:
             junos_node_match = rgx.junos_node.search(line)
             if junos_node_match:
                 node = junos_node_match.group(1)
@@ -145,7 +177,7 @@ def junos(hostname, E, host_ip_dict):
                     if 'interfaces {' in line:
                         intfs_dict = parse_nodes(E, node)
                         host_ip_dict[hostname].update(intfs_dict)
-                        break                        
+                        break
 
 def netscr(hostname, E, host_ip_dict):
     while True:
@@ -153,6 +185,8 @@ def netscr(hostname, E, host_ip_dict):
             (num, line) = next(E)
         except StopIteration as e:
             return host_ip_dict
+        if 'interface' not in line:
+            continue
         netscr_intf_ip_v4_match = rgx.netscr_intf_ip_v4.search(line)
         if netscr_intf_ip_v4_match:
             intf = netscr_intf_ip_v4_match.group(1)
@@ -170,22 +204,27 @@ def cumulus(hostname, E, host_ip_dict):
         intf_dict = {intf: []}
         while True:
             (num, line) = next(E)
-            cumul_intf_ip_v4_match = rgx.cumul_intf_ip_v4.search(line)
-            if cumul_intf_ip_v4_match:
-                ip_v4, netmask = cumul_intf_ip_v4_match.group(1).split('/')
-                intf_dict[intf].append((ip_v4, netmask))
-            # vrrp
-            cumul_vrrp_v4_match = rgx.cumul_vrrp_v4.search(line)
-            if cumul_vrrp_v4_match:
-                vrrp_ip_v4 = cumul_vrrp_v4_match.group(1)
-                intf_dict[intf].append((vrrp_ip_v4, 'vrrp'))
-            if re.search('^$', line):
+            if 'address' in line:
+                cumul_intf_ip_v4_match = rgx.cumul_intf_ip_v4.search(line)
+                if cumul_intf_ip_v4_match:
+                    ip_v4, netmask = cumul_intf_ip_v4_match.group(1).split('/')
+                    intf_dict[intf].append((ip_v4, netmask))
+                # vrrp
+                if 'address-virtual' in line:
+                    cumul_vrrp_v4_match = rgx.cumul_vrrp_v4.search(line)
+                    if cumul_vrrp_v4_match:
+                        vrrp_ip_v4 = cumul_vrrp_v4_match.group(1)
+                        intf_dict[intf].append((vrrp_ip_v4, 'vrrp'))
+            # ^$
+            elif line in ('\n', ''):
                 return intf_dict
     while True:
         try:
             (num, line) = next(E)
         except StopIteration as e:
             return host_ip_dict
+        if not line.startswith('interface'):
+            continue
         cumul_intf_match = rgx.cumul_intf.search(line)
         if cumul_intf_match:
             # just take the first two letters
@@ -0,0 +1,157 @@
+#!/bin/env python3
+
+'''
+Compact storage for full routing tables.  Each route is kept as four packed
+integers (network, mask length, next hop, protocol) in parallel arrays, which
+is about 10 bytes per route instead of the several hundred bytes taken by an
+IPv4Network object.  A 900k route Internet table fits in under 10MB.
+
+Filtering is vectorized with NumPy when it is installed and falls back to
+plain loops over the arrays otherwise.
+
+>>> table = snmp_tools.get_route_table('edge01', snmp_comm)
+>>> len(table)
+912345
+>>> bgp_10 = table.filter(protocol='bgp', within='10.0.0.0/8')
+>>> bgp_10.to_networks()[:2]
+[IPv4Network('10.1.0.0/16'), IPv4Network('10.2.0.0/16')]
+'''
+
+import array
+import ipaddress
+import macaddr
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# ipCidrRouteProto values, named as get_routes names them where it can
+route_proto_map = {
+    1: 'other',
+    2: 'connected',
+    3: 'static',
+    8: 'rip',
+    9: 'isis',
+    11: 'igrp',
+    13: 'ospf',
+    14: 'bgp',
+    16: 'eigrp',
+}
+route_proto_nums = {v: k for k, v in route_proto_map.items()}
+
+def octets_to_int(octets):
+    '''
+    Converts four decimal octet strings, e.g. ['10', '1', '0', '0'], to an int.
+    '''
+    return ((int(octets[0]) << 24) | (int(octets[1]) << 16) |
+      (int(octets[2]) << 8) | int(octets[3]))
+
+class RouteTable(object):
+    '''
+    Parallel arrays of routes.  Networks and next hops are stored as 32-bit
+    integers, mask lengths and protocol numbers as bytes.
+    '''
+    def __init__(self):
+        self.network = macaddr.uint32_array()
+        self.masklen = array.array('B')
+        self.next_hop = macaddr.uint32_array()
+        self.proto = array.array('B')
+
+    def __len__(self):
+        return len(self.network)
+
+    def __iter__(self):
+        '''
+        Yields (IPv4Network, next hop, protocol name) tuples.  Objects are only
+        created for the route being yielded.
+        '''
+        for i in range(len(self.network)):
+            yield self.route(i)
+
+    def append(self, network, masklen, next_hop, proto):
+        self.network.append(network)
+        self.masklen.append(masklen)
+        self.next_hop.append(next_hop)
+        self.proto.append(proto)
+
+    def append_index(self, index, proto):
+        '''
+        Adds a route from the 13 arcs of an ipCidrRouteTable index
+        (dest.mask.tos.next_hop) split into strings.
+        '''
+        mask = octets_to_int(index[4:8])
+        self.append(octets_to_int(index[0:4]), bin(mask).count('1'),
+          octets_to_int(index[9:13]), proto)
+
+    def route(self, i):
+        network = ipaddress.IPv4Network(
+          (self.network[i], self.masklen[i]), strict=False)
+        next_hop = str(ipaddress.IPv4Address(self.next_hop[i]))
+        proto = route_proto_map.get(self.proto[i], str(self.proto[i]))
+        return network, next_hop, proto
+
+    def to_networks(self):
+        '''
+        Returns a list of IPv4Network objects, the format get_routes returns.
+        Only do this on a filtered table.
+        '''
+        return [ipaddress.IPv4Network((net, masklen), strict=False)
+          for net, masklen in zip(self.network, self.masklen)]
+
+    def _select(self, selected):
+        table = RouteTable()
+        if numpy is not None and isinstance(selected, numpy.ndarray):
+            for name in ('network', 'masklen', 'next_hop', 'proto'):
+                column = getattr(self, name)
+                values = numpy.frombuffer(column, dtype=_dtype(column))
+                getattr(table, name).frombytes(values[selected].tobytes())
+            return table
+        for i in selected:
+            table.append(self.network[i], self.masklen[i], self.next_hop[i],
+              self.proto[i])
+        return table
+
+    def filter(self, protocol=None, within=None):
+        '''
+        Returns a new RouteTable with the routes learned by protocol (a name
+        from route_proto_map or a number) and/or contained in the within
+        prefix (a string or IPv4Network).
+        '''
+        if isinstance(protocol, str):
+            protocol = route_proto_nums[protocol]
+        if within is not None:
+            within = ipaddress.IPv4Network(within)
+            within_net = int(within.network_address)
+            within_mask = int(within.netmask)
+            within_len = within.prefixlen
+        if numpy is not None:
+            selected = numpy.ones(len(self), dtype=bool)
+            if protocol is not None:
+                proto = numpy.frombuffer(self.proto, dtype=numpy.uint8)
+                selected &= proto == protocol
+            if within is not None:
+                network = numpy.frombuffer(
+                  self.network, dtype=_dtype(self.network))
+                masklen = numpy.frombuffer(self.masklen, dtype=numpy.uint8)
+                selected &= (network & within_mask) == within_net
+                selected &= masklen >= within_len
+            return self._select(selected)
+        selected = range(len(self))
+        if protocol is not None:
+            proto = self.proto
+            selected = [i for i in selected if proto[i] == protocol]
+        if within is not None:
+            network = self.network
+            masklen = self.masklen
+            selected = [i for i in selected if
+              network[i] & within_mask == within_net and
+              masklen[i] >= within_len]
+        return self._select(selected)
+
+def _dtype(column):
+    if column.typecode == 'B':
+        return numpy.uint8
+    if column.itemsize == 4:
+        return numpy.uint32
+    return numpy.uint64
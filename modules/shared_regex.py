@@ -17,10 +17,13 @@ ios_intf_ip_v4 = re.compile(r'ip\saddress\s((\d+\.){3}\d+)\s((\d+\.){3}\d+)')
 
 # nexus
 nxos_intf_ip_v4 = re.compile(r'ip\saddress\s((\d+\.){3}\d+\/\d+)')
+nxos_intf_end = re.compile(r'^\w?$')
 
 # junos
 #junos_intf = re.compile(r'^\s+([a-z]+\-?[\d\/]+)\s{')
 junos_intf = re.compile(r'^\s+(\S+\d(\S+)?)\s{')
+junos_irb = re.compile(r'\sirb\s{')
+junos_unit = re.compile(r'\sunit\s(\d+)\s{')
 model = re.compile(r'Model:\s(\S+)')
 junos_version = re.compile(r'Junos:\s(\S+)')
                                                    # check paren> v  v
@@ -29,6 +32,7 @@ junos_intf_ip_v4 = re.compile(r'\saddress\s((\d+\.){3}\d+\/\d+)(\s{|;)')
 # junos srx
 srx_version = re.compile(r'JUNOS\sSoftware\sRelease\s\[(\S+)\]')
 junos_node = re.compile(r'\s+(node\d+)\s{')
+junos_node_end = re.compile(r'^\s\s\s\s}$')
 
 # junos other
 ex_version = re.compile(r'JUNOS\sEX\s+Software\sSuite\s\[(\S+)\]')
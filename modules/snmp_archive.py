@@ -0,0 +1,291 @@
+#!/bin/env python3
+
+'''
+Record-and-replay archive of SNMP results.
+
+With recording on, every GET and walk made through snmp_tools is appended to
+the archive as it arrives: the host, the operation, the OIDs asked for, the
+time and the varbinds, BER encoded exactly as the agent returned them.  The
+'replay' backend of snmp_tools answers GETs and walks from the archive instead
+of the network, so a getter that misbehaved on a device can be rerun against
+what the device actually said, and reports can be rebuilt from a snapshot at
+disk speed without touching production.
+
+    export SNMP_ARCHIVE=~/snmp_archive
+    SNMP_RECORD=on ./mac_locate.py --switches accsw01 0050.5695.406e
+    SNMP_BACKEND=replay ./mac_locate.py --switches accsw01 0050.5695.406e
+
+The archive is a directory with one gzipped JSON lines file per host.  Every
+record is its own gzip member, so threads and processes can append to the same
+file, and a file cut short by a crash only loses its last record:
+
+    {"time": 1760780000.12, "op": "walk", "context": "", "oids": [...],
+     "varbinds": "<base64 BER>", "end": true}
+
+The community is never stored, only the VLAN context of community@vlan.  Big
+walks are written in chunks as they stream in and the last chunk is marked
+"end", so a walk that failed half way is never replayed.
+
+Replay serves the latest complete record for every (context, op, OIDs), or the
+latest at or before SNMP_REPLAY_AT (epoch seconds or an ISO 8601 time).  A
+request the archive has no record for raises ReplayMiss, which the getters
+treat like a device that did not answer.
+
+The text snmpget() and snmpbulkwalk() calls of the subprocess backend return
+MIB-resolved net-snmp output and are not recorded.
+'''
+
+import base64
+import collections
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+import urllib.parse
+from os import environ
+import snmp_engine
+
+default_path = os.path.join(os.path.expanduser('~'), 'snmp_archive')
+
+class ReplayMiss(snmp_engine.SnmpError):
+    '''
+    Raised when the archive has no record of a request.
+    '''
+    pass
+
+def parse_time(text):
+    '''
+    Converts epoch seconds or an ISO 8601 time ('2026-10-18T06:00') to epoch
+    seconds.
+    '''
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.datetime.fromisoformat(text).timestamp()
+
+def _context(snmp_comm):
+    return snmp_comm.partition('@')[2]
+
+def _encode(varbinds):
+    return base64.b64encode(
+      snmp_engine.encode_varbinds(varbinds)).decode('ascii')
+
+class WalkWriter(object):
+    '''
+    Appends a walk to the archive in chunks of chunk_size varbinds.
+    '''
+    def __init__(self, archive, host, context, op, oid_list):
+        self.archive = archive
+        self.host = host
+        self.record = {'time': time.time(), 'op': op, 'context': context,
+                       'oids': list(oid_list)}
+        self.varbinds = []
+
+    def add(self, varbind):
+        self.varbinds.append(varbind)
+        if len(self.varbinds) >= self.archive.chunk_size:
+            self.flush()
+
+    def flush(self, end=False):
+        record = dict(self.record, varbinds=_encode(self.varbinds))
+        if end:
+            record['end'] = True
+        self.archive.append(self.host, record)
+        self.varbinds = []
+
+    def finish(self):
+        self.flush(end=True)
+
+class Archive(object):
+    def __init__(self, path, at=None, chunk_size=10000):
+        self.path = path
+        # replay the archive as of this time, None for the latest records
+        self.at = at
+        self.chunk_size = chunk_size
+        self.recording = False
+        # host -> {context: (MibView, set of walked OID tuples)}
+        self.snapshots = {}
+        self.lock = threading.Lock()
+
+    def host_path(self, host):
+        return os.path.join(self.path, '{0}.jsonl.gz'.format(
+          urllib.parse.quote(host, safe='')))
+
+    def hosts(self):
+        '''
+        Returns the hosts with records in the archive.
+        '''
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(urllib.parse.unquote(name[:-len('.jsonl.gz')])
+          for name in os.listdir(self.path) if name.endswith('.jsonl.gz'))
+
+    # ---- recording
+
+    def append(self, host, record):
+        data = gzip.compress((json.dumps(record) + '\n').encode('utf-8'))
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            # a single O_APPEND write keeps concurrent writers from
+            # interleaving inside a record
+            fd = os.open(self.host_path(host),
+              os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            self.snapshots.pop(host, None)
+
+    def record(self, host, snmp_comm, op, oid_list, varbinds):
+        '''
+        Appends a complete GET or walk result.
+        '''
+        writer = WalkWriter(self, host, _context(snmp_comm), op, oid_list)
+        writer.varbinds = list(varbinds)
+        writer.finish()
+
+    def record_iter(self, host, snmp_comm, op, oid_list, varbinds):
+        '''
+        Passes the varbinds of a walk through, appending them to the archive as
+        they go.  The walk is only marked complete if it runs to the end.
+        '''
+        writer = WalkWriter(self, host, _context(snmp_comm), op, oid_list)
+        for varbind in varbinds:
+            writer.add(varbind)
+            yield varbind
+        writer.finish()
+
+    # ---- replay
+
+    def read(self, host):
+        '''
+        Returns the records of host in the order they were written.
+        '''
+        path = self.host_path(host)
+        records = []
+        if not os.path.isfile(path):
+            return records
+        try:
+            with gzip.open(path, 'rt') as f:
+                for line in f:
+                    records.append(json.loads(line))
+        except (OSError, EOFError, ValueError) as e:
+            print('SNMP archive {0} is damaged, using the first {1} records: '
+              '{2}'.format(path, len(records), e))
+        return records
+
+    def history(self, host):
+        '''
+        Returns [(time, op, context, oids),...] for the complete records of
+        host, oldest first.
+        '''
+        return sorted((record['time'], record['op'], record['context'],
+          record['oids']) for record in self.read(host) if record.get('end'))
+
+    def snapshot(self, host):
+        '''
+        Returns {context: (MibView, set of walked OID tuples)} for host as of
+        self.at.
+        '''
+        with self.lock:
+            snapshot = self.snapshots.get(host)
+        if snapshot is not None:
+            return snapshot
+        # (context, op, oids, time) -> [chunks, complete]
+        groups = collections.OrderedDict()
+        for record in self.read(host):
+            key = (record['context'], record['op'], tuple(record['oids']),
+              record['time'])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [[], False]
+            group[0].append(record['varbinds'])
+            if record.get('end'):
+                group[1] = True
+        latest = {}
+        for (context, op, oid_list, when), (chunks, complete) in \
+          groups.items():
+            if not complete or (self.at is not None and when > self.at):
+                continue
+            key = (context, op, oid_list)
+            if key not in latest or latest[key][0] < when:
+                latest[key] = (when, chunks)
+        contexts = {}
+        # newer records win where the same OIDs were fetched more than once
+        for (context, op, oid_list), (when, chunks) in sorted(latest.items(),
+          key=lambda item: item[1][0]):
+            if context not in contexts:
+                contexts[context] = ({}, set())
+            data, roots = contexts[context]
+            if op == 'walk':
+                # a walk replaces everything under its roots, so rows that an
+                # older walk (under other OIDs) returned and this one did not
+                # are gone, as they are from the device
+                walked = [snmp_engine.oid_to_tuple(oid) for oid in oid_list]
+                for oid in [oid for oid in data if any(
+                  oid[:len(root)] == root for root in walked)]:
+                    del data[oid]
+            for chunk in chunks:
+                for oid, value in snmp_engine.decode_varbinds(
+                  base64.b64decode(chunk)):
+                    data[snmp_engine.oid_to_tuple(oid)] = value
+            if op == 'walk':
+                roots.update(snmp_engine.oid_to_tuple(oid) for oid in oid_list)
+        snapshot = {context: (snmp_engine.MibView(data), roots)
+          for context, (data, roots) in contexts.items()}
+        with self.lock:
+            self.snapshots[host] = snapshot
+        return snapshot
+
+    def _view(self, host, snmp_comm):
+        view = self.snapshot(host).get(_context(snmp_comm))
+        if view is None:
+            raise ReplayMiss('No records for {0} in {1}.'.format(host,
+              self.path))
+        return view
+
+    def get(self, host, snmp_comm, oid_list):
+        '''
+        Answers a GET from the archive.  OIDs inside a recorded walk that the
+        walk did not return are NO_SUCH_INSTANCE, as the device would say.
+        '''
+        view, roots = self._view(host, snmp_comm)
+        varbinds = []
+        for oid in oid_list:
+            oid = oid.strip('.')
+            oid_tuple = snmp_engine.oid_to_tuple(oid)
+            if oid_tuple not in view and not any(
+              oid_tuple[:len(root)] == root for root in roots):
+                raise ReplayMiss('No record of {0} for {1}.'.format(oid, host))
+            varbinds.append((oid, view.get(oid_tuple)))
+        return varbinds
+
+    def walk(self, host, snmp_comm, oid):
+        '''
+        Replays a walk of the subtree under oid.
+        '''
+        view, roots = self._view(host, snmp_comm)
+        root = snmp_engine.oid_to_tuple(oid)
+        found = False
+        for vb_oid, value in view.subtree(root):
+            found = True
+            yield snmp_engine.tuple_to_oid(vb_oid), value
+        if found:
+            return
+        if root in view:
+            # walking a full instance OID returns its value
+            value = view.get(root)
+            if not snmp_engine.is_exception(value):
+                yield snmp_engine.tuple_to_oid(root), value
+        elif not any(root[:len(walked)] == walked for walked in roots):
+            raise ReplayMiss('No record of a walk of {0} for {1}.'.format(
+              oid, host))
+
+archive_path = os.path.expanduser(environ.get('SNMP_ARCHIVE', default_path))
+archive = Archive(archive_path)
+if environ.get('SNMP_REPLAY_AT'):
+    archive.at = parse_time(environ['SNMP_REPLAY_AT'])
+if environ.get('SNMP_RECORD', '').lower() in ('on', 'yes', '1', 'true'):
+    archive.recording = True
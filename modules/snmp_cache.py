@@ -0,0 +1,256 @@
+#!/bin/env python3
+
+'''
+Result cache for slow-changing SNMP data such as system info, interface maps
+and VLAN lists.  Entries expire after a per-family TTL, the least recently used
+entries are evicted once the cache is full, and concurrent requests for the
+same key share one in-flight query instead of each polling the device.  The key
+is the family, the host and every other argument of the getter, so a call with
+a different (or wrong) community never gets another call's result.
+
+The snmp_tools getters that return slow-changing data are wrapped with
+@cached(family) and use the module level 'cache'.  To have short-lived scripts
+share results, point SNMP_CACHE_FILE at a file, e.g.:
+
+    export SNMP_CACHE_FILE=~/.snmp_cache.pickle
+
+The file is read when the module is imported and written when the script
+exits.  The keys hold the SNMP community, so the file is only readable by its
+owner, and one that is not owned by the user or that others can write is not
+loaded.  Set SNMP_CACHE=off to disable caching, or use cache.invalidate() to
+force a fresh poll.
+
+Every caller gets its own copy of a cached value, so long-running tools can
+modify results without corrupting what other callers see.
+'''
+
+import atexit
+import collections
+import copy
+import functools
+import inspect
+import os
+import pickle
+import threading
+import time
+from os import environ
+
+# seconds
+family_ttls = {
+    'sysinfo': 3600,
+    'serial_num': 86400,
+    'intf_maps': 900,
+    'vlan_list': 900,
+    'base_ports': 900,
+}
+default_ttl = 300
+
+CacheEntry = collections.namedtuple('CacheEntry', ['value', 'expires'])
+
+class _Flight(object):
+    __slots__ = ['event', 'value', 'error']
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+def is_failure(value):
+    '''
+    The getters return None, or a tuple of None, when a host does not answer.
+    Those results are never cached.
+    '''
+    if value is None:
+        return True
+    if isinstance(value, tuple) and all(v is None for v in value):
+        return True
+    return False
+
+class SnmpCache(object):
+    def __init__(self, max_entries=10000, ttls=None, path=None):
+        self.max_entries = max_entries
+        self.ttls = dict(family_ttls)
+        if ttls:
+            self.ttls.update(ttls)
+        self.path = path
+        self.enabled = True
+        self.entries = collections.OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def peek(self, family, host, args=()):
+        '''
+        Returns a copy of the cached value for (family, host, args) or None,
+        without polling.
+        '''
+        key = (family, host, args)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires <= time.time():
+                return None
+            self.entries.move_to_end(key)
+            value = entry.value
+        return copy.deepcopy(value)
+
+    def set(self, family, host, value, args=()):
+        key = (family, host, args)
+        expires = time.time() + self.ttls.get(family, default_ttl)
+        value = copy.deepcopy(value)
+        with self.lock:
+            self.entries[key] = CacheEntry(value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_or_call(self, family, host, func, args=()):
+        '''
+        Returns a copy of the cached value for (family, host, args), or calls
+        func() to fetch it.  args is a hashable tuple of whatever else the
+        result depends on.  If another thread is already fetching the same key
+        this waits for that result instead of polling again.
+        '''
+        if not self.enabled:
+            return func()
+        key = (family, host, args)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                flight = None
+            else:
+                entry = None
+                flight = self.inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self.inflight[key] = flight
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        if entry is not None:
+            return copy.deepcopy(entry.value)
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+        try:
+            value = func()
+            # set() keeps its own copy
+            flight.value = copy.deepcopy(value)
+            if not is_failure(value):
+                self.set(family, host, value, args)
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight.event.set()
+
+    def invalidate(self, host=None, family=None):
+        '''
+        Drops cached entries for a host, a family, both, or everything.
+        '''
+        with self.lock:
+            for key in list(self.entries):
+                if host is not None and key[1] != host:
+                    continue
+                if family is not None and key[0] != family:
+                    continue
+                del self.entries[key]
+
+    def load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            stat_result = os.stat(self.path)
+        except OSError:
+            return
+        # unpickling runs code, so only trust a file no one else can write
+        if (stat_result.st_uid != os.getuid() or
+          stat_result.st_mode & 0o022):
+            print('Ignoring SNMP cache {0}: not owned by this user or writable '
+              'by others.'.format(self.path))
+            return
+        try:
+            with open(self.path, 'rb') as fh:
+                entries = pickle.load(fh)
+        except Exception as e:
+            print('Ignoring unreadable SNMP cache {0}: {1}'.format(
+              self.path, e))
+            return
+        now = time.time()
+        with self.lock:
+            for key, entry in entries.items():
+                if entry.expires > now:
+                    self.entries[key] = entry
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self.lock:
+            entries = collections.OrderedDict((key, entry)
+              for key, entry in self.entries.items() if entry.expires > now)
+        # write then rename so a concurrent reader never sees half a file;
+        # created 0600 since the keys hold the community
+        tmp_path = '{0}.{1}'.format(self.path, os.getpid())
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(entries, fh)
+        os.replace(tmp_path, self.path)
+
+cache_path = environ.get('SNMP_CACHE_FILE')
+if cache_path:
+    cache_path = os.path.expanduser(cache_path)
+cache = SnmpCache(path=cache_path)
+if environ.get('SNMP_CACHE', '').lower() in ('off', 'no', '0', 'false'):
+    cache.enabled = False
+if cache_path:
+    atexit.register(cache.save)
+
+def cached(family):
+    '''
+    Decorator for getters that take the hostname as the first argument.  The
+    other arguments, with their defaults filled in, are part of the key, so
+    get_sysinfo(host, 'public') and get_sysinfo(host, snmp_comm='public') share
+    an entry and get_sysinfo(host, 'private') does not.  Calls with arguments
+    that cannot be hashed are not cached.
+
+    The undecorated function is available as .__wrapped__, and
+    .cache_args(hostname, ...) returns the args part of the key for peek().
+    '''
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cache_args(hostname, *args, **kwargs):
+            bound = signature.bind(hostname, *args, **kwargs)
+            bound.apply_defaults()
+            return tuple(bound.arguments.items())[1:]
+
+        @functools.wraps(func)
+        def wrapper(hostname, *args, **kwargs):
+            key_args = cache_args(hostname, *args, **kwargs)
+            try:
+                hash(key_args)
+            except TypeError:
+                return func(hostname, *args, **kwargs)
+            return cache.get_or_call(family, hostname,
+              lambda: func(hostname, *args, **kwargs), key_args)
+        wrapper.cache_args = cache_args
+        return wrapper
+    return decorator
@@ -0,0 +1,721 @@
+#!/bin/env python3
+
+'''
+A small, dependency free SNMPv2c engine.  PDUs are BER encoded and sent over a
+plain UDP socket so that polling does not require forking the net-snmp command
+line tools for every request.
+
+Responses are returned as lists of (oid, value) tuples.  OIDs are dotted
+strings without a leading '.', and values are typed:
+
+    INTEGER           int
+    OCTET STRING      bytes
+    NULL              None
+    OBJECT IDENTIFIER ObjectIdentifier (str)
+    IpAddress         IpAddress (str)
+    Counter32         Counter32 (int)
+    Gauge32           Gauge32 (int)
+    TimeTicks         TimeTicks (int)
+    Counter64         Counter64 (int)
+    Opaque            Opaque (bytes)
+
+The SNMPv2 exception values are returned as the singletons NO_SUCH_OBJECT,
+NO_SUCH_INSTANCE and END_OF_MIB_VIEW.
+
+>>> with Session('aubcore01', 'public') as s:
+...     s.get(['1.3.6.1.2.1.1.5.0'])
+[('1.3.6.1.2.1.1.5.0', b'aubcore01')]
+'''
+
+import bisect
+import random
+import socket
+import time
+
+SNMP_VERSION_2C = 1
+
+# universal tags
+ASN_INTEGER      = 0x02
+ASN_OCTET_STRING = 0x04
+ASN_NULL         = 0x05
+ASN_OID          = 0x06
+ASN_SEQUENCE     = 0x30
+
+# application tags
+ASN_IPADDRESS    = 0x40
+ASN_COUNTER32    = 0x41
+ASN_GAUGE32      = 0x42
+ASN_TIMETICKS    = 0x43
+ASN_OPAQUE       = 0x44
+ASN_COUNTER64    = 0x46
+
+# context tags for varbind exceptions
+ASN_NO_SUCH_OBJECT   = 0x80
+ASN_NO_SUCH_INSTANCE = 0x81
+ASN_END_OF_MIB_VIEW  = 0x82
+
+# PDU types
+PDU_GET      = 0xa0
+PDU_GETNEXT  = 0xa1
+PDU_RESPONSE = 0xa2
+PDU_GETBULK  = 0xa5
+
+error_status_map = {
+    0: 'noError',
+    1: 'tooBig',
+    2: 'noSuchName',
+    3: 'badValue',
+    4: 'readOnly',
+    5: 'genErr',
+    6: 'noAccess',
+    7: 'wrongType',
+    8: 'wrongLength',
+    9: 'wrongEncoding',
+    10: 'wrongValue',
+    11: 'noCreation',
+    12: 'inconsistentValue',
+    13: 'resourceUnavailable',
+    14: 'commitFailed',
+    15: 'undoFailed',
+    16: 'authorizationError',
+    17: 'notWritable',
+    18: 'inconsistentName',
+}
+
+class SnmpError(Exception):
+    '''
+    Raised for malformed responses and for responses with a non-zero
+    error-status.  The error_status attribute holds the name of the error, e.g.
+    'tooBig', or None when the response could not be decoded.
+    '''
+    def __init__(self, message, error_status=None, error_index=0):
+        super().__init__(message)
+        self.error_status = error_status
+        self.error_index = error_index
+
+class SnmpTimeout(SnmpError):
+    '''
+    Raised when no response is received after all retries.
+    '''
+    pass
+
+class Counter32(int):
+    tag = ASN_COUNTER32
+
+class Gauge32(int):
+    tag = ASN_GAUGE32
+
+class TimeTicks(int):
+    tag = ASN_TIMETICKS
+
+class Counter64(int):
+    tag = ASN_COUNTER64
+
+class IpAddress(str):
+    tag = ASN_IPADDRESS
+
+class ObjectIdentifier(str):
+    tag = ASN_OID
+
+class Opaque(bytes):
+    tag = ASN_OPAQUE
+
+class _VarbindException(object):
+    def __init__(self, tag, name, text):
+        self.tag = tag
+        self.name = name
+        self.text = text
+    def __repr__(self):
+        return self.name
+    def __bool__(self):
+        return False
+
+NO_SUCH_OBJECT = _VarbindException(ASN_NO_SUCH_OBJECT, 'NO_SUCH_OBJECT',
+  'No Such Object available on this agent at this OID')
+NO_SUCH_INSTANCE = _VarbindException(ASN_NO_SUCH_INSTANCE, 'NO_SUCH_INSTANCE',
+  'No Such Instance currently exists at this OID')
+END_OF_MIB_VIEW = _VarbindException(ASN_END_OF_MIB_VIEW, 'END_OF_MIB_VIEW',
+  'No more variables left in this MIB View (It is past the end of the MIB '
+  'tree)')
+
+varbind_exceptions = {
+    ASN_NO_SUCH_OBJECT: NO_SUCH_OBJECT,
+    ASN_NO_SUCH_INSTANCE: NO_SUCH_INSTANCE,
+    ASN_END_OF_MIB_VIEW: END_OF_MIB_VIEW,
+}
+
+def is_exception(value):
+    '''
+    Returns True if the value is one of the SNMPv2 varbind exceptions.
+    '''
+    return isinstance(value, _VarbindException)
+
+def oid_to_tuple(oid):
+    '''
+    Converts '1.3.6.1.2.1.1.5.0' (or '.1.3.6.1.2.1.1.5.0') to a tuple of ints.
+    '''
+    return tuple(int(arc) for arc in oid.strip('.').split('.'))
+
+def tuple_to_oid(oid_tuple):
+    return '.'.join(str(arc) for arc in oid_tuple)
+
+# ---------------------------------------------------------------------------
+# BER encoding
+# ---------------------------------------------------------------------------
+
+def encode_length(length):
+    if length < 0x80:
+        return bytes([length])
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(length_bytes)]) + length_bytes
+
+def encode_tlv(tag, value):
+    return bytes([tag]) + encode_length(len(value)) + value
+
+def encode_integer(num, tag=ASN_INTEGER):
+    length = (num.bit_length() + 8) // 8
+    return encode_tlv(tag, num.to_bytes(length, 'big', signed=True))
+
+def encode_unsigned(num, tag):
+    # a leading zero octet is added when the high bit is set so the value is
+    # not read back as negative
+    length = (num.bit_length() + 8) // 8
+    return encode_tlv(tag, num.to_bytes(length, 'big'))
+
+def encode_oid(oid):
+    if isinstance(oid, str):
+        oid = oid_to_tuple(oid)
+    if len(oid) < 2:
+        raise ValueError('OID must have at least two arcs: {0}'.format(oid))
+    arcs = [oid[0] * 40 + oid[1]] + list(oid[2:])
+    encoded = bytearray()
+    for arc in arcs:
+        chunk = [arc & 0x7f]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7f))
+            arc >>= 7
+        encoded.extend(reversed(chunk))
+    return encode_tlv(ASN_OID, bytes(encoded))
+
+def encode_value(value):
+    if value is None:
+        return encode_tlv(ASN_NULL, b'')
+    if is_exception(value):
+        return encode_tlv(value.tag, b'')
+    if isinstance(value, (Counter32, Gauge32, TimeTicks, Counter64)):
+        return encode_unsigned(value, value.tag)
+    if isinstance(value, IpAddress):
+        return encode_tlv(ASN_IPADDRESS, socket.inet_aton(value))
+    if isinstance(value, ObjectIdentifier):
+        return encode_oid(value)
+    if isinstance(value, Opaque):
+        return encode_tlv(ASN_OPAQUE, bytes(value))
+    if isinstance(value, bool):
+        raise TypeError('Cannot encode bool as an SNMP value.')
+    if isinstance(value, int):
+        return encode_integer(value)
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, (bytes, bytearray)):
+        return encode_tlv(ASN_OCTET_STRING, bytes(value))
+    raise TypeError('Cannot encode {0!r} as an SNMP value.'.format(value))
+
+def encode_varbinds(varbinds):
+    encoded = b''.join(
+      encode_tlv(ASN_SEQUENCE, encode_oid(oid) + encode_value(value))
+      for oid, value in varbinds)
+    return encode_tlv(ASN_SEQUENCE, encoded)
+
+def encode_message(community, pdu_type, request_id, varbinds, field1=0,
+  field2=0):
+    '''
+    Builds a complete SNMPv2c message.  For GETBULK requests field1 and field2
+    are non-repeaters and max-repetitions, otherwise they are error-status and
+    error-index.
+    '''
+    if isinstance(community, str):
+        community = community.encode('utf-8')
+    pdu = encode_tlv(pdu_type,
+      encode_integer(request_id) +
+      encode_integer(field1) +
+      encode_integer(field2) +
+      encode_varbinds(varbinds))
+    return encode_tlv(ASN_SEQUENCE,
+      encode_integer(SNMP_VERSION_2C) +
+      encode_tlv(ASN_OCTET_STRING, community) +
+      pdu)
+
+# ---------------------------------------------------------------------------
+# BER decoding
+# ---------------------------------------------------------------------------
+
+def decode_tlv(data, pos):
+    '''
+    Returns (tag, value_start, value_end) for the TLV that starts at pos.
+    '''
+    try:
+        tag = data[pos]
+        length = data[pos + 1]
+        pos += 2
+        if length & 0x80:
+            num_bytes = length & 0x7f
+            length = int.from_bytes(data[pos:pos + num_bytes], 'big')
+            pos += num_bytes
+    except IndexError:
+        raise SnmpError('Truncated BER data.')
+    end = pos + length
+    if end > len(data):
+        raise SnmpError('Truncated BER data.')
+    return tag, pos, end
+
+def decode_oid(data):
+    if not data:
+        raise SnmpError('Empty OID.')
+    arcs = []
+    arc = 0
+    for byte in data:
+        arc = (arc << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            arcs.append(arc)
+            arc = 0
+    first = arcs[0]
+    if first < 80:
+        arcs[0:1] = [first // 40, first % 40]
+    else:
+        arcs[0:1] = [2, first - 80]
+    return '.'.join(map(str, arcs))
+
+def decode_value(tag, data):
+    if tag == ASN_INTEGER:
+        return int.from_bytes(data, 'big', signed=True)
+    if tag == ASN_OCTET_STRING:
+        return bytes(data)
+    if tag == ASN_NULL:
+        return None
+    if tag == ASN_OID:
+        return ObjectIdentifier(decode_oid(data))
+    if tag == ASN_IPADDRESS:
+        return IpAddress('.'.join(str(octet) for octet in data))
+    if tag == ASN_COUNTER32:
+        return Counter32(int.from_bytes(data, 'big'))
+    if tag == ASN_GAUGE32:
+        return Gauge32(int.from_bytes(data, 'big'))
+    if tag == ASN_TIMETICKS:
+        return TimeTicks(int.from_bytes(data, 'big'))
+    if tag == ASN_COUNTER64:
+        return Counter64(int.from_bytes(data, 'big'))
+    if tag == ASN_OPAQUE:
+        return Opaque(data)
+    if tag in varbind_exceptions:
+        return varbind_exceptions[tag]
+    raise SnmpError('Unsupported value type 0x{0:02x}.'.format(tag))
+
+def decode_message(data):
+    '''
+    Decodes an SNMPv2c message and returns a dictionary with the keys
+    'community', 'pdu_type', 'request_id', 'field1', 'field2' and 'varbinds'.
+    '''
+    data = memoryview(data)
+    tag, pos, end = decode_tlv(data, 0)
+    if tag != ASN_SEQUENCE:
+        raise SnmpError('Message is not a SEQUENCE.')
+    tag, start, pos = decode_tlv(data, pos)
+    version = int.from_bytes(data[start:pos], 'big', signed=True)
+    if version != SNMP_VERSION_2C:
+        raise SnmpError('Unsupported SNMP version {0}.'.format(version))
+    tag, start, pos = decode_tlv(data, pos)
+    community = bytes(data[start:pos])
+    pdu_type, pos, pdu_end = decode_tlv(data, pos)
+    fields = []
+    for i in range(3):
+        tag, start, pos = decode_tlv(data, pos)
+        if tag != ASN_INTEGER:
+            raise SnmpError('Malformed PDU header.')
+        fields.append(int.from_bytes(data[start:pos], 'big', signed=True))
+    tag, pos, vbl_end = decode_tlv(data, pos)
+    return {
+        'community': community,
+        'pdu_type': pdu_type,
+        'request_id': fields[0],
+        'field1': fields[1],
+        'field2': fields[2],
+        'varbinds': _decode_varbind_list(data, pos, vbl_end),
+    }
+
+def _decode_varbind_list(data, pos, vbl_end):
+    varbinds = []
+    while pos < vbl_end:
+        tag, vb_pos, vb_end = decode_tlv(data, pos)
+        tag, start, value_pos = decode_tlv(data, vb_pos)
+        if tag != ASN_OID:
+            raise SnmpError('Varbind does not start with an OID.')
+        oid = decode_oid(data[start:value_pos])
+        tag, start, end = decode_tlv(data, value_pos)
+        varbinds.append((oid, decode_value(tag, data[start:end])))
+        pos = vb_end
+    return varbinds
+
+def decode_varbinds(data):
+    '''
+    Decodes a varbind list built by encode_varbinds.
+    '''
+    data = memoryview(data)
+    tag, pos, end = decode_tlv(data, 0)
+    if tag != ASN_SEQUENCE:
+        raise SnmpError('Varbind list is not a SEQUENCE.')
+    return _decode_varbind_list(data, pos, end)
+
+# ---------------------------------------------------------------------------
+# net-snmp style rendering
+# ---------------------------------------------------------------------------
+
+def _is_printable(value):
+    if value.endswith(b'\x00'):
+        value = value[:-1]
+    return all(32 <= byte < 127 or byte in (9, 10, 13) for byte in value)
+
+def format_timeticks(ticks):
+    days, remain = divmod(ticks, 8640000)
+    hours, remain = divmod(remain, 360000)
+    minutes, remain = divmod(remain, 6000)
+    seconds, hundredths = divmod(remain, 100)
+    clock = '{0}:{1:02d}:{2:02d}.{3:02d}'.format(
+      hours, minutes, seconds, hundredths)
+    if days == 0:
+        return clock
+    elif days == 1:
+        return '1 day, {0}'.format(clock)
+    return '{0} days, {1}'.format(days, clock)
+
+def format_value(value):
+    '''
+    Renders a typed value the way the net-snmp tools print it, e.g.
+    'INTEGER: 1', 'Hex-STRING: 00 0C 29 00 7E 81' or 'STRING: "gi1/0/1"'.
+    '''
+    if value is None:
+        return 'NULL'
+    if is_exception(value):
+        return value.text
+    if isinstance(value, Counter32):
+        return 'Counter32: {0}'.format(int(value))
+    if isinstance(value, Gauge32):
+        return 'Gauge32: {0}'.format(int(value))
+    if isinstance(value, Counter64):
+        return 'Counter64: {0}'.format(int(value))
+    if isinstance(value, TimeTicks):
+        return 'Timeticks: ({0}) {1}'.format(
+          int(value), format_timeticks(value))
+    if isinstance(value, IpAddress):
+        return 'IpAddress: {0}'.format(value)
+    if isinstance(value, ObjectIdentifier):
+        return 'OID: {0}'.format(format_oid(value))
+    if isinstance(value, Opaque):
+        return 'Opaque: {0}'.format(value.hex(' ').upper())
+    if isinstance(value, int):
+        return 'INTEGER: {0}'.format(value)
+    if isinstance(value, bytes):
+        if len(value) == 0:
+            return '""'
+        if _is_printable(value):
+            text = value.rstrip(b'\x00').decode('ascii')
+            text = text.replace('\\', '\\\\').replace('"', '\\"')
+            return 'STRING: "{0}"'.format(text)
+        return 'Hex-STRING: {0}'.format(value.hex(' ').upper())
+    return str(value)
+
+def format_oid(oid):
+    if oid.startswith('1.3.'):
+        return 'iso.' + oid[2:]
+    return oid
+
+def format_varbind(oid, value):
+    '''
+    >>> format_varbind('1.3.6.1.2.1.2.2.1.7.10117', 1)
+    'iso.3.6.1.2.1.2.2.1.7.10117 = INTEGER: 1'
+    '''
+    return '{0} = {1}'.format(format_oid(oid), format_value(value))
+
+# ---------------------------------------------------------------------------
+# MIB views
+# ---------------------------------------------------------------------------
+
+class MibView(object):
+    '''
+    A set of (oid, value) pairs kept in OID order, for agent side GET and
+    GETNEXT lookups by binary search.  OIDs may be given as dotted strings or
+    tuples and are stored as tuples.
+    '''
+    def __init__(self, data):
+        items = sorted((oid_to_tuple(oid) if isinstance(oid, str) else oid,
+          value) for oid, value in data.items())
+        self.oids = [oid for oid, value in items]
+        self.values = [value for oid, value in items]
+
+    def __len__(self):
+        return len(self.oids)
+
+    def __contains__(self, oid):
+        pos = bisect.bisect_left(self.oids, oid)
+        return pos < len(self.oids) and self.oids[pos] == oid
+
+    def get(self, oid):
+        pos = bisect.bisect_left(self.oids, oid)
+        if pos < len(self.oids) and self.oids[pos] == oid:
+            return self.values[pos]
+        return NO_SUCH_INSTANCE
+
+    def getnext(self, oid):
+        '''
+        Returns (next_oid, value), or (oid, END_OF_MIB_VIEW) past the end.
+        '''
+        pos = bisect.bisect_right(self.oids, oid)
+        if pos < len(self.oids):
+            return self.oids[pos], self.values[pos]
+        return oid, END_OF_MIB_VIEW
+
+    def subtree(self, root):
+        '''
+        Yields the (oid, value) pairs under root in order.
+        '''
+        pos = bisect.bisect_right(self.oids, root)
+        while (pos < len(self.oids) and
+          self.oids[pos][:len(root)] == root):
+            yield self.oids[pos], self.values[pos]
+            pos += 1
+
+# ---------------------------------------------------------------------------
+# transport
+# ---------------------------------------------------------------------------
+
+class Session(object):
+    '''
+    An SNMPv2c session with a single agent.  The defaults for timeout (in
+    seconds) and retries match the net-snmp command line tools.
+
+    If a tuner (see snmp_tuning) is given, every GETBULK response is reported
+    to it and the session follows its max-repetitions and timeout for the
+    host.  A GETBULK that times out or is too big is retried with fewer
+    repetitions.
+
+    If stats (see snmp_metrics.Call) is given, its requests, retries, timeouts,
+    bytes, varbinds and parse_time counters are updated by every request.
+    '''
+    def __init__(self, host, community, port=161, timeout=1.0, retries=5,
+      max_repetitions=10, tuner=None, stats=None):
+        self.host = host
+        self.community = community
+        # 'host:port' as accepted by net-snmp, e.g. for a local simulator
+        if host.count(':') == 1:
+            host, port = host.split(':')
+            port = int(port)
+        self.address = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self.tuner = tuner
+        self.stats = stats
+        self.sock = None
+        # round trip time and size of the last response, rtt is None if it
+        # needed a retransmission
+        self.last_rtt = None
+        self.last_response_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        if self.sock is None:
+            addr_info = socket.getaddrinfo(
+              self.address, self.port, 0, socket.SOCK_DGRAM)
+            family, socktype, proto, canonname, sockaddr = addr_info[0]
+            self.sock = socket.socket(family, socktype, proto)
+            self.sock.connect(sockaddr)
+        return self.sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def request(self, pdu_type, oid_list, field1=0, field2=0, retries=None,
+      timeout=None):
+        '''
+        Sends one PDU and returns the list of varbinds from the response.
+        Retransmits on timeout and raises SnmpTimeout once all retries are
+        exhausted.
+        '''
+        if retries is None:
+            retries = self.retries
+        if timeout is None:
+            timeout = self.timeout
+        sock = self.open()
+        request_id = random.randint(1, 0x7fffffff)
+        message = encode_message(self.community, pdu_type, request_id,
+          [(oid, None) for oid in oid_list], field1, field2)
+        stats = self.stats
+        for attempt in range(retries + 1):
+            sock.send(message)
+            sent = time.monotonic()
+            if stats is not None:
+                stats.requests += 1
+                if attempt:
+                    stats.retries += 1
+            deadline = sent + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data = sock.recv(65535)
+                except socket.timeout:
+                    break
+                except ConnectionRefusedError:
+                    # ICMP port unreachable, keep waiting for a retry
+                    continue
+                try:
+                    if stats is not None:
+                        decode_start = time.perf_counter()
+                        response = decode_message(data)
+                        stats.parse_time += time.perf_counter() - decode_start
+                        stats.bytes += len(data)
+                    else:
+                        response = decode_message(data)
+                except SnmpError:
+                    continue
+                if (response['pdu_type'] != PDU_RESPONSE or
+                  response['request_id'] != request_id):
+                    # stale response to an earlier retransmission
+                    continue
+                error_status = response['field1']
+                if error_status:
+                    status_name = error_status_map.get(
+                      error_status, str(error_status))
+                    raise SnmpError('{0} returned {1} (index {2}).'.format(
+                      self.host, status_name, response['field2']),
+                      status_name, response['field2'])
+                # only unambiguous samples, as in Karn's algorithm
+                if attempt == 0:
+                    self.last_rtt = time.monotonic() - sent
+                else:
+                    self.last_rtt = None
+                self.last_response_bytes = len(data)
+                if stats is not None:
+                    stats.varbinds += len(response['varbinds'])
+                return response['varbinds']
+        if stats is not None:
+            stats.timeouts += 1
+        raise SnmpTimeout('No response from {0}.'.format(self.host))
+
+    def get(self, oid_list):
+        return self.request(PDU_GET, oid_list)
+
+    def getnext(self, oid_list):
+        return self.request(PDU_GETNEXT, oid_list)
+
+    def getbulk(self, oid_list, non_repeaters=0, max_repetitions=None):
+        if max_repetitions is None:
+            max_repetitions = self.max_repetitions
+        retries = None
+        timeout = None
+        if self.tuner is not None:
+            timeout = self.tuner.bulk_timeout(self.host)
+            if max_repetitions > self.tuner.min_repetitions:
+                # a lost large response is retried smaller rather than resent
+                retries = min(self.retries, 1)
+        try:
+            varbinds = self.request(PDU_GETBULK, oid_list, non_repeaters,
+              max_repetitions, retries, timeout)
+        except SnmpError as e:
+            if self.tuner is None or not (isinstance(e, SnmpTimeout) or
+              e.error_status == 'tooBig'):
+                raise
+            smaller = self.tuner.observe_failure(self.host, max_repetitions)
+            if smaller is None or smaller >= max_repetitions:
+                raise
+            self.max_repetitions = smaller
+            return self.getbulk(oid_list, non_repeaters, smaller)
+        if self.tuner is not None and self.last_rtt is not None:
+            repeaters = len(oid_list) - non_repeaters
+            full = len(varbinds) >= non_repeaters + repeaters * max_repetitions
+            self.tuner.observe(self.host, self.last_rtt, max_repetitions, full,
+              self.last_response_bytes)
+            args = self.tuner.session_args(self.host)
+            self.timeout = args['timeout']
+            self.max_repetitions = args['max_repetitions']
+        return varbinds
+
+    def walk(self, oid):
+        '''
+        Walks the subtree under oid and returns a list of (oid, value) tuples.
+        See iter_walk.
+        '''
+        return list(self.iter_walk(oid))
+
+    def iter_walk(self, oid):
+        '''
+        Walks the subtree under oid with GETBULK requests and yields (oid,
+        value) tuples as each response arrives, so only one response is held
+        in memory regardless of the size of the table.  Like snmpbulkwalk, if
+        the subtree is empty the OID itself is fetched with a GET so that
+        walking a full instance OID still returns its value.
+        '''
+        found = False
+        for col, vb_oid, value in self.iter_walk_columns([oid]):
+            found = True
+            yield vb_oid, value
+        if not found:
+            for vb_oid, value in self.get([oid.strip('.')]):
+                if not is_exception(value):
+                    yield vb_oid, value
+
+    def walk_columns(self, oid_list):
+        '''
+        Walks several subtrees together and returns one list of (oid, value)
+        tuples per OID in oid_list.  See iter_walk_columns.
+        '''
+        results = [[] for oid in oid_list]
+        for col, vb_oid, value in self.iter_walk_columns(oid_list):
+            results[col].append((vb_oid, value))
+        return results
+
+    def iter_walk_columns(self, oid_list):
+        '''
+        Walks several subtrees, typically the columns of one table, together.
+        Each GETBULK request carries one repeater per column that has not
+        finished yet, so a table with five columns is read in one stream rather
+        than five separate walks.  Yields (column, oid, value) tuples where
+        column is the position of the subtree in oid_list.
+        '''
+        roots = [oid_to_tuple(oid) for oid in oid_list]
+        current = list(roots)
+        active = list(range(len(roots)))
+        while active:
+            varbinds = self.getbulk(
+              [tuple_to_oid(current[col]) for col in active])
+            if not varbinds:
+                break
+            finished = set()
+            # the response holds max-repetitions rows of one varbind per
+            # requested column, in request order
+            for pos, (vb_oid, value) in enumerate(varbinds):
+                col = active[pos % len(active)]
+                if col in finished:
+                    continue
+                root = roots[col]
+                vb_tuple = oid_to_tuple(vb_oid)
+                if (value is END_OF_MIB_VIEW or
+                  vb_tuple[:len(root)] != root or len(vb_tuple) == len(root)):
+                    finished.add(col)
+                    continue
+                if vb_tuple <= current[col]:
+                    raise SnmpError('{0} returned OIDs out of order.'.format(
+                      self.host))
+                current[col] = vb_tuple
+                yield col, vb_oid, value
+            active = [col for col in active if col not in finished]
@@ -0,0 +1,227 @@
+#!/bin/env python3
+
+'''
+Poll many network hosts at once.  The snmp_tools getters spend nearly all of
+their time waiting on UDP round trips, so they are run on a thread pool and
+scheduled with asyncio.  A global limit bounds the number of requests in flight
+across the fleet and a per-host limit keeps any one device from being hit with
+more than a few requests at the same time.
+
+Stream results as each host completes:
+
+>>> async def main():
+...     poller = FleetPoller(concurrency=100, per_host=2)
+...     async for res in poller.poll(hosts, snmp_tools.get_sysinfo, comm):
+...         print(res.host, res.result, res.error)
+>>> asyncio.run(main())
+
+Or collect everything into a dictionary from a regular script:
+
+>>> run_fleet(hosts, snmp_tools.get_sysinfo, comm, concurrency=100)
+{'aubcore01': ('aubcore01', 'catalyst 3750', '12.2(55)SE5', 'ios'),...}
+
+Every getter in snmp_tools also has an awaitable variant with the same
+arguments in this module:
+
+>>> sysinfo = await snmp_fleet.get_sysinfo('aubcore01', comm)
+'''
+
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import snmp_tools
+
+FleetResult = collections.namedtuple('FleetResult', ['host', 'result', 'error'])
+
+class FleetPoller(object):
+    '''
+    Runs blocking SNMP calls on a thread pool with at most 'concurrency' calls
+    in flight overall and at most 'per_host' calls in flight per host.
+    '''
+    def __init__(self, concurrency=64, per_host=2):
+        if concurrency < 1 or per_host < 1:
+            raise ValueError('Concurrency limits must be at least 1.')
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=concurrency)
+        self.loop = None
+        self.global_sem = None
+        self.host_sems = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def _semaphores(self, host):
+        # asyncio primitives belong to one event loop, so start over if the
+        # poller is reused from another asyncio.run()
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.global_sem = asyncio.Semaphore(self.concurrency)
+            self.host_sems = {}
+        host_sem = self.host_sems.get(host)
+        if host_sem is None:
+            host_sem = asyncio.Semaphore(self.per_host)
+            self.host_sems[host] = host_sem
+        return self.global_sem, host_sem
+
+    async def call(self, host, func, *args, **kwargs):
+        '''
+        Awaits func(host, *args, **kwargs) once both limits allow it.
+        '''
+        global_sem, host_sem = self._semaphores(host)
+        # take the per-host slot first so a busy host does not hold global
+        # slots that other hosts could be using
+        async with host_sem:
+            async with global_sem:
+                return await self.loop.run_in_executor(self.executor,
+                  functools.partial(func, host, *args, **kwargs))
+
+    async def _call_result(self, host, func, *args, **kwargs):
+        try:
+            result = await self.call(host, func, *args, **kwargs)
+        except Exception as e:
+            return FleetResult(host, None, e)
+        return FleetResult(host, result, None)
+
+    async def poll(self, hosts, func, *args, **kwargs):
+        '''
+        Calls func(host, *args, **kwargs) for every host and yields a
+        FleetResult(host, result, error) as each one completes.  Exceptions are
+        returned in 'error' rather than raised, so one bad host does not stop
+        the sweep.
+        '''
+        tasks = [asyncio.ensure_future(
+          self._call_result(host, func, *args, **kwargs)) for host in hosts]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+def run_fleet(hosts, func, *args, concurrency=64, per_host=2, **kwargs):
+    '''
+    Blocking wrapper around FleetPoller.poll for scripts that are not written
+    with asyncio.  Returns a dictionary of host to result.  Hosts that raised
+    an exception are printed and get a result of None.
+    '''
+    async def collect():
+        results = {}
+        with FleetPoller(concurrency, per_host) as poller:
+            async for res in poller.poll(hosts, func, *args, **kwargs):
+                if res.error is not None:
+                    print('{0} failed: {1}'.format(res.host, res.error))
+                results[res.host] = res.result
+        return results
+    return asyncio.run(collect())
+
+default_poller = None
+
+def get_default_poller():
+    global default_poller
+    if default_poller is None:
+        default_poller = FleetPoller()
+    return default_poller
+
+def awaitable(func):
+    '''
+    Wraps a blocking snmp_tools getter that takes the hostname as the first
+    argument so that it can be awaited.  Pass poller= to use something other
+    than the module default limits.
+    '''
+    @functools.wraps(func)
+    async def wrapper(hostname, *args, poller=None, **kwargs):
+        if poller is None:
+            poller = get_default_poller()
+        return await poller.call(hostname, func, *args, **kwargs)
+    return wrapper
+
+snmpget_multi            = awaitable(snmp_tools.snmpget_multi)
+get_bgp_ipv4_peers       = awaitable(snmp_tools.get_bgp_ipv4_peers)
+get_bgp_ipv4_peer_status = awaitable(snmp_tools.get_bgp_ipv4_peer_status)
+get_bgp_peer_table       = awaitable(snmp_tools.get_bgp_peer_table)
+get_routes               = awaitable(snmp_tools.get_routes)
+get_route_table          = awaitable(snmp_tools.get_route_table)
+get_cdp_data             = awaitable(snmp_tools.get_cdp_data)
+get_intf_maps            = awaitable(snmp_tools.get_intf_maps)
+get_serial_num           = awaitable(snmp_tools.get_serial_num)
+get_sysinfo              = awaitable(snmp_tools.get_sysinfo)
+get_uptime               = awaitable(snmp_tools.get_uptime)
+get_vlan_list            = awaitable(snmp_tools.get_vlan_list)
+get_vlan_mac_port        = awaitable(snmp_tools.get_vlan_mac_port)
+get_base_ports           = awaitable(snmp_tools.get_base_ports)
+get_all_intf_status      = awaitable(snmp_tools.get_all_intf_status)
+get_intf_table           = awaitable(snmp_tools.get_intf_table)
+get_intf_status          = awaitable(snmp_tools.get_intf_status)
+get_intf_desc            = awaitable(snmp_tools.get_intf_desc)
+get_all_intf_desc        = awaitable(snmp_tools.get_all_intf_desc)
+get_intf_input_octets    = awaitable(snmp_tools.get_intf_input_octets)
+get_intf_input_ucast_pkt = awaitable(snmp_tools.get_intf_input_ucast_pkt)
+get_intf_input_errors    = awaitable(snmp_tools.get_intf_input_errors)
+get_intf_input_counters  = awaitable(snmp_tools.get_intf_input_counters)
+get_intf_bw              = awaitable(snmp_tools.get_intf_bw)
+
+async def get_arp_table(arp_hosts, snmp_comm, poller=None):
+    '''
+    Awaitable get_arp_table.  The ARP hosts are walked concurrently instead of
+    one after another and the results are merged in arp_hosts order, so the
+    output matches the blocking version.  Returns None if any host fails.
+    '''
+    if poller is None:
+        poller = get_default_poller()
+    tables = await asyncio.gather(*[poller.call(
+      host, lambda h: snmp_tools.get_arp_table([h], snmp_comm))
+      for host in arp_hosts])
+    arp_table = {}
+    for table in tables:
+        if table is None:
+            return None
+        arp_table.update(table)
+    return arp_table
+
+async def get_arp_ip_list(arp_hosts, snmp_comm, poller=None):
+    '''
+    Awaitable get_arp_ip_list.  The ARP hosts are walked concurrently and the
+    per-host results are merged in arp_hosts order.  Returns None if any host
+    fails.
+    '''
+    if poller is None:
+        poller = get_default_poller()
+    tables = await asyncio.gather(*[poller.call(
+      host, lambda h: snmp_tools.get_arp_ip_list([h], snmp_comm))
+      for host in arp_hosts])
+    arp_table = {}
+    for table in tables:
+        if table is None:
+            return None
+        for mac, ip_list in table.items():
+            merged = arp_table.setdefault(mac, [])
+            for ip in ip_list:
+                if ip not in merged:
+                    merged.append(ip)
+    return arp_table
+
+async def get_bgp_peer_tables(speakers, snmp_comm, poller=None):
+    '''
+    Walks the BGP peer table of every speaker concurrently.  Returns a
+    dictionary of speaker to get_bgp_peer_table result, None for speakers that
+    failed.
+    '''
+    if poller is None:
+        poller = get_default_poller()
+    results = {}
+    async for res in poller.poll(speakers, snmp_tools.get_bgp_peer_table,
+      snmp_comm):
+        if res.error is not None:
+            print('{0} failed: {1}'.format(res.host, res.error))
+        results[res.host] = res.result
+    return results
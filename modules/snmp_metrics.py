@@ -0,0 +1,381 @@
+#!/bin/env python3
+
+'''
+Per-call metrics for the SNMP layer.
+
+Every GET, walk and table walk made through snmp_tools is measured as one Call:
+host, operation, OIDs, backend, latency, varbinds and bytes returned, requests,
+retries, timeouts, time spent decoding or parsing, and the error if it failed.
+Finished calls are handed to every registered sink.  With no sinks registered
+nothing is measured.
+
+Sinks:
+
+    HistogramSink     latency histograms and totals per host and per OID
+                      column, kept in memory, with slowest_hosts() and
+                      hot_oids()
+    PrometheusSink    a HistogramSink written out as Prometheus text
+                      exposition, for the node_exporter textfile collector
+    JsonLinesSink     one JSON object per call appended to a log file
+
+>>> sink = add_sink(HistogramSink())
+>>> snmp_tools.get_intf_table(hostname, snmp_comm)
+>>> sink.slowest_hosts(1)
+[('aubcore01', 0.1843)]
+
+Sinks can also be enabled from the environment, which is handy for the
+command line tools:
+
+    export SNMP_METRICS_PROM=/var/lib/node_exporter/snmp.prom
+    export SNMP_METRICS_LOG=~/snmp_calls.jsonl
+
+A sink is any object with an emit(call) method.
+'''
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from os import environ
+import oid_registry
+
+# seconds
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+  10.0, 30.0, 60.0)
+
+# arcs kept of an OID that is not in oids.map, enough to tell the columns of
+# mib-2 tables apart (1.3.6.1.2.1.2.2.1.10) but not their instances
+oid_prefix_arcs = 10
+
+sinks = []
+sinks_lock = threading.Lock()
+
+def oid_key(oid):
+    '''
+    Returns what per-OID totals are kept under: the name of the column or
+    object oid belongs to, so that every instance of ifHCInOctets is one
+    series, or the first oid_prefix_arcs arcs of an unregistered OID.
+    '''
+    name, index = oid_registry.lookup(oid)
+    if name is not None:
+        return name
+    return '.'.join(oid.strip('.').split('.')[:oid_prefix_arcs])
+
+class Call(object):
+    '''
+    One SNMP operation.  Sessions and the subprocess backend add to the
+    counters while the call runs.
+    '''
+    def __init__(self, host, op, oid_list, backend):
+        self.host = host
+        self.op = op
+        self.oids = list(oid_list)
+        self.backend = backend
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.latency = None
+        self.requests = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.varbinds = 0
+        self.bytes = 0
+        self.parse_time = 0.0
+        self.error = None
+
+    def finish(self, error=None):
+        self.latency = time.perf_counter() - self.start
+        if error is not None:
+            self.error = '{0}: {1}'.format(type(error).__name__, error)
+        emit(self)
+
+    def to_dict(self):
+        return {'timestamp': self.timestamp,
+                'host': self.host,
+                'op': self.op,
+                'oids': self.oids,
+                'backend': self.backend,
+                'latency': self.latency,
+                'requests': self.requests,
+                'retries': self.retries,
+                'timeouts': self.timeouts,
+                'varbinds': self.varbinds,
+                'bytes': self.bytes,
+                'parse_time': self.parse_time,
+                'error': self.error}
+
+def start(host, op, oid_list, backend):
+    '''
+    Returns a new Call, or None when there are no sinks so that callers skip
+    all measurement.
+    '''
+    if not sinks:
+        return None
+    return Call(host, op, oid_list, backend)
+
+def emit(call):
+    for sink in list(sinks):
+        try:
+            sink.emit(call)
+        except Exception as e:
+            print('SNMP metrics sink {0} failed: {1}'.format(
+              type(sink).__name__, e))
+
+def add_sink(sink):
+    with sinks_lock:
+        sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    with sinks_lock:
+        if sink in sinks:
+            sinks.remove(sink)
+
+class Histogram(object):
+    __slots__ = ['buckets', 'counts', 'count', 'sum']
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # one count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.sum / self.count
+
+    def quantile(self, q):
+        '''
+        Upper bound of the bucket holding the q quantile, as Prometheus
+        estimates it.
+        '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                if i < len(self.buckets):
+                    return self.buckets[i]
+                return float('inf')
+        return float('inf')
+
+class Totals(object):
+    __slots__ = ['latency', 'requests', 'retries', 'timeouts', 'varbinds',
+      'bytes', 'parse_time', 'errors']
+
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.requests = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.varbinds = 0
+        self.bytes = 0
+        self.parse_time = 0.0
+        self.errors = 0
+
+    def add(self, call):
+        self.latency.observe(call.latency)
+        self.requests += call.requests
+        self.retries += call.retries
+        self.timeouts += call.timeouts
+        self.varbinds += call.varbinds
+        self.bytes += call.bytes
+        self.parse_time += call.parse_time
+        if call.error is not None:
+            self.errors += 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        for name in self.__slots__[1:]:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+class HistogramSink(object):
+    '''
+    Aggregates calls per (host, op) and per OID column (see oid_key).  A call
+    for several OIDs counts its full latency against each of their columns,
+    once per column.
+    '''
+    def __init__(self, buckets=default_buckets):
+        self.buckets = tuple(buckets)
+        self.hosts = {}
+        self.oids = {}
+        self.lock = threading.Lock()
+
+    def emit(self, call):
+        with self.lock:
+            key = (call.host, call.op)
+            totals = self.hosts.get(key)
+            if totals is None:
+                totals = self.hosts[key] = Totals(self.buckets)
+            totals.add(call)
+            for key in set(oid_key(oid) for oid in call.oids):
+                totals = self.oids.get(key)
+                if totals is None:
+                    totals = self.oids[key] = Totals(self.buckets)
+                totals.add(call)
+
+    def host_totals(self):
+        '''
+        Returns {host: Totals} summed over all operations.
+        '''
+        hosts = {}
+        with self.lock:
+            for (host, op), totals in self.hosts.items():
+                summed = hosts.get(host)
+                if summed is None:
+                    summed = hosts[host] = Totals(self.buckets)
+                summed.merge(totals)
+        return hosts
+
+    def slowest_hosts(self, count=10):
+        '''
+        Returns [(host, mean latency in seconds),...], slowest first.
+        '''
+        hosts = self.host_totals()
+        ranked = sorted(hosts.items(), key=lambda item: item[1].latency.mean(),
+          reverse=True)
+        return [(host, round(totals.latency.mean(), 4))
+          for host, totals in ranked[:count]]
+
+    def hot_oids(self, count=10):
+        '''
+        Returns [(oid column, total seconds spent),...], most expensive
+        first.
+        '''
+        with self.lock:
+            ranked = sorted(self.oids.items(),
+              key=lambda item: item[1].latency.sum, reverse=True)
+            return [(oid, round(totals.latency.sum, 4))
+              for oid, totals in ranked[:count]]
+
+def _labels(**labels):
+    # the escapes the exposition format allows in label values
+    return ','.join('{0}="{1}"'.format(name,
+      str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+      '\n', '\\n')) for name, value in labels.items())
+
+class PrometheusSink(HistogramSink):
+    '''
+    Writes the aggregated metrics to path in the Prometheus text format when
+    write() is called, at most every 'interval' seconds as calls arrive, and
+    when the script exits.
+    '''
+    def __init__(self, path, interval=15, buckets=default_buckets):
+        super().__init__(buckets)
+        self.path = path
+        self.interval = interval
+        self.written = 0
+        # calls are emitted from many threads, and they all write to the
+        # same temporary file
+        self.write_lock = threading.Lock()
+        atexit.register(self.write)
+
+    def emit(self, call):
+        super().emit(call)
+        with self.write_lock:
+            if time.monotonic() - self.written >= self.interval:
+                self._write()
+
+    def exposition(self):
+        lines = []
+        counters = [
+            ('requests', 'snmp_requests_total', 'SNMP PDUs sent.'),
+            ('retries', 'snmp_retries_total', 'SNMP PDUs retransmitted.'),
+            ('timeouts', 'snmp_timeouts_total', 'SNMP calls that timed out.'),
+            ('varbinds', 'snmp_varbinds_total', 'Varbinds received.'),
+            ('bytes', 'snmp_response_bytes_total', 'Response bytes received.'),
+            ('parse_time', 'snmp_parse_seconds_total',
+              'Seconds spent decoding responses.'),
+            ('errors', 'snmp_errors_total', 'SNMP calls that failed.'),
+        ]
+        with self.lock:
+            hosts = sorted(self.hosts.items())
+            oids = sorted(self.oids.items())
+            lines.append('# HELP snmp_call_duration_seconds Duration of SNMP '
+              'calls.')
+            lines.append('# TYPE snmp_call_duration_seconds histogram')
+            for (host, op), totals in hosts:
+                cumulative = 0
+                bounds = [repr(b) for b in self.buckets] + ['+Inf']
+                for bound, count in zip(bounds, totals.latency.counts):
+                    cumulative += count
+                    lines.append('snmp_call_duration_seconds_bucket{{{0}}} '
+                      '{1}'.format(_labels(host=host, op=op, le=bound),
+                      cumulative))
+                labels = _labels(host=host, op=op)
+                lines.append('snmp_call_duration_seconds_sum{{{0}}} '
+                  '{1!r}'.format(labels, totals.latency.sum))
+                lines.append('snmp_call_duration_seconds_count{{{0}}} '
+                  '{1}'.format(labels, totals.latency.count))
+            for attr, name, help_text in counters:
+                lines.append('# HELP {0} {1}'.format(name, help_text))
+                lines.append('# TYPE {0} counter'.format(name))
+                for (host, op), totals in hosts:
+                    lines.append('{0}{{{1}}} {2}'.format(name,
+                      _labels(host=host, op=op), getattr(totals, attr)))
+            lines.append('# HELP snmp_oid_calls_total SNMP calls per OID '
+              'column.')
+            lines.append('# TYPE snmp_oid_calls_total counter')
+            for oid, totals in oids:
+                lines.append('snmp_oid_calls_total{{{0}}} {1}'.format(
+                  _labels(oid=oid), totals.latency.count))
+            lines.append('# HELP snmp_oid_seconds_total Seconds spent in SNMP '
+              'calls per OID column.')
+            lines.append('# TYPE snmp_oid_seconds_total counter')
+            for oid, totals in oids:
+                lines.append('snmp_oid_seconds_total{{{0}}} {1!r}'.format(
+                  _labels(oid=oid), totals.latency.sum))
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        with self.write_lock:
+            self._write()
+
+    def _write(self):
+        self.written = time.monotonic()
+        # the textfile collector must never see half a file
+        tmp_path = '{0}.{1}'.format(self.path, os.getpid())
+        with open(tmp_path, 'wt') as f:
+            f.write(self.exposition())
+        os.replace(tmp_path, self.path)
+
+class JsonLinesSink(object):
+    '''
+    Appends one JSON object per call to path.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fh = open(path, 'at')
+        atexit.register(self.close)
+
+    def emit(self, call):
+        line = json.dumps(call.to_dict()) + '\n'
+        with self.lock:
+            self.fh.write(line)
+            self.fh.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.fh.closed:
+                self.fh.close()
+
+if environ.get('SNMP_METRICS_PROM'):
+    add_sink(PrometheusSink(os.path.expanduser(environ['SNMP_METRICS_PROM'])))
+if environ.get('SNMP_METRICS_LOG'):
+    add_sink(JsonLinesSink(os.path.expanduser(environ['SNMP_METRICS_LOG'])))
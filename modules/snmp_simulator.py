@@ -0,0 +1,200 @@
+#!/bin/env python3
+
+'''
+A local SNMPv2c agent that serves synthetic or recorded MIB data over UDP, so
+snmp_tools can be benchmarked and tested without real devices.
+
+>>> agent = SimulatedAgent(synthetic_mib(arp=50000, routes=900000))
+>>> agent.start()
+>>> snmp_tools.get_route_table(agent.address, 'public')
+
+agent.address is 'host:port', which both backends accept as a hostname.
+
+The data is a dictionary of context to {oid: value}.  Context '' is served for
+the plain community.  A context named after a VLAN is served for
+community@vlan, the way Cisco switches expose per-VLAN bridge tables.  Values
+use the snmp_engine types.
+
+A recorded walk of a real device, saved with 'snmpwalk -v2c -c public -On -Oe
+host .1 > host.walk', can be served with load_walk('host.walk').
+
+GETBULK responses are cut at max_response_bytes as real agents do, and a
+delay can be added to every response to imitate a slow control plane.
+'''
+
+import socket
+import threading
+import time
+import macaddr
+import oids
+import snmp_engine
+import snmp_tools
+
+class SimulatedAgent(threading.Thread):
+    def __init__(self, contexts, community='public', host='127.0.0.1', port=0,
+      delay=0, max_response_bytes=65000):
+        super().__init__(daemon=True)
+        if '' not in contexts and not isinstance(
+          next(iter(contexts.values()), None), dict):
+            contexts = {'': contexts}
+        self.views = {context: snmp_engine.MibView(data)
+          for context, data in contexts.items()}
+        self.community = community.encode('utf-8')
+        self.delay = delay
+        self.max_response_bytes = max_response_bytes
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+        self.address = '{0}:{1}'.format(host, self.port)
+        self.requests = 0
+        self.varbinds = 0
+        self.running = True
+
+    def view(self, community):
+        if community == self.community:
+            return self.views.get('')
+        name, sep, context = community.partition(b'@')
+        if sep and name == self.community:
+            return self.views.get(context.decode('utf-8'))
+        return None
+
+    def respond(self, request):
+        view = self.view(request['community'])
+        if view is None:
+            # wrong community, agents stay silent
+            return None
+        pdu_type = request['pdu_type']
+        oid_list = [snmp_engine.oid_to_tuple(oid)
+          for oid, value in request['varbinds']]
+        varbinds = []
+        if pdu_type == snmp_engine.PDU_GET:
+            varbinds = [(oid, view.get(oid)) for oid in oid_list]
+        elif pdu_type == snmp_engine.PDU_GETNEXT:
+            varbinds = [view.getnext(oid) for oid in oid_list]
+        elif pdu_type == snmp_engine.PDU_GETBULK:
+            non_repeaters = min(request['field1'], len(oid_list))
+            varbinds = [view.getnext(oid)
+              for oid in oid_list[:non_repeaters]]
+            current = oid_list[non_repeaters:]
+            size = 0
+            for repetition in range(request['field2']):
+                row = [view.getnext(oid) for oid in current]
+                size += sum(len(snmp_engine.encode_oid(oid)) + 16
+                  for oid, value in row)
+                if size > self.max_response_bytes and varbinds:
+                    break
+                varbinds.extend(row)
+                if all(snmp_engine.is_exception(value)
+                  for oid, value in row):
+                    break
+                current = [oid for oid, value in row]
+        else:
+            return None
+        self.requests += 1
+        self.varbinds += len(varbinds)
+        return snmp_engine.encode_message(request['community'],
+          snmp_engine.PDU_RESPONSE, request['request_id'], varbinds)
+
+    def run(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except OSError:
+                break
+            try:
+                request = snmp_engine.decode_message(data)
+            except snmp_engine.SnmpError:
+                continue
+            response = self.respond(request)
+            if response is None:
+                continue
+            if self.delay:
+                time.sleep(self.delay)
+            self.sock.sendto(response, addr)
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+def load_walk(path):
+    '''
+    Reads a walk saved with 'snmpwalk -On -Oe' into {oid: value}.
+    '''
+    with open(path, 'rt') as f:
+        return dict(snmp_tools.iter_netsnmp_varbinds(f))
+
+def _oid(name, *index):
+    return snmp_engine.oid_to_tuple(oids.map[name]) + tuple(index)
+
+def _ip(ip_int):
+    return (ip_int >> 24, (ip_int >> 16) & 0xff, (ip_int >> 8) & 0xff,
+      ip_int & 0xff)
+
+def _mac(mac_int):
+    return tuple(mac_int.to_bytes(6, 'big'))
+
+def synthetic_mib(arp=1000, routes=1000, ports=48, vlans=10,
+  macs_per_vlan=100, cdp_neighbors=4, bgp_peers=4, hostname='simsw01'):
+    '''
+    Builds the contexts of a switch/router with the given table sizes: system
+    group, ifTable/ifXTable with 'ports' interfaces, CDP cache, BGP peers,
+    ARP table, ipCidrRouteTable, VLAN list, base port map and one bridge
+    table per VLAN context.
+    '''
+    base = {}
+    base[_oid('sysDescr')] = (b'Cisco IOS Software, C3750 Software '
+      b'(C3750-IPSERVICESK9-M), Version 12.2(55)SE5, RELEASE SOFTWARE (fc1)')
+    base[_oid('sysName')] = hostname.encode('utf-8')
+    base[_oid('sysUpTime', 0)] = snmp_engine.TimeTicks(123456789)
+    base[_oid('snmpEngineTime')] = 1234567
+    base[_oid('ios_ser_num', 1001)] = b'FOC1234X0AB'
+    base[_oid('cdpGlobalRun', 0)] = 1
+    for port in range(1, ports + 1):
+        intf_index = 10100 + port
+        base[_oid('ifName', intf_index)] = 'Gi1/0/{0}'.format(port).encode()
+        base[_oid('ifAlias', intf_index)] = 'port {0}'.format(port).encode()
+        base[_oid('ifAdminStatus', intf_index)] = 1
+        base[_oid('ifOperStatus', intf_index)] = 1 if port % 3 else 2
+        base[_oid('ifHighSpeed', intf_index)] = snmp_engine.Gauge32(1000)
+        base[_oid('ifInErrors', intf_index)] = snmp_engine.Counter32(port)
+        base[_oid('ifHCInOctets', intf_index)] = snmp_engine.Counter64(
+          port << 32)
+        base[_oid('ifHCInUcastPkts', intf_index)] = snmp_engine.Counter64(
+          port << 24)
+        base[_oid('BaseMappingPort', intf_index)] = port
+    for nei in range(1, min(cdp_neighbors, ports) + 1):
+        intf_index = 10100 + nei
+        base[_oid('cdpCacheDeviceId', intf_index, nei)] = \
+          'nei{0}.example.net'.format(nei).encode()
+        base[_oid('cdpCacheDevicePort', intf_index, nei)] = \
+          'GigabitEthernet0/{0}'.format(nei).encode()
+    for peer in range(1, bgp_peers + 1):
+        peer_ip = _ip(0xac1d0200 + peer)
+        base[_oid('bgpPeerState') + peer_ip] = 6
+        base[_oid('bgpPeerAdminStatus') + peer_ip] = 2
+        base[_oid('bgpPeerRemoteAddr') + peer_ip] = snmp_engine.IpAddress(
+          macaddr.format_ip(0xac1d0200 + peer))
+        base[_oid('bgpPeerHoldTime') + peer_ip] = 90
+        base[_oid('bgpPeerKeepAlive') + peer_ip] = 30
+    arp_oid = _oid('ipNetToMediaPhysAddress')
+    for i in range(arp):
+        base[arp_oid + (10100 + i % ports + 1,) + _ip(0x0a000000 + i)] = \
+          bytes(_mac(0x000c29000000 + i))
+    route_oid = _oid('ipCidrRouteProto')
+    protos = (14, 14, 14, 13, 3, 2)
+    for i in range(routes):
+        network = _ip(0x01000000 + (i << 8))
+        next_hop = _ip(0xac1e0202 + i % 4)
+        base[route_oid + network + (255, 255, 255, 0, 0) + next_hop] = \
+          protos[i % len(protos)]
+    contexts = {'': base}
+    bridge_oid = _oid('vlan_mac_port')
+    for vlan in range(1, vlans + 1):
+        vlan_num = 100 + vlan
+        base[_oid('vlan_list', vlan_num)] = 'vlan{0}'.format(vlan_num).encode()
+        bridge = {}
+        for i in range(macs_per_vlan):
+            mac = 0x005056000000 + (vlan_num << 16) + i
+            bridge[bridge_oid + _mac(mac)] = i % ports + 1
+        contexts[str(vlan_num)] = bridge
+    return contexts
@@ -1,10 +1,455 @@
 #!/bin/env python3
 
 import collections
+import contextlib
 import ipaddress
 import re, time
 import subprocess as sub
+from os import environ
+import macaddr
+import oid_registry
 import oids
+import route_table
+import snmp_archive
+import snmp_cache
+import snmp_engine
+import snmp_metrics
+import snmp_tuning
+
+# 'native' polls with the in-process SNMPv2c engine, 'subprocess' forks the
+# net-snmp command line tools, 'replay' answers from the snmp_archive records
+backend = environ.get('SNMP_BACKEND', 'native')
+backends = ('native', 'subprocess', 'replay')
+
+# what a failed poll can raise: no or bad response, net-snmp exiting non-zero,
+# name resolution or socket errors, and output that does not parse
+snmp_errors = (snmp_engine.SnmpError, sub.CalledProcessError, OSError,
+  ValueError)
+
+def set_backend(name):
+    '''
+    Selects the SNMP backend used by every function in this module.  The
+    backend can also be set with the SNMP_BACKEND environment variable.
+    '''
+    global backend
+    if name not in backends:
+        raise ValueError('Backend must be one of {0}.'.format(backends))
+    backend = name
+
+# .1.3.6.1.2.1.1.5.0 = STRING: "aubcore01"
+re_netsnmp_ticks = re.compile(r'^\((\d+)\)')
+
+def _netsnmp_string(value):
+    if value.startswith('"') and value.endswith('"'):
+        value = value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value.encode('utf-8')
+
+def _netsnmp_hex(value):
+    return bytes.fromhex(''.join(value.split()))
+
+def _netsnmp_integer(value):
+    # -Oe keeps enums numeric, but just in case: up(1)
+    if value.endswith(')'):
+        value = value.split('(')[-1].rstrip(')')
+    return int(value)
+
+def _netsnmp_ticks(value):
+    ticks_match = re_netsnmp_ticks.search(value)
+    if ticks_match:
+        return snmp_engine.TimeTicks(int(ticks_match.group(1)))
+    return snmp_engine.TimeTicks(int(value.split()[0]))
+
+# value type printed by net-snmp -> converter to the snmp_engine type
+netsnmp_value_types = {
+    'STRING': _netsnmp_string,
+    'Hex-STRING': _netsnmp_hex,
+    'Opaque': lambda value: snmp_engine.Opaque(_netsnmp_hex(value)),
+    'INTEGER': _netsnmp_integer,
+    'Counter32': lambda value: snmp_engine.Counter32(int(value)),
+    'Gauge32': lambda value: snmp_engine.Gauge32(int(value)),
+    'Counter64': lambda value: snmp_engine.Counter64(int(value)),
+    'Timeticks': _netsnmp_ticks,
+    'IpAddress': snmp_engine.IpAddress,
+    'OID': lambda value: snmp_engine.ObjectIdentifier(value.lstrip('.')),
+}
+
+def parse_netsnmp_value(text):
+    '''
+    Converts the value part of a net-snmp output line ('INTEGER: 1',
+    'Hex-STRING: 00 0C 29 00 7E 81', ...) to the typed values returned by
+    snmp_engine.
+    '''
+    value_type, sep, value = text.partition(': ')
+    if sep:
+        convert = netsnmp_value_types.get(value_type)
+        if convert is not None:
+            return convert(value)
+    if text == '""':
+        return b''
+    if text == 'NULL':
+        return None
+    for exc in snmp_engine.varbind_exceptions.values():
+        if text.startswith(exc.text[:20]):
+            return exc
+    if sep:
+        return value.encode('utf-8')
+    return text.encode('utf-8')
+
+def parse_netsnmp_output(snmp_data):
+    '''
+    Parses net-snmp output printed with numeric OIDs (-On) into a list of
+    (oid, value) tuples.  See iter_netsnmp_varbinds.
+    '''
+    return list(iter_netsnmp_varbinds(snmp_data.split('\n')))
+
+def iter_netsnmp_varbinds(lines):
+    '''
+    Parses lines of net-snmp output printed with numeric OIDs (-On) and yields
+    (oid, value) tuples as soon as each varbind is complete.  Lines that do not
+    start a new varbind are treated as the continuation of a multi-line value,
+    as seen with long sysDescr strings and Hex-STRINGs.
+    '''
+    oid = None
+    text = None
+    for line in lines:
+        line = line.rstrip('\n')
+        # no regex: with -On every varbind starts with a dotted numeric OID
+        line_oid, sep, line_text = line.partition(' = ')
+        if sep and line_oid.replace('.', '').isdigit():
+            if oid is not None:
+                yield oid, parse_netsnmp_value(text)
+            oid = line_oid.lstrip('.')
+            text = line_text
+        elif oid is not None and line:
+            if text.startswith('Hex-STRING'):
+                text = ' '.join([text, line])
+            else:
+                text = '\n'.join([text, line])
+    if oid is not None:
+        yield oid, parse_netsnmp_value(text)
+
+def _metered_lines(lines, call, wait):
+    lines = iter(lines)
+    while True:
+        start = time.perf_counter()
+        line = next(lines, None)
+        wait[0] += time.perf_counter() - start
+        if line is None:
+            return
+        call.bytes += len(line)
+        yield line
+
+def _metered_varbinds(lines, call):
+    '''
+    iter_netsnmp_varbinds that adds the bytes read, varbinds parsed and time
+    spent parsing, but not waiting for output, to call.
+    '''
+    wait = [0.0]
+    parser = iter_netsnmp_varbinds(_metered_lines(lines, call, wait))
+    while True:
+        wait[0] = 0.0
+        start = time.perf_counter()
+        varbind = next(parser, None)
+        call.parse_time += time.perf_counter() - start - wait[0]
+        if varbind is None:
+            return
+        call.varbinds += 1
+        yield varbind
+
+@contextlib.contextmanager
+def _measure(host, op, oid_list):
+    '''
+    Measures one SNMP operation for snmp_metrics.  Yields the Call, or None
+    when no metrics sinks are registered.
+    '''
+    call = snmp_metrics.start(host, op, oid_list, backend)
+    if call is None:
+        yield None
+        return
+    try:
+        yield call
+    except GeneratorExit:
+        # a walk the caller stopped reading early
+        call.finish()
+        raise
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.finish()
+
+def _recorded(host, snmp_comm, op, oid_list, varbinds):
+    '''
+    Returns varbinds, passing them through snmp_archive if recording is on.
+    '''
+    if snmp_archive.archive.recording:
+        return snmp_archive.archive.record_iter(host, snmp_comm, op, oid_list,
+          varbinds)
+    return varbinds
+
+def _session(host, snmp_comm, call=None):
+    '''
+    Opens a native session with the max-repetitions and timeout learned for
+    host (see snmp_tuning), counting its requests into call if given.
+    '''
+    tuner = snmp_tuning.tuner
+    return snmp_engine.Session(host, snmp_comm,
+      tuner=tuner if tuner.enabled else None, stats=call,
+      **tuner.session_args(host))
+
+def snmpget_varbinds(hostname, oid_list, snmp_comm):
+    '''
+    Makes one SNMP GET request for every OID in oid_list and returns a list of
+    (oid, value) tuples with typed values (see snmp_engine).  Raises one of
+    snmp_errors on failure.
+    '''
+    oid_list = list(oid_list)
+    with _measure(hostname, 'get', oid_list) as call:
+        if backend == 'replay':
+            varbinds = snmp_archive.archive.get(hostname, snmp_comm, oid_list)
+            if call is not None:
+                call.varbinds = len(varbinds)
+            return varbinds
+        if backend == 'native':
+            with _session(hostname, snmp_comm, call) as session:
+                varbinds = _native_get(session, oid_list)
+        else:
+            snmp_data = sub.check_output(['/usr/bin/snmpget', '-v2c', '-c',
+              snmp_comm, '-On', '-Oe'] + snmp_tuning.tuner.netsnmp_args(
+              hostname) + [hostname] + oid_list, universal_newlines=True)
+            if call is None:
+                varbinds = parse_netsnmp_output(snmp_data)
+            else:
+                varbinds = list(_metered_varbinds(snmp_data.split('\n'),
+                  call))
+        if snmp_archive.archive.recording:
+            snmp_archive.archive.record(hostname, snmp_comm, 'get', oid_list,
+              varbinds)
+        return varbinds
+
+def _native_get(session, oid_list):
+    # split the request in half if the agent can't fit the response in one
+    # PDU rather than failing the whole batch
+    try:
+        return session.get(oid_list)
+    except snmp_engine.SnmpError as e:
+        if e.error_status != 'tooBig' or len(oid_list) < 2:
+            raise
+    half = len(oid_list) // 2
+    return (_native_get(session, oid_list[:half]) +
+      _native_get(session, oid_list[half:]))
+
+def snmpget_multi(hostname, oid_list, snmp_comm):
+    '''
+    Fetches every OID in oid_list with a single GET request and returns a tuple
+    of a dictionary of OID to typed value (see snmp_engine) and the time the
+    response was received.  The dictionary keys are the OIDs as passed in.
+    OIDs the host does not have are set to snmp_engine.NO_SUCH_OBJECT or
+    NO_SUCH_INSTANCE.  Returns (None, None) if the host does not respond.
+
+    >>> snmpget_multi(hostname, [oids.map['sysName'], oids.map['sysDescr']],
+    ...   snmp_comm)
+    ({'1.3.6.1.2.1.1.5.0': b'aubcore01', '1.3.6.1.2.1.1.1.0': b'Cisco IOS...'},
+     1594107846.9434793)
+    '''
+    oid_list = list(oid_list)
+    try:
+        varbinds = snmpget_varbinds(hostname, oid_list, snmp_comm)
+    except snmp_errors as e:
+        print('No response from snmpget command: {0}'.format(e))
+        return None, None
+    now = time.time()
+    if len(varbinds) != len(oid_list):
+        print('Unexpected number of values received from snmpget.')
+        return None, None
+    values = {}
+    for oid, (vb_oid, value) in zip(oid_list, varbinds):
+        values[oid] = value
+    return values, now
+
+def snmp_str(value):
+    '''
+    Converts a typed SNMP value to a string.  Returns None for the SNMPv2
+    exception values.
+    '''
+    if snmp_engine.is_exception(value) or value is None:
+        return None
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+def snmpbulkwalk_varbinds(host, oid, snmp_comm, vlan_num=False):
+    '''
+    Walks the subtree under oid and returns a list of (oid, value) tuples with
+    typed values (see snmp_engine).  Raises one of snmp_errors on failure.
+    '''
+    return list(snmpbulkwalk_iter(host, oid, snmp_comm, vlan_num))
+
+def snmpbulkwalk_iter(host, oid, snmp_comm, vlan_num=False):
+    '''
+    Walks the subtree under oid and yields (oid, value) tuples with typed values
+    (see snmp_engine) as the responses arrive, without ever holding the whole
+    walk in memory.  Use this for large tables like the routing or ARP table.
+    Raises one of snmp_errors on failure, possibly after some varbinds have
+    already been yielded.
+    '''
+    if vlan_num:
+        snmp_comm = '{0}@{1}'.format(snmp_comm, vlan_num)
+    with _measure(host, 'walk', [oid]) as call:
+        if backend == 'native':
+            with _session(host, snmp_comm, call) as session:
+                yield from _recorded(host, snmp_comm, 'walk', [oid],
+                  session.iter_walk(oid))
+        elif backend == 'replay':
+            for varbind in snmp_archive.archive.walk(host, snmp_comm, oid):
+                if call is not None:
+                    call.varbinds += 1
+                yield varbind
+        else:
+            yield from _recorded(host, snmp_comm, 'walk', [oid],
+              _netsnmp_walk(host, oid, snmp_comm, call))
+
+def _netsnmp_walk(host, oid, snmp_comm, call):
+    '''
+    The subprocess backend of snmpbulkwalk_iter.
+    '''
+    max_repetitions = snmp_tuning.tuner.session_args(host)['max_repetitions']
+    cmd = (['/usr/bin/snmpbulkwalk', '-v2c', '-c', snmp_comm, '-On', '-Oe'] +
+      snmp_tuning.tuner.netsnmp_args(host, bulk=True) + [host, oid])
+    start = time.monotonic()
+    count = 0
+    proc = sub.Popen(cmd, stdout=sub.PIPE, universal_newlines=True)
+    if call is None:
+        varbinds = iter_netsnmp_varbinds(proc.stdout)
+    else:
+        varbinds = _metered_varbinds(proc.stdout, call)
+    try:
+        for varbind in varbinds:
+            count += 1
+            yield varbind
+    except BaseException:
+        # the caller stopped early or parsing failed
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+    if proc.wait():
+        snmp_tuning.tuner.observe_failure(host, max_repetitions)
+        raise sub.CalledProcessError(proc.returncode, cmd)
+    if count >= max_repetitions:
+        # only the total time is known, so spread it over the requests made
+        requests = -(-count // max_repetitions)
+        snmp_tuning.tuner.observe(host,
+          (time.monotonic() - start) / requests, max_repetitions, True)
+
+def snmp_column(host, oid, snmp_comm, vlan_num=False):
+    '''
+    Walks a table column and returns an OrderedDict of the index (the part of
+    each OID after the column OID) to the typed value, or None if the walk
+    fails.
+
+    >>> snmp_column(hostname, oids.map['ifName'], snmp_comm)
+    OrderedDict([('10101', b'Gi1/0/1'), ('10102', b'Gi1/0/2'),...
+    '''
+    try:
+        varbinds = snmpbulkwalk_varbinds(host, oid, snmp_comm, vlan_num)
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          oid, e))
+        return None
+    prefix_len = len(oid.strip('.')) + 1
+    column = collections.OrderedDict()
+    for vb_oid, value in varbinds:
+        column[vb_oid[prefix_len:]] = value
+    return column
+
+def snmp_table(host, columns, snmp_comm, vlan_num=False):
+    '''
+    Walks several table columns, named as in oids.map, in a single GETBULK
+    stream and returns an OrderedDict of row index to a dictionary of column
+    name to typed value, or None if the walk fails.  Rows missing a column
+    simply lack that key.  The subprocess backend walks the columns one at a
+    time and returns the same structure.
+
+    >>> snmp_table(hostname, ['ifName', 'ifOperStatus'], snmp_comm)
+    OrderedDict([('10101', {'ifName': b'Gi1/0/1', 'ifOperStatus': 1}),...
+    '''
+    column_oids = [oids.map[name] for name in columns]
+    try:
+        if backend == 'native':
+            table_comm = snmp_comm
+            if vlan_num:
+                table_comm = '{0}@{1}'.format(snmp_comm, vlan_num)
+            with _measure(host, 'table', column_oids) as call:
+                with _session(host, table_comm, call) as session:
+                    walks = session.walk_columns(column_oids)
+            if snmp_archive.archive.recording:
+                for oid, varbinds in zip(column_oids, walks):
+                    snmp_archive.archive.record(host, table_comm, 'walk',
+                      [oid], varbinds)
+        else:
+            walks = [snmpbulkwalk_varbinds(host, oid, snmp_comm, vlan_num)
+              for oid in column_oids]
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          ', '.join(columns), e))
+        return None
+    table = collections.OrderedDict()
+    for name, oid, varbinds in zip(columns, column_oids, walks):
+        prefix_len = len(oid.strip('.')) + 1
+        for vb_oid, value in varbinds:
+            index = vb_oid[prefix_len:]
+            try:
+                table[index][name] = value
+            except KeyError:
+                table[index] = {name: value}
+    return table
+
+def snmp_dispatch(host, dispatcher, snmp_comm, vlan_num=False):
+    '''
+    Walks every column that has a handler in dispatcher, an
+    oid_registry.Dispatcher, and feeds the varbinds to the handlers as they
+    arrive.  The native backend covers all columns, even from different tables,
+    in a single GETBULK stream.  Returns the number of varbinds handled, or
+    None if the walk fails.
+
+    >>> dispatcher = oid_registry.Dispatcher()
+    >>> dispatcher.on('ifName', names.__setitem__)
+    >>> dispatcher.on('cdpCacheDeviceId', neighbors.__setitem__)
+    >>> snmp_dispatch(hostname, dispatcher, snmp_comm)
+    66
+    '''
+    columns = dispatcher.columns()
+    try:
+        if backend == 'native':
+            walk_comm = snmp_comm
+            if vlan_num:
+                walk_comm = '{0}@{1}'.format(snmp_comm, vlan_num)
+            with _measure(host, 'table', columns) as call:
+                with _session(host, walk_comm, call) as session:
+                    varbinds = ((vb_oid, value) for col, vb_oid, value in
+                      session.iter_walk_columns(columns))
+                    return dispatcher.dispatch(_recorded(host, walk_comm,
+                      'walk', columns, varbinds))
+        handled = 0
+        for oid in columns:
+            handled += dispatcher.dispatch(
+              snmpbulkwalk_iter(host, oid, snmp_comm, vlan_num))
+        return handled
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          ', '.join(columns), e))
+        return None
+
+def format_varbinds(varbinds):
+    '''
+    Renders varbinds as net-snmp style text so the native backend can stand in
+    for the command line tools.
+    '''
+    lines = [snmp_engine.format_varbind(oid, value) for oid, value in varbinds]
+    if not lines:
+        return ''
+    return '\n'.join(lines) + '\n'
 
 def snmpget(hostname, oid, snmp_comm):
     '''
@@ -14,15 +459,23 @@ def snmpget(hostname, oid, snmp_comm):
     #print('Running snmpget -v2c -c {0} {1} {2}'.format(
     #  snmp_comm, host, oid))
     try:
-        snmp_data = sub.check_output(['/usr/bin/snmpget', '-v2c', '-c', \
-          snmp_comm, hostname, oid], universal_newlines=True)
+        if backend != 'subprocess':
+            snmp_data = format_varbinds(
+              snmpget_varbinds(hostname, [oid], snmp_comm))
+        else:
+            with _measure(hostname, 'get', [oid]) as call:
+                snmp_data = sub.check_output(['/usr/bin/snmpget', '-v2c',
+                  '-c', snmp_comm] + snmp_tuning.tuner.netsnmp_args(hostname)
+                  + [hostname, oid], universal_newlines=True)
+                if call is not None:
+                    call.bytes = len(snmp_data)
         if (snmp_data):
             return snmp_data
         else:
             print('No data received from snmpget.')
             return None
-    except:
-        print('No response from snmpget command.')
+    except snmp_errors as e:
+        print('No response from snmpget command: {0}'.format(e))
         return None
 
 def snmpbulkwalk(host, oid, snmp_comm, vlan_num=False, split=False):
@@ -35,8 +488,16 @@ def snmpbulkwalk(host, oid, snmp_comm, vlan_num=False, split=False):
     #print('Running snmpbulkwalk -v2c -c {0} {1} {2}'.format(
     #  snmp_comm, host, oid))
     try:
-        snmp_data = sub.check_output(['/usr/bin/snmpbulkwalk','-v2c','-c',
-          snmp_comm, host, oid], universal_newlines=True)
+        if backend != 'subprocess':
+            snmp_data = format_varbinds(
+              snmpbulkwalk_varbinds(host, oid, snmp_comm))
+        else:
+            with _measure(host, 'walk', [oid]) as call:
+                snmp_data = sub.check_output(['/usr/bin/snmpbulkwalk',
+                  '-v2c', '-c', snmp_comm] + snmp_tuning.tuner.netsnmp_args(
+                  host, bulk=True) + [host, oid], universal_newlines=True)
+                if call is not None:
+                    call.bytes = len(snmp_data)
         if (snmp_data):
             if split == True:
                 snmp_data = snmp_data.split('\n')
@@ -44,18 +505,23 @@ def snmpbulkwalk(host, oid, snmp_comm, vlan_num=False, split=False):
         else:
             print('No data received from snmpbulkwalk.')
             return None
-    except:
-        print('No response from snmpbulkwalk command for {0}.'.format(oid))
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          oid, e))
         return None
 
 def convert_mac(mac):
     '''
-    Converts '90 B1 1C 46 A5 1D' to '90b1.1c46.a51d'.
+    Converts '90 B1 1C 46 A5 1D' to '90b1.1c46.a51d'.  Use
+    macaddr.mac_from_hex_string to keep the MAC address as an integer.
     '''
     hex_nums = mac.lower().split()
+    if len(hex_nums) == 6:
+        return macaddr.format_mac(macaddr.mac_from_hex_string(mac))
+    # not a MAC address, grouped the same way anyway
     hex_chunk1 = ''.join(hex_nums[0:2])
     hex_chunk2 = ''.join(hex_nums[2:4])
-    hex_chunk3 = ''.join(hex_nums[4:])   
+    hex_chunk3 = ''.join(hex_nums[4:])
     hex_mac = '.'.join([hex_chunk1, hex_chunk2, hex_chunk3])
     return hex_mac
 
@@ -63,7 +529,8 @@ def dec_to_hex_mac(decimal_mac):
     '''
     Some SNMP OIDs return MAC addresses in decimal format.  This function will
     take a MAC address in decimal format and convert it to hexadecimal.  The
-    leading '.' will be removed if passed in the argument.
+    leading '.' will be removed if passed in the argument.  Use
+    macaddr.mac_from_decimal_oid to keep the MAC address as an integer.
 
     iso.3.6.1.2.1.17.4.3.1.2.0.80.86.149.64.110 = INTEGER: 3
 
@@ -71,24 +538,10 @@ def dec_to_hex_mac(decimal_mac):
     '0050.5695.406e'
 
     '''
-    if decimal_mac.startswith('.'):
-        decimal_mac = decimal_mac[1:]
-    decimal_mac = decimal_mac.split('.')
-    if len(decimal_mac) > 6:
+    if len(decimal_mac.strip('.').split('.')) > 6:
         print("Got more decimals than expected for a MAC address.")
         print("Only rightmost six decimal values will be used.")
-        decimal_mac = decimal_mac[-6:]
-    hex_nums = []
-    for num in decimal_mac:
-        hex_num = hex(int(num))[2:]
-        if len(hex_num) < 2:
-            hex_num = '0' + hex_num
-        hex_nums.append(hex_num)
-    hex_chunk1 = ''.join(hex_nums[0:2])
-    hex_chunk2 = ''.join(hex_nums[2:4])
-    hex_chunk3 = ''.join(hex_nums[4:])
-    hex_mac = '.'.join([hex_chunk1, hex_chunk2, hex_chunk3])
-    return hex_mac
+    return macaddr.format_mac(macaddr.mac_from_decimal_oid(decimal_mac))
 
 def get_arp_table(arp_hosts, snmp_comm):
     '''
@@ -98,30 +551,19 @@ def get_arp_table(arp_hosts, snmp_comm):
     All IP/MAC key/value entries are merged into the dictionary with no mention
     of which hostname they came from.  Only a single IP address per MAC can be
     stored which could lose some data for MAC addresses that have multiple IP
-    addresses.  If this is a concern, use get_arp_ip_list instead.
+    addresses.  If this is a concern, use get_arp_ip_list instead, or
+    arp_collector.collect_arp to poll many routers concurrently and keep track
+    of where each entry came from.
 
     {'0024.3876.4e80': '192.168.254.71', 'f025.7294.afc2': '10.102.23.250'}
     '''
-    # deprecated but works on cisco and juniper
-    oid = oids.map['ipNetToMediaPhysAddress']
     arp_table = {}
     for host in arp_hosts:
-        snmp_data = snmpbulkwalk(host, oid, snmp_comm)
-        if snmp_data is None:
+        arp = get_arp_array(host, snmp_comm)
+        if arp is None:
             return None
-        else:
-            snmp_data = snmp_data.split('\n')
-            # .2.1.4.22.1.2.25.10.102.25.12 = Hex-STRING: 00 0C 29 00 7E 81
-            re_arp = re.compile(
-              r'(\d+\.\d+\.\d+\.\d+)\s=\sHex-STRING:\s([\s\d\w]+)',
-              re.IGNORECASE)
-            for line in snmp_data:
-                arp_match = re_arp.search(line)
-                if(arp_match):
-                    ip  = arp_match.group(1)
-                    mac = arp_match.group(2)
-                    converted_mac = convert_mac(mac)
-                    arp_table[converted_mac] = ip
+        for mac_int, ip_int in arp:
+            arp_table[macaddr.format_mac(mac_int)] = macaddr.format_ip(ip_int)
     return arp_table
 
 def get_arp_ip_list(arp_hosts, snmp_comm):
@@ -130,39 +572,71 @@ def get_arp_ip_list(arp_hosts, snmp_comm):
     mappings.  Even a single host must be provided as a single-element list.
 
     The IP address value is a list which allows multiple IP addresses per MAC
-    address.
+    address.  The ARP table of each host is read with get_arp_array.
 
     {'0015.5d29.3e44': ['10.115.41.142'],
      'bc30.5bf4.e038': ['10.118.0.5', '10.118.0.7']}
     '''
-    # deprecated but works on cisco and juniper
-    oid = oids.map['ipNetToMediaPhysAddress']
     arp_table = {}
+    # (mac, ip) pairs already added, instead of scanning each IP list
+    seen = set()
     for host in arp_hosts:
-        snmp_data = snmpbulkwalk(host, oid, snmp_comm)
-        if snmp_data is None:
+        arp = get_arp_array(host, snmp_comm)
+        if arp is None:
             return None
-        else:
-            snmp_data = snmp_data.split('\n')
-            # .2.1.4.22.1.2.25.10.102.25.12 = Hex-STRING: 00 0C 29 00 7E 81
-            re_arp = re.compile(
-              r'(\d+\.\d+\.\d+\.\d+)\s=\sHex-STRING:\s([\s\d\w]+)',
-              re.IGNORECASE)
-            for line in snmp_data:
-                arp_match = re_arp.search(line)
-                if(arp_match):
-                    ip  = arp_match.group(1)
-                    mac = arp_match.group(2)
-                    converted_mac = convert_mac(mac)
-                    if converted_mac in arp_table.keys():
-                        if ip in arp_table[converted_mac]:
-                            continue
-                        else:
-                            arp_table[converted_mac].append(ip)
-                    else:
-                        arp_table[converted_mac] = [ip]
+        for mac_int, ip_int in arp:
+            if (mac_int, ip_int) in seen:
+                continue
+            seen.add((mac_int, ip_int))
+            converted_mac = macaddr.format_mac(mac_int)
+            ip = macaddr.format_ip(ip_int)
+            try:
+                arp_table[converted_mac].append(ip)
+            except KeyError:
+                arp_table[converted_mac] = [ip]
     return arp_table
 
+def get_arp_array(hostname, snmp_comm):
+    '''
+    Returns the ARP table of a host as a macaddr.ArpTable, parallel arrays of
+    MAC address and IP address integers, or None if the walk fails.  This uses
+    a fraction of the memory of get_arp_ip_list on large L2 domains.
+
+    >>> arp = get_arp_array(hostname, snmp_comm)
+    >>> arp.mac_ips()
+    {345052807278: {168430081},...
+    '''
+    oid = oids.map['ipNetToMediaPhysAddress']
+    # ifindex.a.b.c.d
+    prefix_len = len(oid) + 1
+    arp = macaddr.ArpTable()
+    try:
+        for vb_oid, mac in snmpbulkwalk_iter(hostname, oid, snmp_comm):
+            if not isinstance(mac, bytes) or len(mac) != 6:
+                continue
+            ip = vb_oid[prefix_len:].split('.', 1)[1]
+            arp.append(macaddr.mac_from_bytes(mac),
+              route_table.octets_to_int(ip.split('.')))
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          oid, e))
+        return None
+    return arp
+
+# BGP4-MIB bgpPeerState and bgpPeerAdminStatus values
+bgp_state_map = {
+    1: 'idle',
+    2: 'connect',
+    3: 'active',
+    4: 'opensent',
+    5: 'openconfirm',
+    6: 'established',
+}
+bgp_admin_map = {
+    1: 'shut',
+    2: 'up',
+}
+
 def get_bgp_ipv4_peers(hostname, snmp_comm):
     '''
     IOS, IOS-XE, JunOS
@@ -174,13 +648,13 @@ def get_bgp_ipv4_peers(hostname, snmp_comm):
     '''
     bgp_ipv4_peers = {}
     oid = oids.map['bgpPeerRemoteAddr']
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    snmp_data = snmp_data.rstrip().split('\n')
-    for data in snmp_data:
-        peer = data.split(' ')[-1].rstrip()
+    column = snmp_column(hostname, oid, snmp_comm)
+    if column is None:
+        return None
+    for peer in column.values():
         # Assign None value to key; the netlib module uses this dictionary to
         # store BGP peer objects
-        bgp_ipv4_peers[peer] = None
+        bgp_ipv4_peers[str(peer)] = None
     return bgp_ipv4_peers
 
 def get_bgp_ipv4_peer_status(hostname, peer_addr, snmp_comm):
@@ -191,30 +665,47 @@ def get_bgp_ipv4_peer_status(hostname, peer_addr, snmp_comm):
     values for 'admin' are 'shut' and 'up'.
 
     {'state': 'established', 'admin': 'up'}
+
+    Both values are fetched in one request.  To get the status of every peer,
+    use get_bgp_peer_table instead.
     '''
-    bgp_state_map = {
-        '1': 'idle',
-        '2': 'connect',
-        '3': 'active',
-        '4': 'opensent',
-        '5': 'openconfirm',
-        '6': 'established',
-    }
-    bgp_admin_map = {
-        '1': 'shut',
-        '2': 'up',
-    }
     ipv4_peer_status = {}
-    oid = oids.map['bgpPeerState'] + '.' + peer_addr
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    result = snmp_data.split(' ')[-1].rstrip()
-    ipv4_peer_status['state'] = bgp_state_map[result]
-    oid = oids.map['bgpPeerAdminStatus'] + '.' + peer_addr
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    result = snmp_data.split(' ')[-1].rstrip()
-    ipv4_peer_status['admin'] = bgp_admin_map[result]
+    state_oid = oid_registry.oid_for('bgpPeerState', peer_addr)
+    admin_oid = oid_registry.oid_for('bgpPeerAdminStatus', peer_addr)
+    values, now = snmpget_multi(hostname, [state_oid, admin_oid], snmp_comm)
+    if values is None:
+        return None
+    ipv4_peer_status['state'] = bgp_state_map[values[state_oid]]
+    ipv4_peer_status['admin'] = bgp_admin_map[values[admin_oid]]
     return ipv4_peer_status
 
+def get_bgp_peer_table(hostname, snmp_comm):
+    '''
+    IOS, IOS-XE, JunOS
+    Returns a dictionary of every IPv4 BGP peer address to its state, admin
+    status, hold time and keepalive (both in seconds, as negotiated), or None
+    if the walk fails.  The five bgpPeerTable columns are walked together, so
+    a route reflector with hundreds of peers is read in a few requests.
+
+    {'172.29.2.25': {'state': 'established', 'admin': 'up',
+                     'hold_time': 90, 'keepalive': 30},...}
+    '''
+    table = snmp_table(hostname, ['bgpPeerState', 'bgpPeerAdminStatus',
+      'bgpPeerRemoteAddr', 'bgpPeerHoldTime', 'bgpPeerKeepAlive'], snmp_comm)
+    if table is None:
+        return None
+    peers = collections.OrderedDict()
+    for index, row in table.items():
+        # the table is indexed by the remote address
+        peer_addr = snmp_str(row.get('bgpPeerRemoteAddr')) or index
+        peers[peer_addr] = {
+            'state': bgp_state_map.get(row.get('bgpPeerState')),
+            'admin': bgp_admin_map.get(row.get('bgpPeerAdminStatus')),
+            'hold_time': row.get('bgpPeerHoldTime'),
+            'keepalive': row.get('bgpPeerKeepAlive'),
+        }
+    return peers
+
 def get_routes(hostname, protocol, snmp_comm):
     '''
     IOS only
@@ -228,38 +719,68 @@ def get_routes(hostname, protocol, snmp_comm):
 
     Possible protocol values are 'connected', 'static', 'ospf', and 'bgp'.
 
-    ***** Run this on a host with a full BGP table at your OWN RISK. *****
+    The routing table is streamed and only routes for the requested protocol
+    are kept, so memory use is proportional to the result rather than to the
+    walk.  For a full BGP table use get_route_table instead.
 
     [IPv4Network('0.0.0.0/0'), IPv4Network('10.251.1.0/24'),...
     '''
     prefixes = []
     proto_map = {
-        '2': 'connected',
-        '3': 'static',
-        '13': 'ospf',
-        '14': 'bgp'
+        2: 'connected',
+        3: 'static',
+        13: 'ospf',
+        14: 'bgp'
     }
     oid = oids.map['ipCidrRouteProto']
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    if snmp_data is None:
-        return None, None
-    else:
-        snmp_data = snmp_data.split('\n')
     # ...1.2.1.4.24.4.1.7.192.168.25.0.255.255.255.0.0.172.30.2.2 = INTEGER: 14
-    re_route = re.compile(
-      r'((\d+\.){3}\d+)\.((\d+\.){3}\d+)\.0\.(\d+\.){3}\d+\s=\sINTEGER:\s(\d+)')
-    for line in snmp_data:
-        route_match = re_route.search(line)
-        if(route_match):
-            network = route_match.group(1)
-            netmask = route_match.group(3)
-            proto_num = route_match.group(6)
-            if proto_map[proto_num] == protocol:
-                prefix = '/'.join([network, netmask])
-                prefix_obj = ipaddress.ip_network(prefix)
-                prefixes.append(prefix_obj)
+    #                     ^ dest       ^ mask        ^ tos ^ next hop
+    prefix_len = len(oid) + 1
+    try:
+        for vb_oid, proto_num in snmpbulkwalk_iter(hostname, oid, snmp_comm):
+            if proto_map.get(proto_num) != protocol:
+                continue
+            index = vb_oid[prefix_len:].split('.')
+            if len(index) != 13:
+                continue
+            network = '.'.join(index[0:4])
+            netmask = '.'.join(index[4:8])
+            prefix = '/'.join([network, netmask])
+            prefix_obj = ipaddress.ip_network(prefix)
+            prefixes.append(prefix_obj)
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          oid, e))
+        return None, None
     return prefixes
 
+def get_route_table(hostname, snmp_comm):
+    '''
+    IOS only, see get_routes
+
+    Returns every route from ipCidrRouteTable as a route_table.RouteTable,
+    which stores the network, mask length, next hop and protocol of each route
+    in packed integer arrays.  This is safe to run against a full Internet
+    table.  Returns None if the walk fails.
+
+    >>> table = get_route_table(hostname, snmp_comm)
+    >>> table.filter(protocol='static').to_networks()
+    [IPv4Network('0.0.0.0/0'), IPv4Network('10.251.1.0/24'),...
+    '''
+    table = route_table.RouteTable()
+    oid = oids.map['ipCidrRouteProto']
+    prefix_len = len(oid) + 1
+    try:
+        for vb_oid, proto_num in snmpbulkwalk_iter(hostname, oid, snmp_comm):
+            index = vb_oid[prefix_len:].split('.')
+            if len(index) == 13:
+                table.append_index(index, proto_num)
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          oid, e))
+        return None
+    return table
+
 def get_cdp_data(hostname, snmp_comm):
     '''
     IOS, NX-OS, IOS-XE
@@ -267,47 +788,87 @@ def get_cdp_data(hostname, snmp_comm):
     values are a tuple containing the CDP neighbor hostname and neighbor
     interface.
 
+    The neighbor ID, neighbor port and ifName columns are walked together in
+    one stream and joined on the CDP cache index (ifindex.device_index), so the
+    number of requests does not grow with the number of neighbors.
+
     {'gi1/0/1': ('lf-01.foo.example.net', 'gi1/0/23'),....
     '''
     cdp_data = {}
-    cdp_run_oid   = oids.map['cdpGlobalRun']
-    cdp_nei_oid   = oids.map['cdpCacheDeviceId']
-    cdp_ports_oid = oids.map['cdpCacheDevicePort']
-    intf_name_oid = oids.map['ifName']
-    cdp_run_status = snmpbulkwalk(hostname, cdp_run_oid, snmp_comm, split=True)
-    assert cdp_run_status != None
-    if cdp_run_status[0].endswith('INTEGER: 1'):
+    cdp_run_status = snmp_column(hostname, oids.map['cdpGlobalRun'], snmp_comm)
+    if cdp_run_status is None:
+        return None
+    if 1 in cdp_run_status.values():
         #print('cdp enabled!', hostname)
         pass
     else:
         print('{0} does not appear to support CDP.'.format(hostname))
         return False
-    cdp_nei_data = snmpbulkwalk(hostname, cdp_nei_oid, snmp_comm, split=True)
-    re_cdp_nei   = re.compile(r'(\d+\.\d+)\s=\sSTRING:\s"(\S+)"')
-    re_cdp_intf  = re.compile(r'\s=\sSTRING:\s"(\S+)"')
-    re_intf_name = re.compile(r'\s=\sSTRING:\s"(\S+)"')
-    for line in cdp_nei_data:
-        cdp_nei_match = re_cdp_nei.search(line)
-        if cdp_nei_match:
-            cdp_idx = cdp_nei_match.group(1)
-            cdp_nei = cdp_nei_match.group(2)
-            cdp_nei_intf_oid = '.'.join([cdp_ports_oid, cdp_idx])
-            cdp_intf_data = snmpbulkwalk(
-              hostname, cdp_nei_intf_oid, snmp_comm, split=True)
-            cdp_intf_match = re_cdp_intf.search(cdp_intf_data[0])
-            if cdp_intf_match:
-                cdp_intf = cdp_intf_match.group(1).replace(
-                  'GigabitEthernet', 'gi')
-            intf_idx = cdp_idx.split('.')[0]
-            intf_oid = '.'.join([intf_name_oid, intf_idx])
-            intf_name_data = snmpbulkwalk(
-              hostname, intf_oid, snmp_comm, split=True)
-            intf_name_match = re_intf_name.search(intf_name_data[0])
-            if intf_name_match:
-                intf_name = intf_name_match.group(1).lower()
-            cdp_data[intf_name] = (cdp_nei, cdp_intf)
+    cdp_neis = collections.OrderedDict()
+    cdp_ports = {}
+    intf_names = {}
+    dispatcher = oid_registry.Dispatcher()
+    dispatcher.on('cdpCacheDeviceId', cdp_neis.__setitem__)
+    dispatcher.on('cdpCacheDevicePort', cdp_ports.__setitem__)
+    dispatcher.on('ifName', intf_names.__setitem__)
+    if snmp_dispatch(hostname, dispatcher, snmp_comm) is None:
+        return None
+    for cdp_idx, cdp_nei in cdp_neis.items():
+        cdp_nei = snmp_str(cdp_nei)
+        cdp_intf = snmp_str(cdp_ports.get(cdp_idx))
+        if cdp_intf:
+            cdp_intf = cdp_intf.replace('GigabitEthernet', 'gi')
+        intf_idx = cdp_idx.split('.')[0]
+        intf_name = snmp_str(intf_names.get(intf_idx))
+        if intf_name:
+            intf_name = intf_name.lower()
+        cdp_data[intf_name] = (cdp_nei, cdp_intf)
     return cdp_data
 
+def _lldp_port_str(value):
+    # port IDs are usually interface names, but some devices send the MAC
+    text = snmp_str(value)
+    if isinstance(value, bytes) and len(value) == 6 and not text.isprintable():
+        return macaddr.format_mac(macaddr.mac_from_bytes(value))
+    return text
+
+def get_lldp_data(hostname, snmp_comm):
+    '''
+    Any LLDP-MIB device
+    Returns a dictionary in the get_cdp_data format, where the keys are local
+    port IDs (usually the interface names) and the values are a tuple
+    containing the LLDP neighbor system name and port ID.  Returns None if the
+    walk fails.
+
+    The neighbor name, neighbor port and local port columns are walked
+    together and joined on the local port number, the second part of the
+    lldpRemTable index (time_mark.local_port.rem_index).
+
+    {'xe-0/0/1': ('lf-01.foo.example.net', 'ethernet1/49'),....
+    '''
+    lldp_data = {}
+    lldp_neis = collections.OrderedDict()
+    lldp_ports = {}
+    local_ports = {}
+    dispatcher = oid_registry.Dispatcher()
+    dispatcher.on('lldp_neighbor', lldp_neis.__setitem__)
+    dispatcher.on('lldp_neighbor_intf', lldp_ports.__setitem__)
+    dispatcher.on('lldp_ifindex', local_ports.__setitem__)
+    if snmp_dispatch(hostname, dispatcher, snmp_comm) is None:
+        return None
+    for lldp_idx, lldp_nei in lldp_neis.items():
+        lldp_nei = snmp_str(lldp_nei)
+        if not lldp_nei:
+            continue
+        lldp_intf = _lldp_port_str(lldp_ports.get(lldp_idx))
+        if lldp_intf:
+            lldp_intf = lldp_intf.lower()
+        port_num = lldp_idx.split('.')[1]
+        intf_name = _lldp_port_str(local_ports.get(port_num)) or port_num
+        lldp_data[intf_name.lower()] = (lldp_nei, lldp_intf)
+    return lldp_data
+
+@snmp_cache.cached('intf_maps')
 def get_intf_maps(hostname, snmp_comm):
     '''
     IOS, NX-OS, IOS-XE, JunOS
@@ -328,94 +889,127 @@ def get_intf_maps(hostname, snmp_comm):
     (OrderedDict([('1', 'fxp0'),...('584', 'reth0.4050'),...
     '''
     oid = oids.map['ifName']
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    if snmp_data is None:
+    column = snmp_column(hostname, oid, snmp_comm)
+    if column is None:
         return None, None
-    else:
-        snmp_data = snmp_data.split('\n')
-        intf_name_map = collections.OrderedDict()
-        intf_id_map = collections.OrderedDict()
-        re_intf_id = re.compile(
-          r'\.(\d+)\s=\sSTRING:\s(\S+)', re.IGNORECASE)
-        for line in snmp_data:
-            intf_id_match = re_intf_id.search(line)
-            if(intf_id_match):
-                intf_id = intf_id_match.group(1)
-                intf_name = intf_id_match.group(2)
-                if intf_name.startswith('"') and intf_name.endswith('"'):
-                    intf_name = intf_name[1:-1]
-                # for our Nexus friends
-                if 'Ethernet' in intf_name:
-                    intf_parts = intf_name.split('hernet')
-                    intf_name = ''.join(intf_parts)
-                intf_name_map[intf_id] = intf_name.lower()
-                intf_id_map[intf_name.lower()] = intf_id
-        return intf_name_map, intf_id_map
-
+    intf_name_map = collections.OrderedDict()
+    intf_id_map = collections.OrderedDict()
+    for intf_id, intf_name in column.items():
+        intf_name = snmp_str(intf_name)
+        if not intf_name:
+            continue
+        # for our Nexus friends
+        if 'Ethernet' in intf_name:
+            intf_parts = intf_name.split('hernet')
+            intf_name = ''.join(intf_parts)
+        intf_name_map[intf_id] = intf_name.lower()
+        intf_id_map[intf_name.lower()] = intf_id
+    return intf_name_map, intf_id_map
+
+@snmp_cache.cached('serial_num')
 def get_serial_num(hostname, snmp_comm, software=False):
     '''
     IOS, NX-OS
 
     Returns the serial number for IOS and NX-OS network hosts. The 'software'
-    can be passed as 'ios' or 'nxos', otherwise an additional SNMP call will be
-    made to determine the system type.
+    can be passed as 'ios' or 'nxos', otherwise the system type is taken from
+    cached get_sysinfo results or from sysDescr, fetched in the same request as
+    the NX-OS serial number. Returns None for any other system type.
     '''
+    serial_num = None
+    sys_descr_oid = oids.map['sysDescr']
+    nxos_ser_oid = oids.map['nxos_ser_num']
+    if software == False:
+        sysinfo = snmp_cache.cache.peek('sysinfo', hostname,
+          get_sysinfo.cache_args(hostname, snmp_comm))
+        if sysinfo:
+            software = sysinfo[3]
     if software == False:
-        software = get_sysinfo(hostname, snmp_comm)[3]
+        values, now = snmpget_multi(
+          hostname, [sys_descr_oid, nxos_ser_oid], snmp_comm)
+        if values is None:
+            return None
+        software = get_software_type(snmp_str(values[sys_descr_oid]))
+    elif software == 'nxos':
+        values, now = snmpget_multi(hostname, [nxos_ser_oid], snmp_comm)
+        if values is None:
+            return None
     if software == 'nxos':
-        snmp_data = snmpget(
-          hostname, oids.map['nxos_ser_num'], snmp_comm)
-        snmp_data = snmp_data.split('"')
-        serial_num = snmp_data[-2]
+        serial_num = snmp_str(values[nxos_ser_oid])
     elif software == 'ios':
-        snmp_data = snmpbulkwalk(
-          hostname, oids.map['ios_ser_num'], snmp_comm)
-        serial_num = snmp_data.split('STRING: ')[1].splitlines()[0]
-        serial_num = serial_num.strip('"')
+        column = snmp_column(hostname, oids.map['ios_ser_num'], snmp_comm)
+        if column is None:
+            return None
+        # the first entity with a serial number is the chassis
+        for value in column.values():
+            serial_num = snmp_str(value)
+            if serial_num:
+                break
     return serial_num
 
+def get_software_type(sys_descr):
+    '''
+    Returns the software type for a sysDescr string: 'nxos', 'ios', 'iosxe',
+    'junos' or None if it is not recognized.
+    '''
+    if sys_descr is None:
+        return None
+    if ('Cisco NX-OS' in sys_descr):
+        return 'nxos'
+    elif ('Cisco IOS' in sys_descr):
+        return 'ios'
+    elif ('IOS-XE' in sys_descr):
+        return 'iosxe'
+    elif ('Juniper' in sys_descr):
+        return 'junos'
+    return None
+
+# Cisco IOS Software, IOS-XE Software, Catalyst 4500 L3 Switch  Software
+# (cat4500e-UNIVERSALK9-M), Version 03.07.00.E RELEASE SOFTWARE (fc4)
+re_version_iosxe = re.compile(
+  r'IOS-XE\sSoftware,\s(.+?)\s+Software\s\(.*?\),\sVersion\s([^\s,]+)')
+
+@snmp_cache.cached('sysinfo')
 def get_sysinfo(hostname, snmp_comm):
     '''
     IOS, NX-OS, IOS-XE, JunOS
 
     Returns four strings: the configured hostname, hardware platform, software
     version, and software type. Possible software types are 'eos', 'nxos',
-    'iosxe', and 'junos'.
+    'iosxe', and 'junos'.  sysDescr and sysName are fetched in one request.
 
     ('ifc-fw-01', 'srx550 internet router', '12.3X48-D30.7', 'junos')
     '''
-    try:
-        snmp_data = snmpget(hostname, oids.map['sysDescr'], snmp_comm)
-    except:
+    sys_descr_oid = oids.map['sysDescr']
+    sys_name_oid = oids.map['sysName']
+    values, now = snmpget_multi(
+      hostname, [sys_descr_oid, sys_name_oid], snmp_comm)
+    if values is None:
         print('Unable to get snmp data.')
         return None, None, None, None
-    if ('Cisco NX-OS' in snmp_data):
-        platform = snmp_data.split('STRING: ')[1].split(',')[0]
-        version = snmp_data.split('ersion ')[1].split(',')[0]
-        software = 'nxos'
-    elif ('Cisco IOS' in snmp_data):
-        platform = snmp_data.split('STRING: ')[1].split(',')[0].lstrip('"')
-        version = snmp_data.split('ersion ')[1].split(',')[0]
-        software = 'ios'
-    elif ('IOS-XE' in snmp_data):
+    sys_descr = snmp_str(values[sys_descr_oid])
+    software = get_software_type(sys_descr)
+    if software == 'nxos':
+        platform = sys_descr.split(',')[0]
+        version = sys_descr.split('ersion ')[1].split(',')[0]
+    elif software == 'ios':
+        platform = sys_descr.split(',')[0]
+        version = sys_descr.split('ersion ')[1].split(',')[0]
+    elif software == 'iosxe':
         # SNMPv2-MIB::sysDescr.0 = STRING: Cisco IOS Software, IOS-XE Software,
         # Catalyst 4500 L3 Switch  Software (cat4500e-UNIVERSALK9-M), Version
         # 03.07.00.E RELEASE SOFTWARE (fc4)
-        iosxe_match = re_version_iosxe.search(snmp_data)
+        iosxe_match = re_version_iosxe.search(sys_descr)
         if iosxe_match:
             platform = iosxe_match.group(1)
             version = iosxe_match.group(2)
-        software = 'iosxe'
-    elif ('Juniper' in snmp_data):
-        platform = snmp_data.split('Inc. ')[1].split(',')[0]
-        version = snmp_data.split('JUNOS ')[1].split(',')[0]
-        software = 'junos'
+    elif software == 'junos':
+        platform = sys_descr.split('Inc. ')[1].split(',')[0]
+        version = sys_descr.split('JUNOS ')[1].split(',')[0]
     else:
         return False
-    snmp_data = snmpget(hostname, oids.map['sysName'], snmp_comm)
-    sysname = snmp_data.rstrip().split(' ')[-1].lower()
-    if sysname.startswith('"') and sysname.endswith('"'):
-        sysname = sysname[1:-1]
+    sysname = snmp_str(values[sys_name_oid]) or ''
+    sysname = sysname.strip().split(' ')[-1].lower()
     sysname = sysname.split('.')[0]
     if (sysname != hostname):
         print(
@@ -428,15 +1022,15 @@ def get_uptime(hostname, snmp_comm):
     IOS, NX-OS, IOS-XE, JunOS
     Returns the system uptime and SNMP engine uptime as a tuple.  Accuracy of
     the data is not always consistent, so the value of this function is
-    questionable.
+    questionable.  Both values are fetched in one request.
     '''
-    oid1 = oids.map['sysUpTime']
+    oid1 = oid_registry.oid_for('sysUpTime', 0)
     oid2 = oids.map['snmpEngineTime']
-    snmp_data = snmpbulkwalk(hostname, oid1, snmp_comm)
-    snmp_data = snmp_data.rstrip().split(' ')
-    sysuptime = ' '.join(snmp_data[-3:])
-    snmp_data = snmpbulkwalk(hostname, oid2, snmp_comm)
-    seconds = int(snmp_data.split('INTEGER: ')[1].rstrip())
+    values, now = snmpget_multi(hostname, [oid1, oid2], snmp_comm)
+    if values is None:
+        return None, None
+    sysuptime = snmp_engine.format_timeticks(int(values[oid1]))
+    seconds = int(values[oid2])
     days = seconds // 86400
     seconds_remain = seconds % 86400
     hours = seconds_remain // 3600
@@ -453,6 +1047,7 @@ def get_uptime(hostname, snmp_comm):
       days, 'days', hours, minutes, seconds)
     return (sysuptime, snmpuptime)
 
+@snmp_cache.cached('vlan_list')
 def get_vlan_list(hostname, snmp_comm):
     '''
     IOS, NX-OS
@@ -463,24 +1058,22 @@ def get_vlan_list(hostname, snmp_comm):
     {'"X:172.31.251.0/29:LB_INTERCO_DMZ"': '4038',,...}
     '''
     oid = oids.map['vlan_list']
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
+    column = snmp_column(hostname, oid, snmp_comm)
     vlan_names = {}
     ignore_list = ['1002', '1003', '1004', '1005']
-    if snmp_data is None:
+    if column is None:
         return None, None
-    else:
-        snmp_data = snmp_data.split('\n')
-        re_vlan = re.compile(r'\.(\d+)\s=\sSTRING:\s(\S+)', re.IGNORECASE)
-        for line in snmp_data:
-            vlan_match = re_vlan.search(line)
-            if(vlan_match):
-                vlan_num  = str(vlan_match.group(1))
-                if vlan_num in ignore_list:
-                    continue
-                vlan_name = str(vlan_match.group(2))
-                vlan_names[vlan_name] = vlan_num
-        vlan_nums = {v: k for k, v in vlan_names.items()}
-        return vlan_nums, vlan_names
+    for vlan_num, vlan_name in column.items():
+        if vlan_num in ignore_list:
+            continue
+        vlan_name = snmp_str(vlan_name)
+        if vlan_name is None:
+            continue
+        # names keep the quotes net-snmp printed around them
+        vlan_name = '"{0}"'.format(vlan_name)
+        vlan_names[vlan_name] = vlan_num
+    vlan_nums = {v: k for k, v in vlan_names.items()}
+    return vlan_nums, vlan_names
 
 def get_vlan_mac_port(hostname, vlan_num, snmp_comm):
     '''
@@ -507,29 +1100,34 @@ def get_vlan_mac_port(hostname, vlan_num, snmp_comm):
     Total Mac Addresses for this criterion: 2
 
     '''
-    vlan_num = str(vlan_num)
-    oid = oids.map['vlan_mac_port']
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm, vlan_num)
-    vlan_mac_ports = {}
-    if snmp_data is None:
+    vlan_mac_ports = get_vlan_mac_array(hostname, vlan_num, snmp_comm)
+    if vlan_mac_ports is None:
         return None, None
-    else:
-        snmp_data = snmp_data.split('\n')
-        re_vlan_mac_port = re.compile(
-          r'((\.\d+){6})\s=\sINTEGER:\s(\d+)', re.IGNORECASE)
-        for line in snmp_data:
-            vlan_mac_port_match = re_vlan_mac_port.search(line)
-            if(vlan_mac_port_match):
-                decimal_mac = vlan_mac_port_match.group(1)
-                port_id     = vlan_mac_port_match.group(3)
-                hex_mac = dec_to_hex_mac(decimal_mac)
-                mac_vlan = (hex_mac, vlan_num)
-                try:
-                    vlan_mac_ports[port_id].append(mac_vlan)
-                except:
-                    vlan_mac_ports[port_id] = [mac_vlan]
-        return vlan_mac_ports
+    return vlan_mac_ports.to_dict()
 
+def get_vlan_mac_array(hostname, vlan_num, snmp_comm):
+    '''
+    Returns the bridge table of one VLAN as a macaddr.BridgeTable, parallel
+    arrays of MAC address integers, port IDs and VLAN numbers, or None if the
+    walk fails.  See get_vlan_mac_port.
+    '''
+    oid = oids.map['vlan_mac_port']
+    prefix_len = len(oid) + 1
+    bridge = macaddr.BridgeTable()
+    try:
+        for vb_oid, port_id in snmpbulkwalk_iter(
+          hostname, oid, snmp_comm, str(vlan_num)):
+            if not isinstance(port_id, int):
+                continue
+            bridge.append(macaddr.mac_from_decimal_oid(vb_oid[prefix_len:]),
+              port_id, int(vlan_num))
+    except snmp_errors as e:
+        print('No response from snmpbulkwalk command for {0}: {1}'.format(
+          oid, e))
+        return None
+    return bridge
+
+@snmp_cache.cached('base_ports')
 def get_base_ports(hostname, snmp_comm):
     '''
     Returns a dictionary of port ID to ifindex key/value mappings.
@@ -538,65 +1136,93 @@ def get_base_ports(hostname, snmp_comm):
     '''
     base_ports = {}
     oid = oids.map['BaseMappingPort']
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    snmp_data = snmp_data.split('\n')
-    # iso.3.6.1.4.1.9.9.276.1.5.1.1.1.10116 = INTEGER: 16
-    re_base_port= re.compile(r'\.(\d+)\s=\sINTEGER:\s(\d+)')
-    for line in snmp_data:
-        base_port_match = re_base_port.search(line)
-        if base_port_match:
-            intf_base_port = base_port_match.group(1)
-            intf_integer   = base_port_match.group(2)
-            base_ports[intf_integer] = intf_base_port
+    # .1.3.6.1.4.1.9.9.276.1.5.1.1.1.10116 = INTEGER: 16
+    column = snmp_column(hostname, oid, snmp_comm)
+    if column is None:
+        return None
+    for intf_index, port_id in column.items():
+        if isinstance(port_id, int):
+            base_ports[str(port_id)] = intf_index
     return base_ports
 
 # need to optimize this to only return CIDR which can then be split if needed
 #{'1000101': {'ipv4': ('10.234.194.12', '31', '10.234.194.12/31'), 'ipv6':
 #('2a01:0111:0000:106a:00b7:0000:0000:0000', '126',
 
+intf_status_map = {
+    1: 'up',
+    2: 'down',
+    6: 'empty',
+}
+
 def get_all_intf_status(hostname, snmp_comm):
     '''
     IOS, NX-OX, IOS-XE, JunOS
 
     Returns a dictionary where the keys are ifindices and the value is a
     dictionary containing two key/value pairs: 'admin' and 'link'.  The possible
-    values are up and down.
+    values are up and down.  Both columns are walked together.
 
     {'10103': {'admin': 'up', 'link': 'up'},...}
     '''
+    columns = {'ifAdminStatus': 'admin', 'ifOperStatus': 'link'}
+    table = snmp_table(hostname, list(columns), snmp_comm)
+    if table is None:
+        return None
     intf_index_status = {}
-    def get_status(oid_name, intf_index_status):
-        if 'Admin' in oid_name:
-            status = 'admin'
-        elif 'Oper' in oid_name:
-            status = 'link'
-        else:
-            raise ValueError('OID name must be ifAdminStatus or ifOperStatus.')
-        oid = oids.map[oid_name]
-        snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-        snmp_data = snmp_data.split('\n')
-        # iso.3.6.1.2.1.2.2.1.7.10117 = INTEGER: 1
-        re_intf_status = re.compile(r'\.(\d+)\s=\sINTEGER:\s(\d+)')
-        for line in snmp_data:
-            intf_status_match = re_intf_status.search(line)
-            if intf_status_match:
-                intf_index = str(intf_status_match.group(1))
-                intf_status = int(intf_status_match.group(2))
-                if (intf_status == 1):
-                    intf_status = 'up'
-                elif (intf_status == 2):
-                    intf_status = 'down'
-                elif (intf_status == 6):
-                    intf_status = 'empty'
-                try:
-                    intf_index_status[intf_index][status] = intf_status
-                except Exception as e:
-                    intf_index_status[intf_index] = {status: intf_status}
-        #return intf_index_status
-    for oid_name in ['ifAdminStatus', 'ifOperStatus']:
-        get_status(oid_name, intf_index_status)
+    for intf_index, row in table.items():
+        intf_index_status[intf_index] = {}
+        for oid_name, status in columns.items():
+            if oid_name in row:
+                intf_status = row[oid_name]
+                intf_status = intf_status_map.get(intf_status, intf_status)
+                intf_index_status[intf_index][status] = intf_status
     return intf_index_status
 
+def get_intf_table(hostname, snmp_comm):
+    '''
+    IOS, NX-OS, IOS-XE, JunOS
+
+    Returns a snapshot of every interface from one table walk of ifName,
+    ifAlias, ifAdminStatus, ifOperStatus and ifHighSpeed.  The keys are
+    ifindices and the values are dictionaries with the interface name (as in
+    get_intf_maps), description (as in get_all_intf_desc), admin and link
+    status (as in get_all_intf_status) and bandwidth in bits per second (as in
+    get_intf_bw).
+
+    {'10103': {'name': 'gi1/0/3', 'desc': 'Q:lf-01:Gi0/47', 'admin': 'up',
+               'link': 'up', 'bw': 1000000000},...}
+    '''
+    columns = ['ifName', 'ifAlias', 'ifAdminStatus', 'ifOperStatus',
+      'ifHighSpeed']
+    table = snmp_table(hostname, columns, snmp_comm)
+    if table is None:
+        return None
+    intf_table = collections.OrderedDict()
+    for intf_index, row in table.items():
+        intf_name = snmp_str(row.get('ifName'))
+        if intf_name:
+            # for our Nexus friends
+            if 'Ethernet' in intf_name:
+                intf_name = ''.join(intf_name.split('hernet'))
+            intf_name = intf_name.lower()
+        intf_desc = snmp_str(row.get('ifAlias'))
+        if intf_desc == '':
+            intf_desc = 'NO_DESC'
+        admin = row.get('ifAdminStatus')
+        link = row.get('ifOperStatus')
+        intf_bw = row.get('ifHighSpeed')
+        if intf_bw is not None:
+            intf_bw = int(intf_bw) * 1000000
+        intf_table[intf_index] = {
+            'name': intf_name,
+            'desc': intf_desc,
+            'admin': intf_status_map.get(admin, admin),
+            'link': intf_status_map.get(link, link),
+            'bw': intf_bw,
+        }
+    return intf_table
+
 def get_intf_status(hostname, intf_index, option, snmp_comm):
     '''
     IOS, NX-OX, IOS-XE, JunOS
@@ -605,32 +1231,25 @@ def get_intf_status(hostname, intf_index, option, snmp_comm):
     admin or operating (protocol) status of the interface.
     '''
     if (option == 'admin'):
-        oid = oids.map['ifAdminStatus'] + '.' + intf_index
+        oid = oid_registry.oid_for('ifAdminStatus', intf_index)
     elif (option == 'oper'):
-        oid = oids.map['ifOperStatus'] + '.' + intf_index
-    snmp_data = snmpget(hostname, oid, snmp_comm)
-    status = int(snmp_data.split()[-1])
-    if (status == 1):
-        intf_status = 'up'
-    elif (status == 2):
-        intf_status = 'down'
-    elif (status == 6):
-        intf_status = 'empty'
-    else: 
-        intf_status = status
-    return intf_status
+        oid = oid_registry.oid_for('ifOperStatus', intf_index)
+    values, now = snmpget_multi(hostname, [oid], snmp_comm)
+    if values is None:
+        return None
+    status = values[oid]
+    return intf_status_map.get(status, status)
 
 def get_intf_desc(hostname, intf_index, snmp_comm):
     '''
     Takes the interface index and returns the interface description for the
     interface.
     '''
-    oid = oids.map['ifAlias'] + '.' + intf_index
-    snmp_data = snmpget(hostname, oid, snmp_comm)
-    intf_desc = snmp_data.split(' ')[-1].rstrip()
-    if intf_desc.startswith('"') and intf_desc.endswith('"'):
-        intf_desc = intf_desc[1:-1]
-    return intf_desc
+    oid = oid_registry.oid_for('ifAlias', intf_index)
+    values, now = snmpget_multi(hostname, [oid], snmp_comm)
+    if values is None:
+        return None
+    return snmp_str(values[oid])
 
 def get_all_intf_desc(hostname, snmp_comm):
     '''
@@ -645,23 +1264,17 @@ def get_all_intf_desc(hostname, snmp_comm):
     '''
     oid = oids.map['ifAlias']
     intf_index_desc = {}
-    snmp_data = snmpbulkwalk(hostname, oid, snmp_comm)
-    snmp_data = snmp_data.split('\n')
-    # iso.3.6.1.2.1.31.1.1.1.18.10119 = STRING: "IMG DATA0"
-    # iso.3.6.1.2.1.31.1.1.1.18.10107 = ""
-    re_intf_desc = re.compile(r'\.(\d+)\s=\s(STRING:\s)?(.+)')
-    for line in snmp_data:
-        intf_desc_match = re_intf_desc.search(line)
-        if intf_desc_match:
-            intf_index = intf_desc_match.group(1)
-            intf_desc  = intf_desc_match.group(3)
-            if intf_desc.startswith('"') and intf_desc.endswith('"'):
-                intf_desc = intf_desc[1:-1]
-                if len(intf_desc) == 0:
-                    intf_desc = 'NO_DESC'
-            else:
-                intf_desc = None
-            intf_index_desc[intf_index] = intf_desc
+    column = snmp_column(hostname, oid, snmp_comm)
+    if column is None:
+        return None
+    for intf_index, intf_desc in column.items():
+        if isinstance(intf_desc, bytes):
+            intf_desc = snmp_str(intf_desc)
+            if len(intf_desc) == 0:
+                intf_desc = 'NO_DESC'
+        else:
+            intf_desc = None
+        intf_index_desc[intf_index] = intf_desc
     return intf_index_desc
 
 def get_intf_input_octets(hostname, intf_index, snmp_comm):
@@ -671,10 +1284,11 @@ def get_intf_input_octets(hostname, intf_index, snmp_comm):
     Takes the hostname and ifindex and returns the value of the interface's
     input throughput counter in octets of data.
     '''
-    input_octets_oid = (oids.map['ifHCInOctets'] + '.' + intf_index)
-    result = snmpget(hostname, input_octets_oid, snmp_comm)
-    input_octets = int(result.split(' ')[-1].rstrip())
-    return input_octets
+    input_octets_oid = oid_registry.oid_for('ifHCInOctets', intf_index)
+    values, now = snmpget_multi(hostname, [input_octets_oid], snmp_comm)
+    if values is None:
+        return None
+    return int(values[input_octets_oid])
 
 def get_intf_input_ucast_pkt(hostname, intf_index, snmp_comm):
     '''
@@ -683,10 +1297,12 @@ def get_intf_input_ucast_pkt(hostname, intf_index, snmp_comm):
     Takes the hostname and ifindex and returns the value of the interface's
     input counter value.
     '''
-    input_ucast_packets_oid = (oids.map['ifHCInUcastPkts'] + '.' + intf_index)
-    result = snmpget(hostname, input_ucast_packets_oid, snmp_comm)
-    input_ucast_packets = int(result.split(' ')[-1].rstrip())
-    return input_ucast_packets
+    input_ucast_packets_oid = oid_registry.oid_for(
+      'ifHCInUcastPkts', intf_index)
+    values, now = snmpget_multi(hostname, [input_ucast_packets_oid], snmp_comm)
+    if values is None:
+        return None
+    return int(values[input_ucast_packets_oid])
 
 def get_intf_input_errors(hostname, intf_index, snmp_comm):
     '''
@@ -695,10 +1311,11 @@ def get_intf_input_errors(hostname, intf_index, snmp_comm):
     Takes the hostname and ifindex of an interface and returns the input error
     counter value.
     '''
-    input_octets_oid = (oids.map['ifInErrors'] + '.' + intf_index)
-    result = snmpget(hostname, input_octets_oid, snmp_comm)
-    input_errors = int(result.split(' ')[-1].rstrip())
-    return input_errors
+    input_errors_oid = oid_registry.oid_for('ifInErrors', intf_index)
+    values, now = snmpget_multi(hostname, [input_errors_oid], snmp_comm)
+    if values is None:
+        return None
+    return int(values[input_errors_oid])
 
 def get_intf_input_counters(hostname, intf_index, snmp_comm):
     '''
@@ -711,26 +1328,30 @@ def get_intf_input_counters(hostname, intf_index, snmp_comm):
     is a tuple where the first value is the counter value returned by the host
     and the second value is the time the value was received.
 
+    All three counters are fetched in one request so they share a timestamp.
+
     >>> snmp.get_input_counters(hostname, intf_index, snmp_comm)
    {'aubcore01': {
       '10122': {
         'input_octets': (1666051390163, 1594107846.9434793),
-        'input_errors': (16, 1594107847.3509867),
-        'input_packets': (7165406182, 1594107847.1457753)}}}
+        'input_errors': (16, 1594107846.9434793),
+        'input_packets': (7165406182, 1594107846.9434793)}}}
     '''
+    counter_oids = {
+        'input_octets': oid_registry.oid_for('ifHCInOctets', intf_index),
+        'input_packets': oid_registry.oid_for('ifHCInUcastPkts', intf_index),
+        'input_errors': oid_registry.oid_for('ifInErrors', intf_index),
+    }
+    values, now = snmpget_multi(
+      hostname, list(counter_oids.values()), snmp_comm)
+    if values is None:
+        return None
     counter_data = {}
     counter_data[hostname] = {}
-    input_octets = get_intf_input_octets(hostname, intf_index, snmp_comm)
-    now = time.time()
-    counter_data[hostname][intf_index] = {'input_octets': (input_octets, now)}
-    input_packets = get_intf_input_ucast_pkt(hostname, intf_index, snmp_comm)
-    now = time.time()
-    data = {'input_packets': (input_packets, now)}
-    counter_data[hostname][intf_index].update(data)
-    input_errors = get_intf_input_errors(hostname, intf_index, snmp_comm)
-    now = time.time()
-    data = {'input_errors': (input_errors, now)}
-    counter_data[hostname][intf_index].update(data)
+    counter_data[hostname][intf_index] = {}
+    for counter, oid in counter_oids.items():
+        data = {counter: (int(values[oid]), now)}
+        counter_data[hostname][intf_index].update(data)
     return counter_data
 
 def get_intf_bw(hostname, intf_index, snmp_comm):
@@ -742,9 +1363,9 @@ def get_intf_bw(hostname, intf_index, snmp_comm):
     interface then this is the value that is returned, otherwise it is the
     default speed of the interface.
     '''
-    oid = oids.map['ifHighSpeed'] + '.' + intf_index
-    snmp_data = snmpget(hostname, oid, snmp_comm)
-    intf_bw = snmp_data.rstrip().split()[-1]
-    intf_bw = int(intf_bw) * 1000000
-    return intf_bw
+    oid = oid_registry.oid_for('ifHighSpeed', intf_index)
+    values, now = snmpget_multi(hostname, [oid], snmp_comm)
+    if values is None:
+        return None
+    return int(values[oid]) * 1000000
 
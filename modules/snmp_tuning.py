@@ -0,0 +1,288 @@
+#!/bin/env python3
+
+'''
+Per-device GETBULK max-repetitions and timeouts, learned from the devices
+themselves.
+
+Every GETBULK answered on the first try reports its round trip time and
+response size.  The timeout follows a smoothed RTT plus four times its
+variance, the way TCP sets its retransmission timer.  While responses are full,
+fast and within max_response_bytes, max-repetitions doubles, and once it has
+failed before it grows by about 10% per response.  A timeout or a tooBig error
+halves it and the halved value becomes the limit for fast growth.  Once a size
+has failed twice without an answer at that size in between, it is not tried
+again for a day.  Large Nexus boxes end up walking hundreds of rows per
+request.  An old Catalyst that drops big PDUs settles just below the size it
+stopped answering at.
+
+A GETBULK that fails at the smallest max-repetitions doubles the timeout of
+further GETBULKs to that host, up to max_timeout.  There is no RTT sample
+behind it, so it only lasts backoff_ttl, is dropped by the next answer, is
+never saved and never applies to GET.  A dead host costs a few slow walks, not
+a slower GET on every later run.
+
+snmp_tools sessions and snmpbulkwalk commands take their settings from the
+module level 'tuner'.  The learned profiles are kept in ~/.snmp_tuning.json
+(or SNMP_TUNING_FILE) and written when the script exits.  Set SNMP_TUNING=off
+to use the fixed defaults.
+
+>>> tuner.session_args('aubcore01')
+{'timeout': 1.0, 'retries': 5, 'max_repetitions': 80}
+'''
+
+import atexit
+import json
+import os
+import threading
+import time
+from os import environ
+
+default_path = os.path.join(os.path.expanduser('~'), '.snmp_tuning.json')
+
+# the net-snmp defaults, used until a device has been measured
+default_max_repetitions = 10
+default_timeout = 1.0
+default_retries = 5
+# seconds before a max-repetitions that failed may be tried again
+ceiling_ttl = 86400
+# failures at a max-repetitions before it becomes the ceiling
+ceiling_failures = 2
+# seconds a timeout raised by failures alone applies to GETBULK
+backoff_ttl = 600
+
+class DeviceProfile(object):
+    def __init__(self, max_repetitions=default_max_repetitions,
+      timeout=default_timeout, ssthresh=None, srtt=None, rttvar=None,
+      ceiling=None, ceiling_expires=0, failed_at=None, failures=0):
+        self.max_repetitions = max_repetitions
+        self.timeout = timeout
+        # growth is multiplicative below ssthresh and additive above it
+        self.ssthresh = ssthresh
+        self.srtt = srtt
+        self.rttvar = rttvar
+        # the smallest max-repetitions that failed, never grown into
+        self.ceiling = ceiling
+        self.ceiling_expires = ceiling_expires
+        # the smallest max-repetitions that failed since one that size was
+        # last answered, and how many times sizes that big have failed
+        self.failed_at = failed_at
+        self.failures = failures
+        # GETBULK timeout raised by failures, not saved
+        self.backoff_timeout = None
+        self.backoff_expires = 0
+        self.updated = time.time()
+
+    def limit(self, max_limit):
+        if self.ceiling is not None and self.ceiling_expires > time.time():
+            return min(max_limit, self.ceiling - 1)
+        return max_limit
+
+    def bulk_timeout(self):
+        if (self.backoff_timeout is not None and
+          self.backoff_expires > time.time()):
+            return max(self.timeout, self.backoff_timeout)
+        return self.timeout
+
+    def to_dict(self):
+        return {'max_repetitions': self.max_repetitions,
+                'timeout': self.timeout,
+                'ssthresh': self.ssthresh,
+                'srtt': self.srtt,
+                'rttvar': self.rttvar,
+                'ceiling': self.ceiling,
+                'ceiling_expires': self.ceiling_expires,
+                'failed_at': self.failed_at,
+                'failures': self.failures,
+                'updated': self.updated}
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data['max_repetitions'], data['timeout'],
+          data.get('ssthresh'), data.get('srtt'), data.get('rttvar'),
+          data.get('ceiling'), data.get('ceiling_expires', 0),
+          data.get('failed_at'), data.get('failures', 0))
+        profile.updated = data.get('updated', profile.updated)
+        return profile
+
+class Tuner(object):
+    def __init__(self, path=None, min_repetitions=5, max_repetitions=250,
+      min_timeout=1.0, max_timeout=10.0, target_rtt=0.5,
+      max_response_bytes=32768):
+        self.path = path
+        self.min_repetitions = min_repetitions
+        self.max_repetitions = max_repetitions
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        # responses slower or larger than this stop the growth
+        self.target_rtt = target_rtt
+        self.max_response_bytes = max_response_bytes
+        self.enabled = True
+        self.profiles = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        if path:
+            self.load()
+
+    def profile(self, host):
+        with self.lock:
+            return self._profile(host)
+
+    def _profile(self, host):
+        profile = self.profiles.get(host)
+        if profile is None:
+            profile = self.profiles[host] = DeviceProfile()
+        return profile
+
+    def session_args(self, host):
+        '''
+        Returns the snmp_engine.Session keyword arguments for host.
+        '''
+        if not self.enabled:
+            return {'timeout': default_timeout, 'retries': default_retries,
+                    'max_repetitions': default_max_repetitions}
+        profile = self.profile(host)
+        return {'timeout': profile.timeout, 'retries': default_retries,
+                'max_repetitions': profile.max_repetitions}
+
+    def bulk_timeout(self, host):
+        '''
+        Returns the GETBULK timeout for host, which failures may have raised
+        above the session_args timeout for a while.
+        '''
+        if not self.enabled:
+            return default_timeout
+        with self.lock:
+            return self._profile(host).bulk_timeout()
+
+    def netsnmp_args(self, host, bulk=False):
+        '''
+        Returns the net-snmp command line options for host: -t and -r, and
+        -Cr for snmpbulkwalk.
+        '''
+        args = self.session_args(host)
+        timeout = args['timeout']
+        if bulk:
+            timeout = self.bulk_timeout(host)
+        options = ['-t', '{0:g}'.format(timeout), '-r', str(args['retries'])]
+        if bulk:
+            options.append('-Cr{0}'.format(args['max_repetitions']))
+        return options
+
+    def observe(self, host, rtt, max_repetitions, full, response_bytes=0):
+        '''
+        Records a GETBULK response.  rtt is in seconds, full is True if the
+        agent returned every repetition asked for (a short response at the end
+        of a table says nothing about how much more the device could send).
+        '''
+        if not self.enabled:
+            return
+        with self.lock:
+            profile = self._profile(host)
+            if profile.srtt is None:
+                profile.srtt = rtt
+                profile.rttvar = rtt / 2
+            else:
+                profile.rttvar = (0.75 * profile.rttvar +
+                  0.25 * abs(profile.srtt - rtt))
+                profile.srtt = 0.875 * profile.srtt + 0.125 * rtt
+            profile.timeout = self._rto(profile)
+            profile.backoff_timeout = None
+            if (profile.failed_at is not None and
+              max_repetitions >= profile.failed_at):
+                # the earlier failure at this size was a lost packet
+                profile.failed_at = None
+                profile.failures = 0
+            if max_repetitions == profile.max_repetitions:
+                if rtt > self.target_rtt:
+                    profile.max_repetitions = max(self.min_repetitions,
+                      profile.max_repetitions * 3 // 4)
+                elif full and response_bytes < self.max_response_bytes:
+                    if (profile.ssthresh is None or
+                      profile.max_repetitions < profile.ssthresh):
+                        grown = profile.max_repetitions * 2
+                        if profile.ssthresh is not None:
+                            grown = min(grown, profile.ssthresh)
+                    else:
+                        grown = (profile.max_repetitions +
+                          max(1, profile.max_repetitions // 10))
+                    profile.max_repetitions = max(profile.max_repetitions,
+                      min(profile.limit(self.max_repetitions), grown))
+            profile.updated = time.time()
+            self.dirty = True
+
+    def observe_failure(self, host, max_repetitions):
+        '''
+        Records a GETBULK that timed out or was too big.  Returns the
+        max-repetitions to retry with, or None if it cannot go any lower.
+        '''
+        if not self.enabled:
+            return None
+        with self.lock:
+            profile = self._profile(host)
+            if max_repetitions <= self.min_repetitions:
+                profile.backoff_timeout = min(self.max_timeout,
+                  profile.bulk_timeout() * 2)
+                profile.backoff_expires = time.time() + backoff_ttl
+                return None
+            if (profile.failed_at is None or
+              max_repetitions < profile.failed_at):
+                profile.failed_at = max_repetitions
+                profile.failures = 1
+            else:
+                profile.failures += 1
+            if (profile.failures >= ceiling_failures and
+              profile.limit(profile.failed_at + 1) >= profile.failed_at):
+                profile.ceiling = profile.failed_at
+                profile.ceiling_expires = time.time() + ceiling_ttl
+            profile.max_repetitions = max(self.min_repetitions,
+              min(profile.max_repetitions, max_repetitions // 2))
+            profile.ssthresh = profile.max_repetitions
+            profile.updated = time.time()
+            self.dirty = True
+            return profile.max_repetitions
+
+    def _rto(self, profile):
+        return min(self.max_timeout, max(self.min_timeout,
+          profile.srtt + 4 * profile.rttvar))
+
+    def forget(self, host=None):
+        with self.lock:
+            if host is None:
+                self.profiles.clear()
+            else:
+                self.profiles.pop(host, None)
+            self.dirty = True
+
+    def load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, 'rt') as f:
+                data = json.load(f)
+            profiles = {host: DeviceProfile.from_dict(profile)
+              for host, profile in data.items()}
+        except Exception as e:
+            print('Ignoring unreadable SNMP tuning file {0}: {1}'.format(
+              self.path, e))
+            return
+        with self.lock:
+            self.profiles.update(profiles)
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            data = {host: profile.to_dict()
+              for host, profile in self.profiles.items()}
+            self.dirty = False
+        tmp_path = '{0}.{1}'.format(self.path, os.getpid())
+        with open(tmp_path, 'wt') as f:
+            f.write(json.dumps(data))
+        os.replace(tmp_path, self.path)
+
+tuning_path = os.path.expanduser(environ.get('SNMP_TUNING_FILE', default_path))
+tuner = Tuner(path=tuning_path)
+if environ.get('SNMP_TUNING', '').lower() in ('off', 'no', '0', 'false'):
+    tuner.enabled = False
+else:
+    atexit.register(tuner.save)
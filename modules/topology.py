@@ -0,0 +1,255 @@
+#!/bin/env python3
+
+'''
+Discover the network graph by crawling CDP and LLDP neighbors.
+
+Starting from the seed devices, every device is polled for its CDP and LLDP
+neighbor tables and every new neighbor is queued to be polled in turn, breadth
+first.  Up to 'concurrency' devices are polled at once (see snmp_fleet), and a
+queued device starts as soon as a slot frees up rather than a level at a time,
+so one slow device does not hold up the crawl.
+
+Devices are identified by their lowercase short hostname, so 'AUBCORE01',
+'aubcore01.foo.example.net' and the NX-OS style 'aubcore01(FOX1234ABCD)' are
+all the node 'aubcore01'.  Neighbors are polled by the name they advertise,
+less any NX-OS '(serial)' suffix.
+
+Interface names are shortened the same way at both ends of a link, so
+'GigabitEthernet1/0/1' and 'Gi1/0/1' are both 'gi1/0/1'.  LLDP port IDs that
+are an ifIndex rather than a name are looked up in the neighbor's ifName table
+when the neighbor was crawled too.
+
+>>> topo = crawl(['aubcore01'], snmp_comm, max_depth=3)
+>>> topo.neighbors('aubcore01')
+[('gi1/0/1', 'lf-01', 'gi1/0/23', 'cdp'),...]
+>>> print(topo.edge_list(), end='')
+aubcore01 gi1/0/1 lf-01 gi1/0/23 cdp,lldp
+'''
+
+import asyncio
+import collections
+import json
+import re
+import snmp_fleet
+import snmp_tools
+
+# 'GigabitEthernet1/0/1', 'Gi1/0/1', 'port-channel10', 'Eth1/49'; Junos style
+# names ('xe-0/0/1') and MAC addresses do not match
+re_intf_name = re.compile(r'^([a-z][a-z-]*[a-z])\s*(\d[\d/.:]*)$')
+
+# Cisco abbreviations longer than two letters: TwentyFiveGigE is Twe (Two is
+# TwoGigabitEthernet), FourHundredGigE is Fou (Fo is FortyGigabitEthernet)
+long_abbrevs = ('twe', 'fou')
+
+def node_key(name):
+    '''
+    Returns the node name for a hostname or CDP device ID.
+    '''
+    name = name.strip().lower().split('(')[0]
+    return name.split('.')[0]
+
+def poll_name(name):
+    '''
+    Returns the name to poll a hostname or CDP device ID by, without the
+    serial number NX-OS appends to its device ID.
+    '''
+    return name.strip().split('(')[0]
+
+def intf_key(name):
+    '''
+    Returns the short lowercase form of an interface name, the first two
+    letters and the number as the config parsers use, so the long and
+    abbreviated names of an interface are equal.  Other port IDs are only
+    lowercased.
+    '''
+    if not name:
+        return name
+    name = name.strip().lower()
+    intf_match = re_intf_name.search(name)
+    if not intf_match:
+        return name
+    prefix = intf_match.group(1)
+    if prefix.startswith(long_abbrevs):
+        prefix = prefix[:3]
+    else:
+        prefix = prefix[:2]
+    return ''.join([prefix, intf_match.group(2)])
+
+def poll_neighbors(hostname, snmp_comm):
+    '''
+    Returns (cdp_data, lldp_data, intf_names) for hostname, the neighbor data
+    in the get_cdp_data format, with {} for a protocol the device does not run,
+    and the ifIndex to ifName map of a device that runs LLDP so its neighbors'
+    port IDs can be resolved.  Returns None if the device does not answer.
+    '''
+    cdp_data = snmp_tools.get_cdp_data(hostname, snmp_comm)
+    if cdp_data is None:
+        return None
+    lldp_data = snmp_tools.get_lldp_data(hostname, snmp_comm)
+    intf_names = None
+    if lldp_data:
+        intf_names, intf_ids = snmp_tools.get_intf_maps(hostname, snmp_comm)
+    return cdp_data or {}, lldp_data or {}, intf_names or {}
+
+class Topology(object):
+    '''
+    The nodes found by a crawl and the links each polled node reported.  A
+    node's status is 'queued', 'polled', 'failed', or 'skipped' for neighbors
+    that were seen but not polled because of the crawl limits.
+    '''
+    def __init__(self):
+        # node -> {'name': name polled, 'depth': hops from a seed, 'status'}
+        self.nodes = collections.OrderedDict()
+        # node -> [(local_intf, neighbor, neighbor_intf, protocol),...]
+        self.links = {}
+        # node -> {ifIndex: intf_key(ifName)} for nodes that run LLDP
+        self.intf_names = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add_node(self, name, depth, status):
+        '''
+        Adds a node unless it is already known.  Returns its key, or None if it
+        was already known.
+        '''
+        key = node_key(name)
+        if not key or key in self.nodes:
+            return None
+        self.nodes[key] = {'name': poll_name(name), 'depth': depth,
+          'status': status}
+        return key
+
+    def add_links(self, key, protocol, neighbor_data):
+        '''
+        Records the get_cdp_data style neighbor_data reported by node key.
+        Returns the neighbor names seen.
+        '''
+        names = []
+        links = self.links.setdefault(key, [])
+        for local_intf, (nei_name, nei_intf) in neighbor_data.items():
+            if not nei_name:
+                continue
+            links.append((intf_key(local_intf), node_key(nei_name),
+              intf_key(nei_intf), protocol))
+            names.append(nei_name)
+        return names
+
+    def add_intf_names(self, key, intf_names):
+        '''
+        Records the get_intf_maps style ifIndex to ifName map of node key.
+        '''
+        self.intf_names[key] = {intf_id: intf_key(intf_name)
+          for intf_id, intf_name in intf_names.items()}
+
+    def port_name(self, key, port_id):
+        '''
+        Returns the interface name for a port ID reported by a neighbor of node
+        key, its ifName if port_id is one of its ifIndexes.
+        '''
+        return self.intf_names.get(key, {}).get(port_id, port_id)
+
+    def neighbors(self, key):
+        return sorted(self.links.get(node_key(key), []),
+          key=lambda link: [str(field) for field in link])
+
+    def edges(self):
+        '''
+        Returns [(node, intf, neighbor, neighbor_intf, protocols),...] with
+        every link once, even if both ends and both protocols reported it.
+        '''
+        edges = collections.OrderedDict()
+        for key, links in self.links.items():
+            for local_intf, nei_key, nei_intf, protocol in links:
+                nei_intf = self.port_name(nei_key, nei_intf)
+                ends = sorted([(key, local_intf or ''),
+                  (nei_key, nei_intf or '')])
+                edges.setdefault(tuple(ends), set()).add(protocol)
+        return [(a, a_intf, b, b_intf, ','.join(sorted(protocols)))
+          for ((a, a_intf), (b, b_intf)), protocols in sorted(edges.items())]
+
+    def edge_list(self):
+        '''
+        Returns the edges as text, one 'node intf neighbor neighbor_intf
+        protocols' line per link.
+        '''
+        return ''.join('{0} {1} {2} {3} {4}\n'.format(*[field or '-'
+          for field in edge]) for edge in self.edges())
+
+    def to_dict(self):
+        return {'nodes': self.nodes,
+                'adjacency': {key: [{'intf': local_intf, 'neighbor': nei_key,
+                  'neighbor_intf': nei_intf, 'protocol': protocol}
+                  for local_intf, nei_key, nei_intf, protocol
+                  in self.neighbors(key)] for key in self.links}}
+
+    def save(self, path):
+        with open(path, 'wt') as f:
+            f.write(json.dumps(self.to_dict(), indent=2))
+
+async def crawl_async(seeds, snmp_comm, topology=None, max_depth=None,
+  max_nodes=None, include=None, concurrency=64, per_host=1):
+    '''
+    Crawls outward from seeds and returns the Topology.  Neighbors more than
+    max_depth hops from a seed, beyond the first max_nodes devices, or whose
+    name does not match the regular expression include are recorded but not
+    polled.
+    '''
+    if topology is None:
+        topology = Topology()
+    if include is not None:
+        include = re.compile(include)
+    queue = collections.deque()
+    for seed in seeds:
+        key = topology.add_node(seed, 0, 'queued')
+        if key is not None:
+            queue.append(key)
+    polled = 0
+    running = {}
+    with snmp_fleet.FleetPoller(concurrency, per_host) as poller:
+        while queue or running:
+            while queue and len(running) < concurrency:
+                key = queue.popleft()
+                task = asyncio.ensure_future(poller.call(
+                  topology.nodes[key]['name'], poll_neighbors, snmp_comm))
+                running[task] = key
+                polled += 1
+            done, pending = await asyncio.wait(running,
+              return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                key = running.pop(task)
+                node = topology.nodes[key]
+                try:
+                    result = task.result()
+                except Exception as e:
+                    print('{0} failed: {1}'.format(node['name'], e))
+                    result = None
+                if result is None:
+                    node['status'] = 'failed'
+                    continue
+                node['status'] = 'polled'
+                cdp_data, lldp_data, intf_names = result
+                if intf_names:
+                    topology.add_intf_names(key, intf_names)
+                names = (topology.add_links(key, 'cdp', cdp_data) +
+                  topology.add_links(key, 'lldp', lldp_data))
+                depth = node['depth'] + 1
+                for name in names:
+                    if ((max_depth is not None and depth > max_depth) or
+                      (include is not None and not include.search(name)) or
+                      (max_nodes is not None and
+                      polled + len(queue) >= max_nodes)):
+                        topology.add_node(name, depth, 'skipped')
+                        continue
+                    nei_key = topology.add_node(name, depth, 'queued')
+                    if nei_key is not None:
+                        queue.append(nei_key)
+    return topology
+
+def crawl(seeds, snmp_comm, topology=None, max_depth=None, max_nodes=None,
+  include=None, concurrency=64, per_host=1):
+    '''
+    Blocking wrapper around crawl_async.
+    '''
+    return asyncio.run(crawl_async(seeds, snmp_comm, topology, max_depth,
+      max_nodes, include, concurrency, per_host))
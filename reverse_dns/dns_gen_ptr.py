@@ -6,7 +6,7 @@ import re
 import sys
 sys.path.insert(0, '../')
 import modules.filelib as flib
-import modules.parsers as parse
+import modules.ingest as ingest
 import ipdb
 
 parser = argparse.ArgumentParser(
@@ -107,18 +107,8 @@ def gen_reverse_zone(db_dict):
 
 configs = flib.get_config_list(conf_dir)
 
-ip_dict = {}
-
-for hostname, conf_path, platform in configs:
-    host_ip_dict = {hostname: {}}
-    if os.path.isfile(conf_path):
-        with open(conf_path, encoding='utf-8') as fh:
-            config_lines = fh.readlines()
-    else:
-        print("Hmmm, {0} doesn't appear to be a file.".format(fullpath))
-    E = enumerate(config_lines)
-    parse.parse_any(hostname, platform, E, host_ip_dict) 
-    ip_dict.update(host_ip_dict)
+# parsed in parallel, one process per core
+ip_dict = ingest.parse_configs(configs)
 
 def update_dict(zonefile, hostname, intf, ip_addr, ip_mask):
     record = '-'.join([hostname, intf])
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# keep the modules away from the user's tuning, caches and archives; set before
+# any of them is imported since they read the environment at import time
+state_dir = tempfile.mkdtemp(prefix='net-yeti-tests-')
+os.environ['SNMP_TUNING_FILE'] = os.path.join(state_dir, 'snmp_tuning.json')
+os.environ['PARSE_CACHE_FILE'] = os.path.join(state_dir, 'parse_cache.json')
+os.environ['VENDOR_INDEX_FILE'] = os.path.join(state_dir, 'vendor_index.json')
+for name in ('SNMP_CACHE_FILE', 'SNMP_RECORD', 'SNMP_BACKEND', 'SNMP_ARCHIVE'):
+    os.environ.pop(name, None)
+
+# the SNMP modules import each other by bare name, the config modules as
+# modules.*
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'modules'))
+
+import snmp_simulator
+
+@pytest.fixture(scope='session')
+def agent():
+    '''
+    A simulated switch on localhost, community 'public'.
+    '''
+    agent = snmp_simulator.SimulatedAgent(snmp_simulator.synthetic_mib(
+      arp=200, routes=200, ports=24, vlans=2, macs_per_vlan=20))
+    agent.start()
+    yield agent
+    agent.stop()
+
+@pytest.fixture
+def dead_port():
+    '''
+    host:port of a UDP socket that never answers.
+    '''
+    import socket
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    yield '127.0.0.1:{0}'.format(sock.getsockname()[1])
+    sock.close()
@@ -0,0 +1,91 @@
+import pytest
+
+import counter_poller
+import oid_registry
+import snmp_engine
+import snmp_tools
+
+@pytest.fixture
+def device(monkeypatch):
+    '''
+    A fake device whose sysUpTime and counters are set by the test.  Each
+    request advances the clock by 10 seconds.
+    '''
+    state = {'uptime': snmp_engine.TimeTicks(100000), 'counters': {},
+      'now': 0.0}
+
+    def snmpget_multi(hostname, oid_list, snmp_comm):
+        state['now'] += 10
+        values = {}
+        for oid in oid_list:
+            if oid == oid_registry.oid_for('sysUpTime', 0):
+                values[oid] = state['uptime']
+            else:
+                values[oid] = state['counters'][oid]
+        return values, state['now']
+
+    def set_counters(octets, packets, errors, counter=snmp_engine.Counter64):
+        for name, value in zip(counter_poller.counter_names,
+          (octets, packets, errors)):
+            state['counters'][oid_registry.oid_for(name, '1')] = (
+              counter(value))
+
+    monkeypatch.setattr(snmp_tools, 'snmpget_multi', snmpget_multi)
+    state['set_counters'] = set_counters
+    return state
+
+@pytest.fixture
+def poller():
+    poller = counter_poller.CounterPoller('public')
+    poller.add('accsw01', ['1'])
+    return poller
+
+def test_rates(device, poller):
+    device['set_counters'](0, 0, 0)
+    assert poller.poll_host('accsw01') == 0
+    device['set_counters'](12500, 100, 1)
+    assert poller.poll_host('accsw01') == 1
+    assert poller.rates('accsw01', '1') == {'bps': [10000.0], 'pps': [10.0],
+      'eps': [0.1]}
+
+def test_high_rates_keep_precision():
+    ring = counter_poller.RingBuffer(2)
+    ring.append(98765432109.5)
+    assert ring.values() == [98765432109.5]
+
+def test_counter32_wrap(device, poller):
+    counter32 = snmp_engine.Counter32
+    device['set_counters'](2**32 - 1000, 2**32 - 10, 0, counter32)
+    poller.poll_host('accsw01')
+    device['set_counters'](250, 90, 0, counter32)
+    assert poller.poll_host('accsw01') == 1
+    assert poller.latest()['accsw01']['1'] == {'bps': 1000.0, 'pps': 10.0,
+      'eps': 0.0}
+
+def test_cleared_counter64_is_skipped(device, poller):
+    device['set_counters'](10**12, 10**9, 0)
+    poller.poll_host('accsw01')
+    device['set_counters'](1000, 10, 0)
+    assert poller.poll_host('accsw01') == 0
+    device['set_counters'](2250, 20, 0)
+    assert poller.poll_host('accsw01') == 1
+    assert poller.rates('accsw01', '1')['bps'] == [1000.0]
+
+def test_reboot_starts_a_new_baseline(device, poller):
+    device['set_counters'](10**6, 10**3, 0, snmp_engine.Counter32)
+    poller.poll_host('accsw01')
+    # after a reboot the counters restart near zero, which would otherwise
+    # look like a 32-bit wrap and produce a huge rate
+    device['uptime'] = snmp_engine.TimeTicks(500)
+    device['set_counters'](1000, 10, 0, snmp_engine.Counter32)
+    assert poller.poll_host('accsw01') == 0
+    assert poller.rates('accsw01', '1')['bps'] == []
+    device['uptime'] = snmp_engine.TimeTicks(1500)
+    device['set_counters'](2250, 20, 0, snmp_engine.Counter32)
+    assert poller.poll_host('accsw01') == 1
+    assert poller.rates('accsw01', '1')['bps'] == [1000.0]
+
+def test_uptime_wrap_is_not_a_reboot():
+    assert counter_poller.uptime_reset(100000, 500)
+    assert not counter_poller.uptime_reset(0xfffffff0, 500)
+    assert not counter_poller.uptime_reset(500, 100000)
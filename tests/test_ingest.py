@@ -0,0 +1,94 @@
+import concurrent.futures
+import multiprocessing
+
+import pytest
+
+import modules.ingest as ingest
+import modules.parse_cache as parse_cache
+import modules.parsers as parse
+
+ios_config = '''\
+hostname {0}
+!
+interface GigabitEthernet1/0/1
+ ip address 10.0.{1}.1 255.255.255.0
+!
+'''
+
+@pytest.fixture
+def configs(tmp_path):
+    configs = []
+    for i in range(6):
+        hostname = 'sw{0:02d}'.format(i)
+        conf_path = tmp_path / hostname
+        conf_path.write_text(ios_config.format(hostname, i))
+        configs.append((hostname, str(conf_path), 'cisco'))
+    return configs
+
+@pytest.fixture
+def no_cache():
+    cache = parse_cache.ParseCache()
+    cache.enabled = False
+    return cache
+
+@pytest.fixture
+def broken_parser(monkeypatch):
+    parse_any = parse.parse_any
+    def parse_or_fail(hostname, platform, E, host_ip_dict):
+        if hostname == 'sw03':
+            raise KeyError('full_intf')
+        return parse_any(hostname, platform, E, host_ip_dict)
+    monkeypatch.setattr(parse, 'parse_any', parse_or_fail)
+
+def expected(configs):
+    return {hostname: {'gi1/0/1': [('10.0.{0}.1'.format(i), '24')]}
+      for i, (hostname, conf_path, platform) in enumerate(configs)}
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_parse_configs(configs, no_cache, processes):
+    assert ingest.parse_configs(configs, processes, cache=no_cache) == \
+      expected(configs)
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_failed_config_is_skipped(configs, no_cache, broken_parser, capfd,
+  processes):
+    if processes > 1 and multiprocessing.get_start_method() != 'fork':
+        pytest.skip('workers only inherit the patch when forked')
+    ip_dict = ingest.parse_configs(configs, processes, cache=no_cache)
+    want = expected(configs)
+    del want['sw03']
+    assert ip_dict == want
+    assert 'Skipping {0}'.format(configs[3][1]) in capfd.readouterr().out
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_truncated_config_is_skipped(configs, no_cache, capfd, processes):
+    # cut off inside the interface block, before its address
+    with open(configs[2][1], 'wt') as fh:
+        fh.write('hostname sw02\n!\ninterface GigabitEthernet1/0/1\n')
+    ip_dict = ingest.parse_configs(configs, processes, cache=no_cache)
+    want = expected(configs)
+    del want['sw02']
+    assert ip_dict == want
+    assert 'Failed to parse {0}'.format(configs[2][1]) in capfd.readouterr().out
+
+def test_failed_config_is_not_cached(configs, capfd):
+    cache = parse_cache.ParseCache()
+    with open(configs[2][1], 'wt') as fh:
+        fh.write('hostname sw02\n!\ninterface GigabitEthernet1/0/1\n')
+    ingest.parse_configs(configs, 1, cache=cache)
+    assert sorted(cache.entries['ip']) == sorted(
+      conf_path for hostname, conf_path, platform in configs
+      if hostname != 'sw02')
+    capfd.readouterr()
+    assert 'sw02' not in ingest.parse_configs(configs, 1, cache=cache)
+    assert 'Failed to parse {0}'.format(configs[2][1]) in capfd.readouterr().out
+
+def test_serial_without_fork(configs, no_cache, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('pool started')
+    spawn = multiprocessing.get_context('spawn')
+    monkeypatch.setattr(ingest.multiprocessing, 'get_context',
+      lambda method=None: spawn)
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+    assert ingest.parse_configs(configs, 4, cache=no_cache) == \
+      expected(configs)
@@ -0,0 +1,37 @@
+import pytest
+
+import mac_locator
+
+def test_normalize_mac():
+    for mac in ('00:50:56:95:40:6E', '0050-5695-406e', '00 50 56 95 40 6E',
+      '0050.5695.406e'):
+        assert mac_locator.normalize_mac(mac) == '0050.5695.406e'
+    with pytest.raises(ValueError):
+        mac_locator.normalize_mac('0050.5695.40')
+
+def test_refresh_replaces_only_that_switch():
+    index = mac_locator.MacIndex()
+    index.add_switch('accsw01', [('0050.5695.406e', 'gi1/0/3', '10', 1),
+      ('0050.5695.4001', 'gi1/0/4', '10', 1)])
+    index.add_switch('aubcore01', [('0050.5695.406e', 'po1', '10', 212)])
+    index.add_switch('accsw01', [('0050.5695.4002', 'gi1/0/4', '10', 1)])
+    assert index.locate('0050.5695.406e') == [
+      ('aubcore01', 'po1', '10', 212)]
+    assert index.locate('0050.5695.4001') == []
+    assert index.locate('00:50:56:95:40:02') == [
+      ('accsw01', 'gi1/0/4', '10', 1)]
+    assert len(index) == 2
+    index.remove_switch('aubcore01')
+    assert sorted(index.macs) == ['0050.5695.4002']
+    assert 'aubcore01' not in index.switch_macs
+
+def test_loaded_index_can_be_refreshed(tmp_path):
+    path = str(tmp_path / 'mac_index.json')
+    index = mac_locator.MacIndex()
+    index.add_switch('accsw01', [('0050.5695.406e', 'gi1/0/3', '10', 1)])
+    index.add_switch('accsw02', [('0050.5695.406e', 'gi1/0/9', '10', 1)])
+    index.save(path)
+    loaded = mac_locator.MacIndex.load(path)
+    loaded.add_switch('accsw01', [])
+    assert loaded.locate('0050.5695.406e') == [
+      ('accsw02', 'gi1/0/9', '10', 1)]
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import modules.parse_cache as parse_cache
+
+@pytest.fixture
+def config(tmp_path):
+    conf_path = tmp_path / 'sw01'
+    conf_path.write_text('hostname sw01\n')
+    return str(conf_path)
+
+def set_mtime(conf_path, mtime_ns):
+    os.utime(conf_path, ns=(mtime_ns, mtime_ns))
+
+def test_hit_while_unchanged(config):
+    cache = parse_cache.ParseCache()
+    assert cache.get('ip', 'v1', config) == (False, None)
+    cache.put('ip', 'v1', config, {'gi1/0/1': []})
+    assert cache.get('ip', 'v1', config) == (True, {'gi1/0/1': []})
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_size_change_is_a_miss(config):
+    cache = parse_cache.ParseCache()
+    cache.put('ip', 'v1', config, 'old')
+    mtime_ns = os.stat(config).st_mtime_ns
+    with open(config, 'at') as fh:
+        fh.write('interface Vlan10\n')
+    # same mtime, so only the size tells
+    set_mtime(config, mtime_ns)
+    assert cache.get('ip', 'v1', config) == (False, None)
+
+def test_mtime_change_with_new_content_is_a_miss(config):
+    cache = parse_cache.ParseCache()
+    cache.put('ip', 'v1', config, 'old')
+    with open(config, 'wt') as fh:
+        fh.write('hostname sw02\n')
+    set_mtime(config, os.stat(config).st_mtime_ns + 10 ** 9)
+    assert cache.get('ip', 'v1', config) == (False, None)
+
+def test_mtime_change_with_same_content_is_a_hit(config, tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = parse_cache.ParseCache(path)
+    cache.put('ip', 'v1', config, 'old')
+    cache.save()
+    mtime_ns = os.stat(config).st_mtime_ns + 10 ** 9
+    set_mtime(config, mtime_ns)
+    assert cache.get('ip', 'v1', config) == (True, 'old')
+    # the new mtime is recorded, so the file is not hashed again
+    cache.save()
+    reloaded = parse_cache.ParseCache(path)
+    reloaded.load()
+    assert reloaded.entries['ip'][config]['mtime'] == mtime_ns
+
+def test_parser_version_change_is_a_miss(config):
+    cache = parse_cache.ParseCache()
+    cache.put('ip', 'v1', config, 'old')
+    assert cache.get('ip', 'v2', config) == (False, None)
+    assert cache.get('facts', 'v1', config) == (False, None)
+
+def test_changed_while_parsing_is_not_stored(config):
+    cache = parse_cache.ParseCache()
+    stat_result = os.stat(config)
+    set_mtime(config, stat_result.st_mtime_ns + 10 ** 9)
+    cache.put('ip', 'v1', config, 'old', stat_result)
+    assert cache.get('ip', 'v1', config) == (False, None)
@@ -0,0 +1,73 @@
+import ipaddress
+
+import pytest
+
+import route_table
+import snmp_tools
+
+def make_table():
+    table = route_table.RouteTable()
+    # dest.mask.tos.next_hop, as in an ipCidrRouteTable index
+    for index, proto in (
+      ('0.0.0.0.0.0.0.0.0.172.30.2.2', 3),
+      ('10.1.0.0.255.255.0.0.0.172.30.2.3', 14),
+      ('10.1.2.0.255.255.255.0.0.172.30.2.3', 13),
+      ('10.2.0.0.255.255.0.0.0.172.30.2.4', 14),
+      ('10.0.0.0.255.0.0.0.0.172.30.2.4', 14),
+      ('192.168.1.0.255.255.255.128.0.0.0.0.0', 2)):
+        table.append_index(index.split('.'), proto)
+    return table
+
+@pytest.fixture(params=['numpy', 'loops'])
+def numpy_or_loops(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(route_table, 'numpy', None)
+
+def test_octets_to_int():
+    assert route_table.octets_to_int(['10', '1', '0', '0']) == 0x0a010000
+
+def test_append_index_and_route():
+    table = make_table()
+    assert len(table) == 6
+    assert table.route(1) == (ipaddress.IPv4Network('10.1.0.0/16'),
+      '172.30.2.3', 'bgp')
+    assert table.route(5) == (ipaddress.IPv4Network('192.168.1.0/25'),
+      '0.0.0.0', 'connected')
+    assert list(table)[0] == (ipaddress.IPv4Network('0.0.0.0/0'),
+      '172.30.2.2', 'static')
+
+def test_unknown_protocol_is_numbered():
+    table = route_table.RouteTable()
+    table.append(0x0a000000, 8, 0, 99)
+    assert table.route(0)[2] == '99'
+
+def test_filter_protocol(numpy_or_loops):
+    table = make_table()
+    assert [str(net) for net in table.filter(protocol='bgp').to_networks()] \
+      == ['10.1.0.0/16', '10.2.0.0/16', '10.0.0.0/8']
+    assert len(table.filter(protocol=13)) == 1
+
+def test_filter_within(numpy_or_loops):
+    table = make_table()
+    # the /8 itself is within 10.0.0.0/8, the default route is not
+    assert [str(net) for net in
+      table.filter(within='10.0.0.0/8').to_networks()] == [
+      '10.1.0.0/16', '10.1.2.0/24', '10.2.0.0/16', '10.0.0.0/8']
+    # a shorter prefix than within is not inside it
+    assert [str(net) for net in
+      table.filter(within='10.1.0.0/16').to_networks()] == [
+      '10.1.0.0/16', '10.1.2.0/24']
+    bgp_10_1 = table.filter(protocol='bgp', within='10.1.0.0/16')
+    assert list(bgp_10_1) == [(ipaddress.IPv4Network('10.1.0.0/16'),
+      '172.30.2.3', 'bgp')]
+    assert len(table.filter(within='172.16.0.0/12')) == 0
+
+def test_get_route_table(agent):
+    table = snmp_tools.get_route_table(agent.address, 'public')
+    assert len(table) == 200
+    # the simulator makes half of every six routes BGP
+    assert len(table.filter(protocol='bgp')) == 101
+    network, next_hop, proto = table.route(0)
+    assert network == ipaddress.IPv4Network('1.0.0.0/24')
@@ -0,0 +1,37 @@
+import snmp_archive
+import snmp_engine
+
+arp_oid = '1.3.6.1.2.1.4.22.1.2'
+arp_ifindex_oid = '1.3.6.1.2.1.4.22.1.1'
+
+def arp_row(ip):
+    return '{0}.10101.10.0.0.{1}'.format(arp_oid, ip)
+
+def add_record(archive, when, op, oid_list, varbinds):
+    archive.append('sw01', {'time': when, 'op': op, 'context': '',
+      'oids': oid_list, 'varbinds': snmp_archive._encode(varbinds),
+      'end': True})
+
+def test_newer_walk_replaces_older_rows(tmp_path):
+    archive = snmp_archive.Archive(str(tmp_path))
+    # snmp_table style walk of two columns, then a walk of one of them
+    add_record(archive, 100.0, 'walk', [arp_ifindex_oid, arp_oid],
+      [(arp_row(1), b'\x00\x0c\x29\x00\x00\x01'),
+       (arp_row(2), b'\x00\x0c\x29\x00\x00\x02'),
+       ('{0}.10101.10.0.0.1'.format(arp_ifindex_oid), 10101)])
+    add_record(archive, 200.0, 'walk', [arp_oid],
+      [(arp_row(2), b'\x00\x0c\x29\x00\x00\x22')])
+    assert list(archive.walk('sw01', 'public', arp_oid)) == [
+      (arp_row(2), b'\x00\x0c\x29\x00\x00\x22')]
+    # the other column was not walked again
+    assert len(list(archive.walk('sw01', 'public', arp_ifindex_oid))) == 1
+    assert archive.get('sw01', 'public', [arp_row(1)]) == [
+      (arp_row(1), snmp_engine.NO_SUCH_INSTANCE)]
+
+def test_replay_at_keeps_the_older_walk(tmp_path):
+    archive = snmp_archive.Archive(str(tmp_path), at=150.0)
+    add_record(archive, 100.0, 'walk', [arp_ifindex_oid, arp_oid],
+      [(arp_row(1), b'\x00\x0c\x29\x00\x00\x01')])
+    add_record(archive, 200.0, 'walk', [arp_oid], [])
+    assert list(archive.walk('sw01', 'public', arp_oid)) == [
+      (arp_row(1), b'\x00\x0c\x29\x00\x00\x01')]
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+import pytest
+
+import snmp_cache
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = snmp_cache.SnmpCache()
+    monkeypatch.setattr(snmp_cache, 'cache', cache)
+    return cache
+
+def make_getter(calls):
+    @snmp_cache.cached('sysinfo')
+    def get_info(hostname, snmp_comm, vlan=None):
+        calls.append((hostname, snmp_comm, vlan))
+        if snmp_comm != 'public':
+            # what the getters return when the host does not answer
+            return None, None
+        return {'name': hostname, 'comm': snmp_comm, 'ports': [1, 2]}, vlan
+    return get_info
+
+def test_key_includes_community(cache):
+    calls = []
+    get_info = make_getter(calls)
+    assert get_info('sw01', 'public')[0]['comm'] == 'public'
+    # a wrong community is not answered from the cache
+    assert get_info('sw01', 'wrong') == (None, None)
+    assert get_info('sw01', 'wrong') == (None, None)
+    assert get_info('sw01', 'public')[0]['comm'] == 'public'
+    assert calls == [('sw01', 'public', None), ('sw01', 'wrong', None),
+      ('sw01', 'wrong', None)]
+
+def test_key_includes_other_arguments(cache):
+    calls = []
+    get_info = make_getter(calls)
+    assert get_info('sw01', 'public', vlan=10)[1] == 10
+    assert get_info('sw01', 'public', 20)[1] == 20
+    # keyword and positional spellings share an entry
+    assert get_info('sw01', snmp_comm='public', vlan=10)[1] == 10
+    assert get_info('sw01', 'public')[1] is None
+    assert len(calls) == 3
+
+def test_peek_with_cache_args(cache):
+    get_info = make_getter([])
+    get_info('sw01', 'public')
+    args = get_info.cache_args('sw01', 'public')
+    assert cache.peek('sysinfo', 'sw01', args)[0]['name'] == 'sw01'
+    assert cache.peek('sysinfo', 'sw01',
+      get_info.cache_args('sw01', 'other')) is None
+
+def test_callers_get_copies(cache):
+    get_info = make_getter([])
+    first, vlan = get_info('sw01', 'public')
+    first['ports'].append(3)
+    second, vlan = get_info('sw01', 'public')
+    assert second['ports'] == [1, 2]
+    second['name'] = 'changed'
+    assert get_info('sw01', 'public')[0]['name'] == 'sw01'
+
+class CountingEvent(threading.Event):
+    lock = threading.Lock()
+    waiters = 0
+
+    def wait(self, timeout=None):
+        with CountingEvent.lock:
+            CountingEvent.waiters += 1
+        return super().wait(timeout)
+
+class CountingFlight(snmp_cache._Flight):
+    def __init__(self):
+        super().__init__()
+        self.event = CountingEvent()
+
+def test_single_flight_followers_get_copies(cache, monkeypatch):
+    monkeypatch.setattr(snmp_cache, '_Flight', CountingFlight)
+    monkeypatch.setattr(CountingEvent, 'waiters', 0)
+    followers = 3
+    calls = []
+    @snmp_cache.cached('vlan_list')
+    def slow(hostname, snmp_comm):
+        calls.append(hostname)
+        # the leader returns only once every follower is waiting on it
+        deadline = time.monotonic() + 5
+        while (CountingEvent.waiters < followers and
+          time.monotonic() < deadline):
+            time.sleep(0.001)
+        return {'vlans': [1]}
+    results = []
+    def worker():
+        results.append(slow('sw01', 'public'))
+    threads = [threading.Thread(target=worker) for i in range(followers + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert CountingEvent.waiters == followers
+    assert results == [{'vlans': [1]}] * (followers + 1)
+    assert len(set(id(result) for result in results)) == followers + 1
+
+def test_saved_file_is_private(cache, tmp_path):
+    path = str(tmp_path / 'cache.pickle')
+    saved = snmp_cache.SnmpCache(path=path)
+    saved.set('sysinfo', 'sw01', ('sw01',), (('snmp_comm', 'secret'),))
+    saved.save()
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert snmp_cache.SnmpCache(path=path).peek('sysinfo', 'sw01',
+      (('snmp_comm', 'secret'),)) == ('sw01',)
+
+def test_writable_file_is_not_loaded(cache, tmp_path, capsys):
+    path = str(tmp_path / 'cache.pickle')
+    saved = snmp_cache.SnmpCache(path=path)
+    saved.set('sysinfo', 'sw01', ('sw01',))
+    saved.save()
+    os.chmod(path, 0o666)
+    assert len(snmp_cache.SnmpCache(path=path)) == 0
+    assert 'Ignoring SNMP cache' in capsys.readouterr().out
@@ -0,0 +1,108 @@
+import pytest
+
+import snmp_engine
+import snmp_metrics
+import snmp_simulator
+import snmp_tuning
+
+values = [
+    0, -1, 127, 128, -129, 2 ** 31 - 1, -2 ** 31,
+    b'', b'GigabitEthernet1/0/1', bytes(range(256)) * 2,
+    None,
+    snmp_engine.Counter32(2 ** 32 - 1),
+    snmp_engine.Gauge32(1000),
+    snmp_engine.TimeTicks(123456789),
+    snmp_engine.Counter64(2 ** 64 - 1),
+    snmp_engine.IpAddress('10.1.2.3'),
+    snmp_engine.ObjectIdentifier('1.3.6.1.4.1.9.1.1208'),
+    snmp_engine.Opaque(b'\x9f\x78\x04\x3f\x80\x00\x00'),
+    snmp_engine.NO_SUCH_OBJECT,
+    snmp_engine.NO_SUCH_INSTANCE,
+    snmp_engine.END_OF_MIB_VIEW,
+]
+
+def test_codec_round_trip():
+    varbinds = [('1.3.6.1.2.1.31.1.1.1.{0}.{1}'.format(i, 2 ** 32 - 1 - i),
+      value) for i, value in enumerate(values)]
+    message = snmp_engine.encode_message('public', snmp_engine.PDU_RESPONSE,
+      0x7fffffff, varbinds, 1, 2)
+    response = snmp_engine.decode_message(message)
+    assert response['community'] == b'public'
+    assert response['pdu_type'] == snmp_engine.PDU_RESPONSE
+    assert response['request_id'] == 0x7fffffff
+    assert (response['field1'], response['field2']) == (1, 2)
+    assert response['varbinds'] == varbinds
+    for (oid, sent), (oid, received) in zip(varbinds, response['varbinds']):
+        assert type(received) is type(sent) or (
+          type(sent) is bytes and type(received) is bytes)
+    varbind_list = snmp_engine.encode_varbinds(varbinds)
+    assert snmp_engine.decode_varbinds(varbind_list) == varbinds
+
+def test_truncated_message():
+    message = snmp_engine.encode_message('public', snmp_engine.PDU_GET, 1,
+      [('1.3.6.1.2.1.1.1.0', None)])
+    with pytest.raises(snmp_engine.SnmpError):
+        snmp_engine.decode_message(message[:-3])
+
+class TooBigAgent(snmp_simulator.SimulatedAgent):
+    '''
+    Answers GETBULK requests for more than max_bulk repetitions with tooBig.
+    '''
+    max_bulk = 12
+
+    def respond(self, request):
+        if (request['pdu_type'] == snmp_engine.PDU_GETBULK and
+          request['field2'] > self.max_bulk):
+            self.requests += 1
+            return snmp_engine.encode_message(request['community'],
+              snmp_engine.PDU_RESPONSE, request['request_id'],
+              request['varbinds'], 1, 0)
+        return super().respond(request)
+
+@pytest.fixture
+def too_big_agent():
+    agent = TooBigAgent(snmp_simulator.synthetic_mib(
+      arp=100, routes=10, ports=4, vlans=1, macs_per_vlan=4))
+    agent.start()
+    yield agent
+    agent.stop()
+
+arp_oid = '.1.3.6.1.2.1.4.22.1.2'
+
+def test_too_big_without_tuner(too_big_agent):
+    with snmp_engine.Session(too_big_agent.address, 'public') as session:
+        with pytest.raises(snmp_engine.SnmpError) as excinfo:
+            session.getbulk([arp_oid], max_repetitions=50)
+    assert excinfo.value.error_status == 'tooBig'
+    assert not isinstance(excinfo.value, snmp_engine.SnmpTimeout)
+
+def test_too_big_is_retried_smaller(too_big_agent):
+    tuner = snmp_tuning.Tuner()
+    with snmp_engine.Session(too_big_agent.address, 'public',
+      tuner=tuner) as session:
+        varbinds = session.getbulk([arp_oid], max_repetitions=50)
+        # retried at the profile's 10, below half of the 50 asked for
+        assert len(varbinds) == 10
+        assert session.max_repetitions <= TooBigAgent.max_bulk
+        assert len(session.walk(arp_oid)) == 100
+
+def test_timeout(dead_port):
+    stats = snmp_metrics.Call(dead_port, 'get', [], 'engine')
+    with snmp_engine.Session(dead_port, 'public', timeout=0.05, retries=2,
+      stats=stats) as session:
+        with pytest.raises(snmp_engine.SnmpTimeout):
+            session.get(['1.3.6.1.2.1.1.1.0'])
+    assert (stats.requests, stats.retries, stats.timeouts) == (3, 2, 1)
+
+def test_bulk_timeout_steps_down_then_gives_up(dead_port):
+    tuner = snmp_tuning.Tuner()
+    tuner.profile(dead_port).timeout = 0.05
+    stats = snmp_metrics.Call(dead_port, 'getbulk', [], 'engine')
+    with snmp_engine.Session(dead_port, 'public', retries=2, tuner=tuner,
+      stats=stats) as session:
+        with pytest.raises(snmp_engine.SnmpTimeout):
+            session.getbulk([arp_oid], max_repetitions=20)
+    # 20 and 10 are each sent twice, the minimum of 5 with all retries
+    assert stats.requests == 2 + 2 + 3
+    assert stats.timeouts == 3
+    assert tuner.bulk_timeout(dead_port) == 0.1
@@ -0,0 +1,58 @@
+import atexit
+import re
+import threading
+
+import snmp_metrics
+
+def make_call(host, latency=0.01):
+    call = snmp_metrics.Call(host, 'get', ['1.3.6.1.2.1.1.5.0'], 'native')
+    call.latency = latency
+    call.requests = 1
+    return call
+
+def test_concurrent_writes(tmp_path):
+    path = str(tmp_path / 'snmp.prom')
+    sink = snmp_metrics.PrometheusSink(path, interval=0)
+    atexit.unregister(sink.write)
+    errors = []
+    def worker(n):
+        try:
+            for i in range(300):
+                sink.emit(make_call('sw{0:02d}'.format(n)))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    sink.write()
+    with open(path) as f:
+        text = f.read()
+    counts = re.findall(r'snmp_call_duration_seconds_count\{[^}]*\} (\d+)',
+      text)
+    assert sorted(int(count) for count in counts) == [300] * 8
+    assert list(tmp_path.iterdir()) == [tmp_path / 'snmp.prom']
+
+def test_label_escapes():
+    assert snmp_metrics._labels(host='a\\b"c\nd') == 'host="a\\\\b\\"c\\nd"'
+
+def test_oid_instances_aggregate_by_column():
+    sink = snmp_metrics.HistogramSink()
+    for intf_index in (10101, 10102, 10103):
+        call = snmp_metrics.Call('sw01', 'get',
+          ['1.3.6.1.2.1.31.1.1.1.6.{0}'.format(intf_index),
+           '1.3.6.1.2.1.31.1.1.1.6.{0}'.format(intf_index + 100)], 'native')
+        call.latency = 0.5
+        sink.emit(call)
+    unknown = snmp_metrics.Call('sw01', 'get',
+      ['1.3.6.1.4.1.99999.1.2.3.4.1', '1.3.6.1.4.1.99999.1.2.3.4.2'],
+      'native')
+    unknown.latency = 0.25
+    sink.emit(unknown)
+    assert sorted(sink.oids) == ['1.3.6.1.4.1.99999.1.2.3', 'ifHCInOctets']
+    # each call counts once per column
+    assert sink.oids['ifHCInOctets'].latency.count == 3
+    assert sink.hot_oids() == [('ifHCInOctets', 1.5),
+      ('1.3.6.1.4.1.99999.1.2.3', 0.25)]
@@ -0,0 +1,47 @@
+import pytest
+
+import snmp_simulator
+import snmp_tools
+
+def start_agent(sys_descr):
+    mib = snmp_simulator.synthetic_mib(
+      arp=10, routes=10, ports=4, vlans=1, macs_per_vlan=4)
+    mib[''][snmp_simulator._oid('sysDescr')] = sys_descr
+    agent = snmp_simulator.SimulatedAgent(mib)
+    agent.start()
+    return agent
+
+@pytest.fixture
+def junos_agent():
+    agent = start_agent(b'Juniper Networks, Inc. ex4300-48t Ethernet Switch, '
+      b'kernel JUNOS 18.4R2-S3.4')
+    yield agent
+    agent.stop()
+
+def test_serial_num_ios(agent):
+    assert snmp_tools.get_serial_num(agent.address, 'public') == 'FOC1234X0AB'
+    assert snmp_tools.get_serial_num(
+      agent.address, 'public', software='ios') == 'FOC1234X0AB'
+
+def test_serial_num_other_software_is_none(junos_agent):
+    assert snmp_tools.get_serial_num(junos_agent.address, 'public') is None
+    assert snmp_tools.get_serial_num(
+      junos_agent.address, 'public', software='junos') is None
+
+def test_convert_mac():
+    assert snmp_tools.convert_mac('90 B1 1C 46 A5 1D') == '90b1.1c46.a51d'
+    # anything that is not six bytes is grouped as it always was
+    assert snmp_tools.convert_mac('90 B1 1C 46') == '90b1.1c46.'
+    assert snmp_tools.convert_mac('00 50 56 95 40 6E 01 02') == \
+      '0050.5695.406e0102'
+
+def test_arp_ip_list(agent):
+    arp = snmp_tools.get_arp_array(agent.address, 'public')
+    arp_table = snmp_tools.get_arp_ip_list([agent.address], 'public')
+    assert len(arp) == 200
+    assert sum(len(ips) for ips in arp_table.values()) == 200
+    mac, ips = next(iter(arp_table.items()))
+    assert len(mac.split('.')) == 3 and ips[0].startswith('10.0.0.')
+    # the same entries from a second host are not repeated
+    assert snmp_tools.get_arp_ip_list([agent.address, agent.address],
+      'public') == arp_table
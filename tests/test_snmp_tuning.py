@@ -0,0 +1,115 @@
+import json
+import time
+
+import snmp_engine
+import snmp_tuning
+
+def test_failure_at_minimum_only_backs_off_getbulk():
+    tuner = snmp_tuning.Tuner()
+    host = 'deadsw01'
+    for i in range(4):
+        assert tuner.observe_failure(host, tuner.min_repetitions) is None
+    assert tuner.bulk_timeout(host) == tuner.max_timeout
+    # GET keeps the measured (here default) timeout
+    assert tuner.session_args(host)['timeout'] == snmp_tuning.default_timeout
+    assert '-t' in tuner.netsnmp_args(host)
+    assert tuner.netsnmp_args(host)[1] == '1'
+
+def test_backoff_expires_and_is_cleared_by_an_answer(monkeypatch):
+    tuner = snmp_tuning.Tuner()
+    tuner.observe_failure('sw01', tuner.min_repetitions)
+    assert tuner.bulk_timeout('sw01') == 2.0
+    tuner.observe('sw01', 0.01, 10, False)
+    assert tuner.bulk_timeout('sw01') == tuner.min_timeout
+    tuner.observe_failure('sw01', tuner.min_repetitions)
+    later = time.time() + snmp_tuning.backoff_ttl + 1
+    monkeypatch.setattr(snmp_tuning.time, 'time', lambda: later)
+    assert tuner.bulk_timeout('sw01') == tuner.min_timeout
+
+def test_backoff_timeout_is_not_saved(tmp_path):
+    path = str(tmp_path / 'tuning.json')
+    tuner = snmp_tuning.Tuner(path=path)
+    tuner.observe_failure('sw01', 20)
+    tuner.observe_failure('sw01', tuner.min_repetitions)
+    tuner.observe_failure('sw01', tuner.min_repetitions)
+    tuner.save()
+    with open(path) as f:
+        assert json.load(f)['sw01']['timeout'] == snmp_tuning.default_timeout
+    assert snmp_tuning.Tuner(path=path).bulk_timeout('sw01') == \
+      snmp_tuning.default_timeout
+
+def test_saved_profile_is_loaded_unchanged(tmp_path):
+    path = str(tmp_path / 'tuning.json')
+    tuner = snmp_tuning.Tuner(path=path)
+    tuner.observe('sw01', 0.3, 20, True)
+    tuner.save()
+    saved = tuner.profile('sw01').to_dict()
+    assert snmp_tuning.Tuner(path=path).profile('sw01').to_dict() == saved
+
+def test_one_failure_does_not_set_a_ceiling():
+    tuner = snmp_tuning.Tuner()
+    # a new profile is still at the default, below half of 80
+    assert tuner.observe_failure('sw01', 80) == 10
+    profile = tuner.profile('sw01')
+    assert profile.ceiling is None
+    # answered at 80 again, so that failure was a lost packet
+    tuner.observe('sw01', 0.01, 80, True)
+    assert profile.failures == 0
+    tuner.observe_failure('sw01', 80)
+    assert profile.ceiling is None
+
+def test_repeated_failures_set_the_ceiling():
+    tuner = snmp_tuning.Tuner()
+    tuner.observe_failure('sw01', 80)
+    tuner.observe_failure('sw01', 88)
+    profile = tuner.profile('sw01')
+    assert profile.ceiling == 80
+    assert profile.limit(250) == 79
+
+def test_min_timeout_is_one_second():
+    tuner = snmp_tuning.Tuner()
+    for i in range(20):
+        tuner.observe('sw01', 0.001, 10, False)
+    assert tuner.session_args('sw01')['timeout'] == 1.0
+
+def test_getbulk_at_minimum_keeps_its_retries(dead_port, monkeypatch):
+    tuner = snmp_tuning.Tuner(min_timeout=0.05)
+    session = snmp_engine.Session(dead_port, 'public', timeout=0.05,
+      retries=3, max_repetitions=tuner.min_repetitions, tuner=tuner)
+    monkeypatch.setattr(tuner, 'bulk_timeout', lambda host: 0.05)
+    sent = []
+    request = session.request
+    def counting_request(*args):
+        sent.append(args)
+        return request(*args)
+    monkeypatch.setattr(session, 'request', counting_request)
+    try:
+        session.getbulk(['1.3.6.1.2.1.1'])
+    except snmp_engine.SnmpTimeout:
+        pass
+    else:
+        assert False, 'a dead port answered'
+    finally:
+        session.close()
+    # one request, with every retry
+    assert len(sent) == 1
+    assert sent[0][4] is None
+
+def test_getbulk_above_minimum_retries_smaller(dead_port, monkeypatch):
+    tuner = snmp_tuning.Tuner()
+    monkeypatch.setattr(tuner, 'bulk_timeout', lambda host: 0.05)
+    session = snmp_engine.Session(dead_port, 'public', timeout=0.05,
+      retries=3, max_repetitions=20, tuner=tuner)
+    sizes = []
+    request = session.request
+    def recording_request(pdu_type, oid_list, field1, field2, *args):
+        sizes.append((field2, args[0]))
+        return request(pdu_type, oid_list, field1, field2, *args)
+    monkeypatch.setattr(session, 'request', recording_request)
+    try:
+        session.getbulk(['1.3.6.1.2.1.1'])
+    except snmp_engine.SnmpTimeout:
+        pass
+    finally:
+        session.close()
+    assert sizes == [(20, 1), (10, 1), (5, None)]
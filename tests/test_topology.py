@@ -0,0 +1,55 @@
+import topology
+
+def test_intf_key():
+    assert topology.intf_key('GigabitEthernet1/0/1') == 'gi1/0/1'
+    assert topology.intf_key('Gi1/0/1') == 'gi1/0/1'
+    assert topology.intf_key('Ethernet1/49') == 'et1/49'
+    assert topology.intf_key('Eth1/49') == 'et1/49'
+    assert topology.intf_key('port-channel10') == 'po10'
+    assert topology.intf_key('TwentyFiveGigE1/1/1') == 'twe1/1/1'
+    assert topology.intf_key('TwoGigabitEthernet1/0/1') == 'tw1/0/1'
+    assert topology.intf_key('xe-0/0/1') == 'xe-0/0/1'
+    assert topology.intf_key('00:1b:54:aa:bb:cc') == '00:1b:54:aa:bb:cc'
+    assert topology.intf_key(None) is None
+
+def test_both_ends_are_one_edge():
+    topo = topology.Topology()
+    topo.add_links('aubcore01', 'cdp',
+      {'gi1/0/1': ('lf-01.foo.example.net', 'GigabitEthernet0/23')})
+    topo.add_links('lf-01', 'lldp',
+      {'Gi0/23': ('aubcore01.foo.example.net', 'Gi1/0/1')})
+    assert topo.edges() == [
+      ('aubcore01', 'gi1/0/1', 'lf-01', 'gi0/23', 'cdp,lldp')]
+
+def test_lldp_ifindex_port_id_of_a_crawled_neighbor():
+    topo = topology.Topology()
+    topo.add_links('aubcore01', 'lldp',
+      {'gi1/0/1': ('lf-01', '10123'), 'gi1/0/2': ('lf-02', '10124')})
+    topo.add_links('lf-01', 'lldp', {'gi0/23': ('aubcore01', 'gi1/0/1')})
+    topo.add_intf_names('lf-01', {'10123': 'Gi0/23'})
+    assert topo.edges() == [
+      ('aubcore01', 'gi1/0/1', 'lf-01', 'gi0/23', 'lldp'),
+      # lf-02 was not crawled, its port ID is kept
+      ('aubcore01', 'gi1/0/2', 'lf-02', '10124', 'lldp')]
+
+def test_crawl_through_nxos_device_id(monkeypatch):
+    # what each device reports, by the name it is polled as
+    network = {
+        'aubcore01': ({'gi1/0/1': ('aubnx01(FOX1234ABCD)', 'Ethernet1/49')},
+          {}, {}),
+        'aubnx01': ({'et1/49': ('aubcore01.foo.example.net', 'Gi1/0/1'),
+          'et1/50': ('lf-01.foo.example.net', 'Gi0/1')}, {}, {}),
+        'lf-01.foo.example.net': ({'gi0/1': ('aubnx01(FOX1234ABCD)',
+          'Ethernet1/50')}, {}, {}),
+    }
+    polled = []
+    def poll_neighbors(hostname, snmp_comm):
+        polled.append(hostname)
+        return network.get(hostname)
+    monkeypatch.setattr(topology, 'poll_neighbors', poll_neighbors)
+    topo = topology.crawl(['aubcore01'], 'public', concurrency=2)
+    assert sorted(polled) == ['aubcore01', 'aubnx01', 'lf-01.foo.example.net']
+    assert set(node['status'] for node in topo.nodes.values()) == {'polled'}
+    assert topo.edges() == [
+      ('aubcore01', 'gi1/0/1', 'aubnx01', 'et1/49', 'cdp'),
+      ('aubnx01', 'et1/50', 'lf-01', 'gi0/1', 'cdp')]
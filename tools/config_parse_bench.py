@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import sys
+import time
+sys.path.insert(0, '../')
+import modules.filelib as flib
+import modules.parsers as parse
+import modules.shared_regex as rgx
+
+parser = argparse.ArgumentParser(
+  formatter_class = argparse.RawDescriptionHelpFormatter,
+  epilog = ('''\
+Compare the speed of the original config parsers with the ones in parsers.py.
+
+'original' is the parsers as first written.  They search every line with
+every pattern of the current state, some of them as uncompiled strings through
+re.search.  'prefilter' is parsers.py today.  All its patterns are compiled,
+and a pattern is only searched for on lines that contain a literal it needs,
+so most lines are passed over without running a regex.
+
+Every config in the directory is read into memory first, so only parsing is
+timed.  Both parsers must return the same interfaces and addresses for every
+config; any that differ are listed and the exit status is 1.  Results are in
+lines per second, by platform.
+
+The script checks for the location of configs in the following order:
+
+1. A path provided the --dir argument
+2. A path provided in the environment variable $CONF_DIR
+3. A path provided in a file named ~/.conf_dir
+4. Default path is ./configs/
+
+examples:
+    config_parse_bench.py
+    config_parse_bench.py --dir /var/rancid/all_configs/ --repeat 5
+    config_parse_bench.py --platform juniper cisco
+      '''))
+parser.add_argument(
+  "--dir", help="Alternate directory where network host configs are located.")
+parser.add_argument("--platform", nargs='+',
+  help="Only these platforms (cisco, cisco-nx, juniper, cumulus, netscreen).")
+parser.add_argument("--repeat", type=int, default=3,
+  help="Runs per test, the best is reported (default 3).")
+args = parser.parse_args()
+
+# the original parsers
+
+def orig_ios(hostname, E, host_ip_dict):
+    def parse_intf(intf, E):
+        intf_dict = {intf: []}
+        while True:
+            (num, line) = next(E)
+            ios_intf_ip_v4_match = rgx.ios_intf_ip_v4.search(line)
+            if ios_intf_ip_v4_match:
+                ip_v4 = ios_intf_ip_v4_match.group(1)
+                netmask = ios_intf_ip_v4_match.group(3)
+                netmask = sum(
+                  bin(int(x)).count('1') for x in netmask.split('.'))
+                netmask = str(netmask)
+                intf_dict[intf].append((ip_v4, netmask))
+            nhrp_ip_v4_match = rgx.nhrp_ip_v4.search(line)
+            if nhrp_ip_v4_match:
+                nhrp_ip_v4 = nhrp_ip_v4_match.group(3)
+                intf_dict[intf].append((nhrp_ip_v4, 'hsrp'))
+            if re.search('^!?$', line):
+                return intf_dict
+    while True:
+        try:
+            (num, line) = next(E)
+        except StopIteration as e:
+            return host_ip_dict
+        ios_intf_match = rgx.ios_intf.search(line)
+        if ios_intf_match:
+            intf_name = ios_intf_match.group(2)[:2].lower()
+            intf_num = ios_intf_match.group(3)
+            intf = ''.join([intf_name, intf_num])
+            intf_dict = parse_intf(intf, E)
+            host_ip_dict[hostname].update(intf_dict)
+
+def orig_nxos(hostname, E, host_ip_dict):
+    def parse_intf(intf, E):
+        intf_dict = {intf: []}
+        while True:
+            (num, line) = next(E)
+            nxos_intf_ip_v4_match = rgx.nxos_intf_ip_v4.search(line)
+            if nxos_intf_ip_v4_match:
+                ip_v4, netmask = nxos_intf_ip_v4_match.group(1).split('/')
+                intf_dict[intf].append((ip_v4, netmask))
+            if re.search('^cli', line):
+                return intf_dict
+            if re.search(r'^\w?$', line):
+                return intf_dict
+    while True:
+        try:
+            (num, line) = next(E)
+        except StopIteration as e:
+            return host_ip_dict
+        ios_intf_match = rgx.ios_intf.search(line)
+        if ios_intf_match:
+            intf_name = ios_intf_match.group(2)[:2].lower()
+            intf_num = ios_intf_match.group(3)
+            intf = ''.join([intf_name, intf_num])
+            intf_dict = parse_intf(intf, E)
+            host_ip_dict[hostname].update(intf_dict)
+
+def orig_junos(hostname, E, host_ip_dict):
+    def parse_intfs(E):
+        intfs_dict = {}
+        while True:
+            (num, line) = next(E)
+            junos_intf_match = rgx.junos_intf.search(line)
+            junos_irb_match  = re.search(r'\sirb\s{', line)
+            junos_unit_match = re.search(r'\sunit\s(\d+)\s{', line)
+            junos_intf_ip_v4_match = rgx.junos_intf_ip_v4.search(line)
+            junos_vrrp_v4_match = rgx.junos_vrrp_v4.search(line)
+            if junos_intf_match:
+                intf = junos_intf_match.group(1)
+                full_intf = intf
+                intfs_dict[intf] = []
+            elif junos_irb_match:
+                intf = 'irb'
+                full_intf = intf
+                intfs_dict[intf] = []
+            elif junos_unit_match:
+                unit = junos_unit_match.group(1)
+                try:
+                    full_intf = '.'.join([intf, unit])
+                except UnboundLocalError as e:
+                    continue
+                intfs_dict[full_intf] = []
+            elif junos_intf_ip_v4_match:
+                ip_v4, netmask = junos_intf_ip_v4_match.group(1).split('/')
+                intfs_dict[full_intf].append((ip_v4, netmask))
+            elif junos_vrrp_v4_match:
+                vrrp_ip_v4 = junos_vrrp_v4_match.group(1)
+                intfs_dict[full_intf].append((vrrp_ip_v4, 'vrrp'))
+            elif re.search('^}$', line):
+                return intfs_dict
+    def parse_nodes(E, node):
+        intfs_dict = {}
+        while True:
+            (num, line) = next(E)
+            junos_intf_match = rgx.junos_intf.search(line)
+            junos_unit_match = re.search(r'\sunit\s(\d+)\s{', line)
+            junos_intf_ip_v4_match = rgx.junos_intf_ip_v4.search(line)
+            if junos_intf_match:
+                intf = junos_intf_match.group(1)
+                full_intf = intf
+                intfs_dict[intf] = []
+            elif junos_unit_match:
+                unit = junos_unit_match.group(1)
+                full_intf = '.'.join([node, intf, unit])
+                intfs_dict[full_intf] = []
+            elif junos_intf_ip_v4_match:
+                ip_v4, netmask = junos_intf_ip_v4_match.group(1).split('/')
+                intfs_dict[full_intf].append((ip_v4, netmask))
+            elif re.search(r'^\s\s\s\s}$', line):
+                return intfs_dict
+    while True:
+        try:
+            (num, line) = next(E)
+        except StopIteration as e:
+            return host_ip_dict
+        if line.startswith('interfaces {'):
+            intfs_dict = parse_intfs(E)
+            host_ip_dict[hostname].update(intfs_dict)
+        else:
+            junos_node_match = rgx.junos_node.search(line)
+            if junos_node_match:
+                node = junos_node_match.group(1)
+                while True:
+                    (num, line) = next(E)
+                    if 'interfaces {' in line:
+                        intfs_dict = parse_nodes(E, node)
+                        host_ip_dict[hostname].update(intfs_dict)
+                        break
+
+def orig_netscr(hostname, E, host_ip_dict):
+    while True:
+        try:
+            (num, line) = next(E)
+        except StopIteration as e:
+            return host_ip_dict
+        netscr_intf_ip_v4_match = rgx.netscr_intf_ip_v4.search(line)
+        if netscr_intf_ip_v4_match:
+            intf = netscr_intf_ip_v4_match.group(1)
+            is_mgmt_ip = netscr_intf_ip_v4_match.group(2)
+            if is_mgmt_ip:
+                intf = '-'.join([intf, 'mgmt'])
+                ip_v4 = netscr_intf_ip_v4_match.group(3)
+                netmask = 'mgmt'
+            else:
+                ip_v4, netmask = netscr_intf_ip_v4_match.group(3).split('/')
+            host_ip_dict[hostname].update({intf: [(ip_v4, netmask)]})
+
+def orig_cumulus(hostname, E, host_ip_dict):
+    def parse_intf(intf, E):
+        intf_dict = {intf: []}
+        while True:
+            (num, line) = next(E)
+            cumul_intf_ip_v4_match = rgx.cumul_intf_ip_v4.search(line)
+            if cumul_intf_ip_v4_match:
+                ip_v4, netmask = cumul_intf_ip_v4_match.group(1).split('/')
+                intf_dict[intf].append((ip_v4, netmask))
+            cumul_vrrp_v4_match = rgx.cumul_vrrp_v4.search(line)
+            if cumul_vrrp_v4_match:
+                vrrp_ip_v4 = cumul_vrrp_v4_match.group(1)
+                intf_dict[intf].append((vrrp_ip_v4, 'vrrp'))
+            if re.search('^$', line):
+                return intf_dict
+    while True:
+        try:
+            (num, line) = next(E)
+        except StopIteration as e:
+            return host_ip_dict
+        cumul_intf_match = rgx.cumul_intf.search(line)
+        if cumul_intf_match:
+            intf = cumul_intf_match.group(1)
+            intf_dict = parse_intf(intf, E)
+            host_ip_dict[hostname].update(intf_dict)
+
+original = {
+    'cisco': orig_ios,
+    'cisco-nx': orig_nxos,
+    'juniper': orig_junos,
+    'cumulus': orig_cumulus,
+    'netscreen': orig_netscr,
+}
+prefilter = {
+    'cisco': parse.ios,
+    'cisco-nx': parse.nxos,
+    'juniper': parse.junos,
+    'cumulus': parse.cumulus,
+    'netscreen': parse.netscr,
+}
+
+def parse_all(parsers, configs):
+    results = {}
+    for hostname, platform, config_lines in configs:
+        host_ip_dict = {hostname: {}}
+        try:
+            parsers[platform](hostname, enumerate(config_lines), host_ip_dict)
+        except StopIteration as e:
+            # a config that ends inside a block, kept as far as it got
+            pass
+        results[hostname] = host_ip_dict[hostname]
+    return results
+
+def bench(parsers, configs):
+    best = None
+    for i in range(args.repeat):
+        start = time.perf_counter()
+        results = parse_all(parsers, configs)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return results, best
+
+if args.dir:
+    conf_dir = args.dir
+else:
+    conf_dir = flib.get_conf_dir()
+
+by_platform = {}
+for hostname, fullpath, platform in flib.get_config_list(conf_dir):
+    if platform not in original:
+        continue
+    if args.platform and platform not in args.platform:
+        continue
+    try:
+        config_lines = list(flib.ConfigLines(fullpath))
+    except (OSError, UnicodeDecodeError) as e:
+        print('Skipping {0}: {1!r}'.format(fullpath, e))
+        continue
+    by_platform.setdefault(platform, []).append(
+      (hostname, platform, config_lines))
+if not by_platform:
+    print('No configs found.')
+    sys.exit(1)
+
+mismatches = []
+print('{0:<10} {1:>7} {2:>10} {3:>10} {4:>13} {5:>13} {6:>8}'.format(
+  'platform', 'configs', 'lines', 'MB', 'original/s', 'prefilter/s',
+  'speedup'))
+for platform, configs in sorted(by_platform.items()):
+    lines = sum(len(config_lines) for h, p, config_lines in configs)
+    size = sum(len(line) for h, p, config_lines in configs
+      for line in config_lines)
+    orig_results, orig_elapsed = bench(original, configs)
+    new_results, new_elapsed = bench(prefilter, configs)
+    for hostname in orig_results:
+        if orig_results[hostname] != new_results[hostname]:
+            mismatches.append((platform, hostname))
+    print('{0:<10} {1:>7} {2:>10} {3:>10.1f} {4:>13,.0f} {5:>13,.0f} '
+      '{6:>7.2f}x'.format(platform, len(configs), lines, size / 1e6,
+      lines / orig_elapsed, lines / new_elapsed, orig_elapsed / new_elapsed))
+
+if mismatches:
+    print('\n{0} configs parsed differently:'.format(len(mismatches)))
+    for platform, hostname in mismatches:
+        print('  {0} ({1})'.format(hostname, platform))
+    sys.exit(1)
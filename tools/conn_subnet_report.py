@@ -1,16 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
-from os import path
-from os import stat
-from os import getenv
 import sys
-import time
 import ipaddress
 sys.path.insert(0, '../')
 import modules.filelib as flib
-import modules.parsers as parse
+import modules.ingest as ingest
 import re
 
 parser = argparse.ArgumentParser(
@@ -20,13 +15,10 @@ Parse network hosts configurations and print a list of three columns consisting
 of the hostname, interface, and connected subnet.
 
 All data is pulled from Rancid backups.  The first time you run the script it
-could take up to one minute to parse all the necessary configs.  That data will
-be written to ~/.conn_subnets.json.  This file will be used for each subsequent
-run of the script, greatly improving performance.
-
-If your ~/.conn_subnets.json file is older than 24 hours, the script will
-automatically refresh the data.  You can force a refresh of the data parsed from
-the configs by deleting ~/.conn_subnets.json.
+parses all the necessary configs, spread over all cores.  The results are kept
+per config in ~/.config_parse_cache.json, shared with the other tools, and on
+later runs only the configs that changed since are parsed again.  Set
+PARSE_CACHE=off to parse every config regardless.
 
 The script checks for the location of configs in the following order:
 
@@ -43,10 +35,6 @@ examples:
     conn_subnet_report.py --priv
     conn_subnet_report.py --regex='*edge*'
     conn_subnet_report.py --priv --dir='/tmp/configs/'
-
-The script will write a json file of data to the current directory which will be
-used for subsequent runs of the script to improve performance.  This data will be
-refreshed if the timestamp is more than 24 hours old.
       '''))
 parser.add_argument(
   "--pub", help="Find public IP addresses.", action="store_true")
@@ -56,9 +44,8 @@ parser.add_argument(
   "--dir", help="Alternate directory where network host configs are located.")
 parser.add_argument(
   "--regex", help="Limit to specific hostnames.")
-
-userhome = getenv('HOME')
-subnet_json = '/'.join([userhome, '.conn_subnets.json'])
+parser.add_argument("--processes", type=int,
+  help="Configs are parsed in parallel, one process per core by default.")
 
 args = parser.parse_args()
 
@@ -86,36 +73,11 @@ def pull_from_configs():
     configs = flib.get_config_list(conf_dir, regex)
     if len(configs) == 0:
         print("No configs found.")
-    ip_dict = {}
-    for hostname, conf_path, platform in configs:
-        hostname = hostname.replace(strip_domain, '')
-        config_lines = []
-        with open(conf_path, encoding='utf-8') as fh:
-            config_lines = fh.readlines()
-        host_ip_dict = {hostname: {}}
-        E = enumerate(config_lines)
-        parse.parse_any(hostname, platform, E, host_ip_dict) 
-        ip_dict.update(host_ip_dict)
-    return ip_dict
+    configs = [(hostname.replace(strip_domain, ''), conf_path, platform)
+      for hostname, conf_path, platform in configs]
+    return ingest.parse_configs(configs, processes=args.processes)
 
-def refresh_data():
-    ip_dict = pull_from_configs()
-    # only write the file if no regex was provided and it's a full dump
-    if not args.regex:
-        with open(subnet_json, 'wt') as f:
-            f.write(json.dumps(ip_dict))
-    return ip_dict
-
-if not path.isfile(subnet_json):
-    ip_dict = refresh_data()
-else:
-    delta = time.time() - path.getctime(subnet_json)
-    #          one day
-    if delta > 86400:
-        ip_dict = refresh_data()
-    else:
-        with open(subnet_json, 'rt') as f:
-            ip_dict = json.load(f)    
+ip_dict = pull_from_configs()
 
 for hostname, intfs in sorted(ip_dict.items()):
     for intf, ip_addrs in intfs.items():
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import argparse
+from os import environ
+from os import path
+import sys
+sys.path.insert(0, '../modules')
+import mac_locator
+
+parser = argparse.ArgumentParser(
+  formatter_class = argparse.RawDescriptionHelpFormatter,
+  epilog = ('''\
+Find the switch and port where a MAC address was learned.
+
+The bridge tables of the switches given with --switches (or one per line in the
+file given with --switch-file) are polled over SNMP, all VLANs and switches in
+parallel, and saved to ~/.mac_index.json.  Lookups without --switches or
+--switch-file use the saved index and do not touch the network.
+
+The SNMP community is taken from --comm or the environment variable
+$SNMP_COMM.
+
+Each result line shows the switch, interface, VLAN and the number of MAC
+addresses learned on that port.  The port with the fewest MAC addresses, most
+likely the edge port, is printed first.
+
+examples:
+    mac_locate.py --switches accsw01 accsw02 --comm public 0050.5695.406e
+    mac_locate.py --switch-file access_switches.txt
+    mac_locate.py 00:50:56:95:40:6e
+      '''))
+parser.add_argument("mac", nargs='*', help="MAC addresses to locate.")
+parser.add_argument("--switches", nargs='+', help="Switches to poll.")
+parser.add_argument("--switch-file", help="File with one switch per line.")
+parser.add_argument("--comm", help="SNMP community.")
+parser.add_argument("--index", default=mac_locator.default_index_path,
+  help="Path of the saved MAC index.")
+args = parser.parse_args()
+
+switches = []
+if args.switches:
+    switches.extend(args.switches)
+if args.switch_file:
+    with open(args.switch_file, 'rt') as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                switches.append(line)
+
+if path.isfile(args.index):
+    index = mac_locator.MacIndex.load(args.index)
+else:
+    index = mac_locator.MacIndex()
+
+if switches:
+    snmp_comm = args.comm or environ.get('SNMP_COMM')
+    if not snmp_comm:
+        print('An SNMP community is required to poll switches.')
+        sys.exit(1)
+    mac_locator.build_index(switches, snmp_comm, index)
+    index.save(args.index)
+    print('{0} MAC addresses from {1} switches saved to {2}'.format(
+      len(index), len(index.switches), args.index))
+
+for mac in args.mac:
+    locations = index.locate(mac)
+    if not locations:
+        print('{0} not found'.format(mac))
+        continue
+    for switch, intf, vlan, count in locations:
+        print('{0:<16} {1:<20} {2:<15} vlan {3:<6} {4} macs'.format(
+          mac, switch, intf, vlan, count))
@@ -1,11 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
-import time
-from os import getenv
 from os import environ
-from os import path
 import re
 import sys
 sys.path.insert(0, '../')
@@ -15,7 +11,9 @@ parser = argparse.ArgumentParser(
   formatter_class = argparse.RawDescriptionHelpFormatter,
   epilog = ('''\
 Retrieve information about Juniper models and OS versions from Rancid backups.
-Any Rancid backup more than 10 days old is ignored.
+Any Rancid backup more than 10 days old is ignored.  The facts are kept per
+config in ~/.config_parse_cache.json and only read again from configs that
+changed since the last run.
 
 With no arguments, a summary is provided of all platform and version
 combinations, with a host count at the end of each (platform, version) tuple
@@ -47,9 +45,6 @@ variable $CONF_DIR (checked first) and the default /var/rancid/all_configs/.
 )
 args = parser.parse_args()
 
-userhome = getenv('HOME')
-os_json = '/'.join([userhome, '.os.json'])
-
 if args.dir:
     conf_dir = args.dir
 else:
@@ -57,22 +52,7 @@ else:
     if conf_dir == None:
         conf_dir = '/var/rancid/all_configs/'
 
-def refresh_data():
-    host_facts = flib.get_facts(conf_dir)
-    with open(os_json, 'wt') as f:
-        f.write(json.dumps(host_facts))
-    return host_facts
-
-if not path.isfile(os_json):
-    host_facts = refresh_data()
-else:
-    delta = time.time() - path.getctime(os_json)
-    # refresh data if more than one day old
-    if delta > 86400:
-        host_facts = refresh_data()
-    else:
-        with open(os_json, 'rt') as f:
-            host_facts = json.load(f)
+host_facts = flib.get_facts(conf_dir)
 
 fact_summary = {}
 # ('qfx5100-96s-8q', '17.3R3-S7.2') 34
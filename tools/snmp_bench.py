@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+sys.path.insert(0, '../modules')
+from os import environ
+environ.setdefault('SNMP_CACHE', 'off')
+import snmp_metrics
+import snmp_simulator
+import snmp_tools
+import snmp_tuning
+
+# learn from scratch and never touch ~/.snmp_tuning.json
+snmp_tuning.tuner.forget()
+snmp_tuning.tuner.path = None
+
+parser = argparse.ArgumentParser(
+  formatter_class = argparse.RawDescriptionHelpFormatter,
+  epilog = ('''\
+Benchmark the snmp_tools getters against a local simulated agent.
+
+A simulated switch/router (see snmp_simulator) is started on localhost with
+the table sizes given below.  Each getter then runs in its own process, so that
+peak RSS belongs to that getter alone.  For every getter the elapsed time,
+walks/sec (SNMP calls per second, as counted by snmp_metrics), varbinds/sec and
+peak RSS are reported.
+
+Save a run with --json and pass it to --compare on a later run with the same
+table sizes to catch regressions.  The exit status is 1 if any getter's
+varbinds/sec dropped, or its peak RSS grew, by more than --threshold.
+
+The SNMP result cache is off and learned tuning is not saved, so every run
+starts from the same state.
+
+examples:
+    snmp_bench.py
+    snmp_bench.py --routes 900000 --arp 50000 --ports 500 --json base.json
+    snmp_bench.py --only get_routes get_route_table --compare base.json
+      '''))
+parser.add_argument("--arp", type=int, default=50000,
+  help="ARP entries (default 50000).")
+parser.add_argument("--routes", type=int, default=900000,
+  help="Routes in ipCidrRouteTable (default 900000).")
+parser.add_argument("--ports", type=int, default=500,
+  help="Interfaces in ifTable (default 500).")
+parser.add_argument("--vlans", type=int, default=20,
+  help="VLANs with a bridge table (default 20).")
+parser.add_argument("--macs-per-vlan", type=int, default=1000,
+  help="MAC addresses per VLAN bridge table (default 1000).")
+parser.add_argument("--backend", choices=snmp_tools.backends,
+  default=snmp_tools.backend, help="snmp_tools backend.")
+parser.add_argument("--only", nargs='+', help="Getters to run.")
+parser.add_argument("--json", help="Write the results to this file.")
+parser.add_argument("--compare", help="Results file of an earlier run.")
+parser.add_argument("--threshold", type=float, default=0.2,
+  help="Allowed regression as a fraction (default 0.2).")
+args = parser.parse_args()
+
+comm = 'public'
+vlan_num = '101'
+table_sizes = {'arp': args.arp, 'routes': args.routes, 'ports': args.ports,
+  'vlans': args.vlans, 'macs_per_vlan': args.macs_per_vlan}
+
+# name -> function of the agent address
+benchmarks = [
+    ('get_sysinfo', lambda host: snmp_tools.get_sysinfo(host, comm)),
+    ('get_uptime', lambda host: snmp_tools.get_uptime(host, comm)),
+    ('get_intf_input_counters', lambda host:
+      snmp_tools.get_intf_input_counters(host, '10101', comm)),
+    ('get_intf_maps', lambda host: snmp_tools.get_intf_maps(host, comm)),
+    ('get_all_intf_status', lambda host:
+      snmp_tools.get_all_intf_status(host, comm)),
+    ('get_all_intf_desc', lambda host:
+      snmp_tools.get_all_intf_desc(host, comm)),
+    ('get_intf_table', lambda host: snmp_tools.get_intf_table(host, comm)),
+    ('get_cdp_data', lambda host: snmp_tools.get_cdp_data(host, comm)),
+    ('get_bgp_ipv4_peers', lambda host:
+      snmp_tools.get_bgp_ipv4_peers(host, comm)),
+    ('get_bgp_peer_table', lambda host:
+      snmp_tools.get_bgp_peer_table(host, comm)),
+    ('get_vlan_list', lambda host: snmp_tools.get_vlan_list(host, comm)),
+    ('get_base_ports', lambda host: snmp_tools.get_base_ports(host, comm)),
+    ('get_vlan_mac_port', lambda host:
+      snmp_tools.get_vlan_mac_port(host, vlan_num, comm)),
+    ('get_arp_ip_list', lambda host:
+      snmp_tools.get_arp_ip_list([host], comm)),
+    ('get_arp_array', lambda host: snmp_tools.get_arp_array(host, comm)),
+    ('get_routes', lambda host: snmp_tools.get_routes(host, 'bgp', comm)),
+    ('get_route_table', lambda host:
+      snmp_tools.get_route_table(host, comm)),
+]
+
+def serve(conn):
+    mib = snmp_simulator.synthetic_mib(arp=args.arp, routes=args.routes,
+      ports=args.ports, vlans=args.vlans, macs_per_vlan=args.macs_per_vlan)
+    agent = snmp_simulator.SimulatedAgent(mib)
+    del mib
+    conn.send(agent.address)
+    agent.run()
+
+def peak_rss_mb():
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_one(conn, name, func, host):
+    snmp_tools.set_backend(args.backend)
+    sink = snmp_metrics.add_sink(snmp_metrics.HistogramSink())
+    start = time.perf_counter()
+    result = func(host)
+    elapsed = time.perf_counter() - start
+    calls = 0
+    varbinds = 0
+    errors = 0
+    for totals in sink.host_totals().values():
+        calls += totals.latency.count
+        varbinds += totals.varbinds
+        errors += totals.errors
+    conn.send({'getter': name, 'seconds': elapsed, 'walks': calls,
+      'varbinds': varbinds, 'errors': errors, 'ok': result is not None,
+      'peak_rss_mb': peak_rss_mb()})
+
+ctx = multiprocessing.get_context('fork')
+parent_conn, child_conn = ctx.Pipe()
+print('Building the simulated agent...')
+agent_proc = ctx.Process(target=serve, args=(child_conn,), daemon=True)
+agent_proc.start()
+host = parent_conn.recv()
+
+results = []
+print('{0:<24} {1:>8} {2:>6} {3:>9} {4:>9} {5:>11} {6:>8}'.format(
+  'getter', 'seconds', 'walks', 'walks/s', 'varbinds', 'varbinds/s',
+  'rss_mb'))
+for name, func in benchmarks:
+    if args.only and name not in args.only:
+        continue
+    bench_conn, result_conn = ctx.Pipe()
+    proc = ctx.Process(target=run_one, args=(result_conn, name, func, host))
+    proc.start()
+    result = bench_conn.recv()
+    proc.join()
+    results.append(result)
+    seconds = max(result['seconds'], 1e-9)
+    print('{0:<24} {1:>8.3f} {2:>6} {3:>9.1f} {4:>9} {5:>11,.0f} {6:>8.1f}'
+      '{7}'.format(name, result['seconds'], result['walks'],
+      result['walks'] / seconds, result['varbinds'],
+      result['varbinds'] / seconds, result['peak_rss_mb'],
+      '' if result['ok'] and not result['errors'] else '  FAILED'))
+agent_proc.terminate()
+
+if args.json:
+    with open(args.json, 'wt') as f:
+        f.write(json.dumps({'table_sizes': table_sizes, 'backend': args.backend,
+          'results': results}, indent=2))
+
+if args.compare:
+    with open(args.compare, 'rt') as f:
+        saved = json.load(f)
+    if saved['table_sizes'] != table_sizes:
+        print('{0} was run with different table sizes: {1}'.format(
+          args.compare, saved['table_sizes']))
+        sys.exit(2)
+    baseline = {result['getter']: result for result in saved['results']}
+    regressions = []
+    for result in results:
+        old = baseline.get(result['getter'])
+        if old is None:
+            continue
+        old_rate = old['varbinds'] / max(old['seconds'], 1e-9)
+        new_rate = result['varbinds'] / max(result['seconds'], 1e-9)
+        if old_rate and new_rate < old_rate * (1 - args.threshold):
+            regressions.append('{0}: varbinds/s {1:,.0f} -> {2:,.0f}'.format(
+              result['getter'], old_rate, new_rate))
+        if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + args.threshold):
+            regressions.append('{0}: peak RSS {1:.1f} -> {2:.1f} MB'.format(
+              result['getter'], old['peak_rss_mb'], result['peak_rss_mb']))
+    for regression in regressions:
+        print('REGRESSION {0}'.format(regression))
+    if regressions:
+        sys.exit(1)
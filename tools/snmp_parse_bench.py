@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import sys
+import time
+sys.path.insert(0, '../modules')
+import macaddr
+import oids
+import route_table
+import snmp_tools
+
+parser = argparse.ArgumentParser(
+  formatter_class = argparse.RawDescriptionHelpFormatter,
+  epilog = ('''\
+Compare the speed of the two ways snmpbulkwalk output is parsed.
+
+'regex' is the original path.  It walks with MIB-resolved output
+(iso.3.6.1...  = Hex-STRING: ...) and searches every line with a hand-written
+regex.  'numeric' is the path used by snmp_tools today.  It walks with -On -Oe
+and uses iter_netsnmp_varbinds, which splits each line on ' = ', converts the
+value by its type and slices the index off at the known prefix length from
+oids.map.
+
+Synthetic ARP and ipCidrRouteTable walks are generated in both formats, so no
+device is needed.  Results are in lines per second.
+
+examples:
+    snmp_parse_bench.py
+    snmp_parse_bench.py --arp 200000 --routes 900000 --repeat 5
+      '''))
+parser.add_argument("--arp", type=int, default=100000,
+  help="Number of ARP entries (default 100000).")
+parser.add_argument("--routes", type=int, default=500000,
+  help="Number of routes (default 500000).")
+parser.add_argument("--repeat", type=int, default=3,
+  help="Runs per test, the best is reported (default 3).")
+args = parser.parse_args()
+
+def ip_str(ip_int):
+    return macaddr.format_ip(ip_int)
+
+def arp_lines(count, numeric):
+    oid = oids.map['ipNetToMediaPhysAddress']
+    prefix = '.' + oid if numeric else 'iso.' + oid[2:]
+    lines = []
+    for i in range(count):
+        mac = '00 0C 29 {0:02X} {1:02X} {2:02X}'.format(
+          (i >> 16) & 0xff, (i >> 8) & 0xff, i & 0xff)
+        lines.append('{0}.{1}.{2} = Hex-STRING: {3} '.format(
+          prefix, 25 + i % 8, ip_str(0x0a000000 + i), mac))
+    return lines
+
+def route_lines(count, numeric):
+    oid = oids.map['ipCidrRouteProto']
+    prefix = '.' + oid if numeric else 'iso.' + oid[2:]
+    lines = []
+    for i in range(count):
+        network = ip_str(0x01000000 + (i << 8))
+        lines.append('{0}.{1}.255.255.255.0.0.{2} = INTEGER: {3}'.format(
+          prefix, network, ip_str(0xac1e0202 + i % 4), (2, 3, 13, 14)[i % 4]))
+    return lines
+
+# the original get_arp_table and get_routes regexes
+re_arp = re.compile(
+  r'(\d+\.\d+\.\d+\.\d+)\s=\sHex-STRING:\s([\s\d\w]+)', re.IGNORECASE)
+re_route = re.compile(
+  r'((\d+\.){3}\d+)\.((\d+\.){3}\d+)\.0\.(\d+\.){3}\d+\s=\sINTEGER:\s(\d+)')
+
+def regex_arp(lines):
+    arp = {}
+    for line in lines:
+        arp_match = re_arp.search(line)
+        if arp_match:
+            arp[snmp_tools.convert_mac(arp_match.group(2))] = \
+              arp_match.group(1)
+    return len(arp)
+
+def numeric_arp(lines):
+    prefix_len = len(oids.map['ipNetToMediaPhysAddress']) + 1
+    arp = macaddr.ArpTable()
+    for vb_oid, mac in snmp_tools.iter_netsnmp_varbinds(lines):
+        ip = vb_oid[prefix_len:].split('.', 1)[1]
+        arp.append(macaddr.mac_from_bytes(mac), route_table.octets_to_int(
+          ip.split('.')))
+    return len(arp)
+
+def regex_routes(lines):
+    routes = []
+    for line in lines:
+        route_match = re_route.search(line)
+        if route_match:
+            routes.append((route_match.group(1), route_match.group(3),
+              route_match.group(6)))
+    return len(routes)
+
+def numeric_routes(lines):
+    prefix_len = len(oids.map['ipCidrRouteProto']) + 1
+    table = route_table.RouteTable()
+    for vb_oid, proto_num in snmp_tools.iter_netsnmp_varbinds(lines):
+        index = vb_oid[prefix_len:].split('.')
+        if len(index) == 13:
+            table.append_index(index, proto_num)
+    return len(table)
+
+def bench(func, lines):
+    best = None
+    for i in range(args.repeat):
+        start = time.perf_counter()
+        count = func(lines)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+tests = [
+    ('arp', 'regex', regex_arp, arp_lines(args.arp, False)),
+    ('arp', 'numeric', numeric_arp, arp_lines(args.arp, True)),
+    ('routes', 'regex', regex_routes, route_lines(args.routes, False)),
+    ('routes', 'numeric', numeric_routes, route_lines(args.routes, True)),
+]
+print('{0:<8} {1:<8} {2:>10} {3:>9} {4:>14}'.format(
+  'walk', 'parser', 'lines', 'seconds', 'lines/sec'))
+for walk, parser_name, func, lines in tests:
+    count, elapsed = bench(func, lines)
+    if count != len(lines):
+        print('{0} {1}: parsed {2} of {3} lines'.format(
+          walk, parser_name, count, len(lines)))
+    print('{0:<8} {1:<8} {2:>10} {3:>9.3f} {4:>14,.0f}'.format(
+      walk, parser_name, len(lines), elapsed, len(lines) / elapsed))
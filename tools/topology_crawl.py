@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import argparse
+from os import environ
+import sys
+sys.path.insert(0, '../modules')
+import topology
+
+parser = argparse.ArgumentParser(
+  formatter_class = argparse.RawDescriptionHelpFormatter,
+  epilog = ('''\
+Map the network by crawling CDP and LLDP neighbors outward from seed devices.
+
+Every device found is polled over SNMP for its CDP and LLDP neighbor tables,
+breadth first, with up to --concurrency devices polled at once.  Neighbors are
+polled by the name they advertise, so they must resolve in DNS.  Use --include
+to keep the crawl inside your own domain or naming scheme, and --max-depth or
+--max-nodes to bound it.
+
+The links are printed as an edge list, one 'device interface neighbor
+neighbor_interface protocols' line per link.  --json saves the nodes and the
+adjacency list of every polled device.
+
+The SNMP community is taken from --comm or the environment variable
+$SNMP_COMM.
+
+examples:
+    topology_crawl.py --comm public aubcore01 aubcore02
+    topology_crawl.py --seed-file cores.txt --include 'example\\.net$' \\
+      --json topology.json --edges topology.txt
+    topology_crawl.py --max-depth 1 aubcore01
+      '''))
+parser.add_argument("seeds", nargs='*', help="Devices to start from.")
+parser.add_argument("--seed-file", help="File with one seed per line.")
+parser.add_argument("--comm", help="SNMP community.")
+parser.add_argument("--max-depth", type=int,
+  help="Maximum hops from a seed to poll.")
+parser.add_argument("--max-nodes", type=int,
+  help="Maximum number of devices to poll.")
+parser.add_argument("--include",
+  help="Only poll neighbors whose name matches this regular expression.")
+parser.add_argument("--concurrency", type=int, default=64,
+  help="Devices polled at once (default 64).")
+parser.add_argument("--json", help="Save the topology as JSON to this file.")
+parser.add_argument("--edges",
+  help="Write the edge list to this file instead of printing it.")
+args = parser.parse_args()
+
+seeds = list(args.seeds)
+if args.seed_file:
+    with open(args.seed_file, 'rt') as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                seeds.append(line)
+if not seeds:
+    print('At least one seed device is required.')
+    sys.exit(1)
+
+snmp_comm = args.comm or environ.get('SNMP_COMM')
+if not snmp_comm:
+    print('An SNMP community is required to poll devices.')
+    sys.exit(1)
+
+topo = topology.crawl(seeds, snmp_comm, max_depth=args.max_depth,
+  max_nodes=args.max_nodes, include=args.include,
+  concurrency=args.concurrency)
+
+if args.json:
+    topo.save(args.json)
+edge_list = topo.edge_list()
+if not args.edges:
+    print(edge_list, end='')
+    sys.exit(0)
+
+with open(args.edges, 'wt') as fh:
+    fh.write(edge_list)
+status = {}
+for node in topo.nodes.values():
+    status[node['status']] = status.get(node['status'], 0) + 1
+print('{0} devices polled, {1} failed, {2} seen but not polled, {3} '
+  'links.'.format(status.get('polled', 0), status.get('failed', 0),
+  status.get('skipped', 0), len(topo.edges())))